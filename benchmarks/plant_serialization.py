@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Measure the cost per plant of serializing the plants listing of a user with many plants.
+
+Run it with ``python benchmarks/plant_serialization.py`` in an environment with plant_wn installed.
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+import flask
+from sqlalchemy.orm import joinedload
+
+from plant_wn.web import db, models
+from plant_wn.web.app import create_app
+from plant_wn.web.config import TestingConfig
+from plant_wn.web.json_utils import dumps
+
+
+def legacy_to_json(plant):
+    """
+    Serialize the plant by scanning its attributes as Plant.to_json used to.
+
+    :param models.Plant plant: the plant to serialize
+    :return: the JSON object representing the plant
+    :rtype: dict
+    """
+    rv = {"id": plant.id, "name": plant.name, "zip_code": plant.zip_code.zip_code}
+    for attr in dir(plant):
+        if (attr.startswith("min_") or attr.startswith("max_")) and not attr.endswith(
+            ("_enabled", "_value")
+        ):
+            threshold = getattr(plant, attr)
+            rv[attr] = threshold.to_json(plant.id) if threshold else None
+    return rv
+
+
+def create_plants(count):
+    """
+    Create a user with the input number of plants.
+
+    :param int count: the number of plants to create
+    :return: the ID of the user
+    :rtype: int
+    """
+    user = models.User(username="benchmark", password=b"not-used")
+    zip_code = models.ZipCode(zip_code="27601")
+    for i in range(count):
+        plant = models.Plant(name=f"Plant {i:05d}", user=user, zip_code=zip_code)
+        if i % 2:
+            plant.max_temp = models.MaxTemp(value=95.0)
+            plant.min_temp = models.MinTemp(value=40.0)
+        db.session.add(plant)
+    db.session.commit()
+    return user.id
+
+
+def load_plants(user_id):
+    """
+    Load the plants of the user as the plants listing does.
+
+    :param int user_id: the ID of the user
+    :return: the plants of the user
+    :rtype: list(models.Plant)
+    """
+    return (
+        db.session.query(models.Plant)
+        .filter_by(user_id=user_id)
+        .options(joinedload(models.Plant.zip_code))
+        .order_by(models.Plant.name)
+        .all()
+    )
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plants", type=int, default=10000, help="the number of plants")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of timed runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        class BenchmarkConfig(TestingConfig):
+            """The configuration of the benchmark."""
+
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'benchmark.db')}"
+
+        app = create_app(BenchmarkConfig)
+        with app.app_context():
+            db.create_all()
+            plants = load_plants(create_plants(args.plants))
+
+            benchmarks = (
+                (
+                    "dir() scan + flask.jsonify",
+                    lambda: flask.jsonify({"items": [legacy_to_json(plant) for plant in plants]}),
+                ),
+                (
+                    "precompiled + compact encoder",
+                    lambda: dumps({"items": [plant.to_json() for plant in plants]}),
+                ),
+            )
+            for name, func in benchmarks:
+                best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+                print(
+                    f"{name:32} {best * 1000:8.1f} ms total "
+                    f"{best / len(plants) * 1e6:8.2f} µs per plant"
+                )
+
+
+if __name__ == "__main__":
+    main()
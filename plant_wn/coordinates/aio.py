@@ -0,0 +1,49 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+import functools
+
+
+class AsyncCoordinatesAPI:
+    """
+    The asyncio counterpart of BaseCoordinatesAPI.
+
+    The wrapped coordinates API is synchronous, so its methods are run in an executor to avoid
+    blocking the event loop.
+    """
+
+    def __init__(self, coordinates_api, executor=None):
+        """
+        Initialize the AsyncCoordinatesAPI.
+
+        :param BaseCoordinatesAPI coordinates_api: the coordinates API to run asynchronously
+        :param concurrent.futures.Executor executor: the executor to run the coordinates API in or
+            None to use the event loop's default executor
+        """
+        self.coordinates_api = coordinates_api
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def get_coordinates(self):
+        """
+        Get the coordinates for the zip code.
+
+        :return: a tuple with the first index as the latitude and the second index as the longitude.
+        :rtype: tuple(float, float)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        return await self._run(self.coordinates_api.get_coordinates)
+
+    async def get_coordinates_bulk(self, zip_codes):
+        """
+        Get the coordinates for many zip codes.
+
+        :param iterable zip_codes: the zip codes to get the coordinates for
+        :return: a tuple where the first value is a dictionary of the found zip codes to their
+            coordinates and the second value is a list of the zip codes that were not found
+        :rtype: tuple(dict, list)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        return await self._run(self.coordinates_api.get_coordinates_bulk, list(zip_codes))
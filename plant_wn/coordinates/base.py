@@ -1,23 +1,30 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import abc
+import copy
 
-from plant_wn.requests_utils import get_requests_session
+from plant_wn.exceptions import CoordinatesAPIError
+from plant_wn.requests_utils import get_shared_session, get_timeout
 
 
 class BaseCoordinatesAPI(abc.ABC):
     """The base class for all coordinates APIs."""
 
-    def __init__(self, zip_code, api_key=None):
+    # The host of the external service, which determines the shared requests session to use
+    host = None
+
+    def __init__(self, zip_code=None, api_key=None):
         """
         Initialize the BaseCoordinatesAPI subclass.
 
-        :param str zip_code: the zip code to get the coordinates for.
+        :param str zip_code: the zip code to get the coordinates for with ``get_coordinates``. This
+            is not needed when only ``get_coordinates_bulk`` is used.
         :param str api_key: an optional API key to use when getting the coordinates from an external
             service.
         """
         self.api_key = api_key
         self.zip_code = zip_code
-        self.session = get_requests_session()
+        self.session = get_shared_session(self.host)
+        self.timeout = get_timeout()
 
     @abc.abstractmethod
     def get_coordinates(self):
@@ -29,3 +36,29 @@ class BaseCoordinatesAPI(abc.ABC):
         :raises CoordinatesAPIError: if the coordinates cannot be determined.
         """
         return  # pragma: no cover
+
+    def get_coordinates_bulk(self, zip_codes):
+        """
+        Get the coordinates for many zip codes.
+
+        Subclasses should override this when the external service can look up many zip codes in a
+        single request. This default implementation calls ``get_coordinates`` for each zip code
+        and considers a zip code not found if it raises CoordinatesAPIError.
+
+        :param iterable zip_codes: the zip codes to get the coordinates for
+        :return: a tuple where the first value is a dictionary of the found zip codes to their
+            coordinates and the second value is a list of the zip codes that were not found
+        :rtype: tuple(dict, list)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        coordinates = {}
+        not_found = []
+        for zip_code in dict.fromkeys(zip_codes):
+            api = copy.copy(self)
+            api.zip_code = zip_code
+            try:
+                coordinates[zip_code] = api.get_coordinates()
+            except CoordinatesAPIError:
+                not_found.append(zip_code)
+
+        return coordinates, not_found
@@ -0,0 +1,234 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import csv
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from plant_wn.coordinates.base import BaseCoordinatesAPI
+from plant_wn.exceptions import CoordinatesAPIError, ValidationError
+
+log = logging.getLogger(__name__)
+
+# The table starts with the magic bytes and the number of records
+_HEADER = struct.Struct("<8sI")
+_MAGIC = b"PWNZIP\x00\x01"
+# Each record is the zip code as an integer and the latitude and longitude in millionths of a
+# degree. The records are sorted by the zip code.
+_RECORD = struct.Struct("<Iii")
+_SCALE = 1000000
+
+
+def _parse_zip_code(zip_code):
+    """
+    Convert the zip code to the integer stored in the gazetteer table.
+
+    :param str zip_code: the five digit zip code, optionally with the ZIP+4 suffix
+    :return: the zip code as an integer or None if it is not a valid zip code
+    :rtype: int or None
+    """
+    zip_code = str(zip_code).strip().split("-", 1)[0]
+    if len(zip_code) != 5 or not zip_code.isdigit():
+        return None
+    return int(zip_code)
+
+
+def _get_file_identity(path):
+    """
+    Get what identifies the version of a file so that a replaced table is mapped again.
+
+    :param str path: the path to the file
+    :return: the device, inode, modification time and size of the file or None if it is missing
+    :rtype: tuple or None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class Gazetteer:
+    """A memory-mapped table of US zip codes to their coordinates."""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        """
+        Initialize the Gazetteer by memory-mapping the table.
+
+        :param str path: the path to the table generated by ``build_gazetteer``
+        :raises CoordinatesAPIError: if the table is missing or invalid
+        """
+        self.path = path
+        self.identity = _get_file_identity(path)
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            log.exception("Failed to open the gazetteer table at %s", path)
+            raise CoordinatesAPIError("The gazetteer table could not be opened")
+
+        try:
+            if len(self._mmap) < _HEADER.size:
+                raise CoordinatesAPIError("The gazetteer table is invalid")
+
+            magic, self.count = _HEADER.unpack_from(self._mmap)
+            if magic != _MAGIC or len(self._mmap) != _HEADER.size + self.count * _RECORD.size:
+                raise CoordinatesAPIError("The gazetteer table is invalid")
+        except CoordinatesAPIError:
+            self._mmap.close()
+            raise
+
+    @classmethod
+    def open(cls, path):
+        """
+        Get the shared Gazetteer of the table so that each table is only mapped once per process.
+
+        The table is mapped again when the file was replaced, such as by ``build_gazetteer``.
+
+        :param str path: the path to the table
+        :return: the Gazetteer of the table
+        :rtype: Gazetteer
+        :raises CoordinatesAPIError: if the path is not set or the table is missing or invalid
+        """
+        if not path:
+            raise CoordinatesAPIError("The path to the gazetteer table is not configured")
+
+        with cls._instances_lock:
+            instance = cls._instances.get(path)
+            if instance is None or instance.identity != _get_file_identity(path):
+                # The old mapping is closed once the lookups still using it are done with it
+                instance = cls._instances[path] = cls(path)
+            return instance
+
+    def lookup(self, zip_code):
+        """
+        Find the coordinates of the zip code with a binary search of the table.
+
+        :param str zip_code: the zip code to get the coordinates for
+        :return: a tuple with the first index as the latitude and the second index as the longitude
+            or None if the zip code is not in the table
+        :rtype: tuple(float, float) or None
+        """
+        key = _parse_zip_code(zip_code)
+        if key is None:
+            return None
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = _HEADER.size + middle * _RECORD.size
+            current, latitude, longitude = _RECORD.unpack_from(self._mmap, offset)
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return latitude / _SCALE, longitude / _SCALE
+
+        return None
+
+
+class GazetteerAPI(BaseCoordinatesAPI):
+    """An offline coordinates API backed by a memory-mapped gazetteer table."""
+
+    def __init__(self, zip_code=None, api_key=None, path=None):
+        """
+        Initialize the GazetteerAPI.
+
+        :param str zip_code: the zip code to get the coordinates for.
+        :param str api_key: this is ignored since no external service is used.
+        :param str path: the path to the gazetteer table generated by ``build_gazetteer``.
+        """
+        super().__init__(zip_code, api_key=api_key)
+        self.path = path
+
+    def get_coordinates(self):
+        """
+        Get the coordinates for the zip code.
+
+        :return: a tuple with the first index as the latitude and the second index as the longitude.
+        :rtype: tuple(float, float)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        coordinates = Gazetteer.open(self.path).lookup(self.zip_code)
+        if coordinates is None:
+            msg = "The coordinates for the zip code could not be found in the gazetteer"
+            log.error(msg)
+            raise CoordinatesAPIError(msg)
+
+        return coordinates
+
+    def get_coordinates_bulk(self, zip_codes):
+        """
+        Get the coordinates for many zip codes.
+
+        :param iterable zip_codes: the zip codes to get the coordinates for
+        :return: a tuple where the first value is a dictionary of the found zip codes to their
+            coordinates and the second value is a list of the zip codes that were not found
+        :rtype: tuple(dict, list)
+        :raises CoordinatesAPIError: if the gazetteer table is not configured, missing or invalid.
+        """
+        gazetteer = Gazetteer.open(self.path)
+        coordinates = {}
+        not_found = []
+        for zip_code in dict.fromkeys(zip_codes):
+            zip_code_coordinates = gazetteer.lookup(zip_code)
+            if zip_code_coordinates is None:
+                not_found.append(zip_code)
+            else:
+                coordinates[zip_code] = zip_code_coordinates
+
+        return coordinates, not_found
+
+
+def build_gazetteer(csv_file, path):
+    """
+    Build the gazetteer table from the OpenDataSoft "us-zip-code-latitude-and-longitude" export.
+
+    The export is the semicolon delimited CSV file with the ``Zip``, ``Latitude`` and
+    ``Longitude`` columns. Rows with an invalid zip code or coordinates are skipped.
+
+    :param file csv_file: the file object of the CSV export opened in text mode
+    :param str path: the path to write the table to
+    :return: the number of zip codes in the table
+    :rtype: int
+    :raises ValidationError: if the CSV export is missing the required columns
+    """
+    reader = csv.DictReader(csv_file, delimiter=";")
+    if not reader.fieldnames or not {"Zip", "Latitude", "Longitude"} <= set(reader.fieldnames):
+        raise ValidationError(
+            "The CSV export must have the following columns: Zip, Latitude, and Longitude"
+        )
+
+    records = {}
+    for row in reader:
+        zip_code = _parse_zip_code(row["Zip"])
+        try:
+            coordinates = float(row["Latitude"]), float(row["Longitude"])
+        except (TypeError, ValueError):
+            coordinates = None
+        else:
+            if not (-90 <= coordinates[0] <= 90 and -180 <= coordinates[1] <= 180):
+                coordinates = None
+
+        if zip_code is None or coordinates is None:
+            log.warning("Skipping the invalid row in the CSV export: %r", row)
+            continue
+
+        records[zip_code] = coordinates
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write to a temporary file and rename it so that processes never map a partial table
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(records)))
+        for zip_code in sorted(records):
+            latitude, longitude = records[zip_code]
+            f.write(_RECORD.pack(zip_code, round(latitude * _SCALE), round(longitude * _SCALE)))
+    os.replace(temp_path, path)
+
+    return len(records)
@@ -10,24 +10,33 @@ log = logging.getLogger(__name__)
 
 
 class OpenDataSoftAPI(BaseCoordinatesAPI):
-    def get_coordinates(self):
+    """The OpenDataSoft coordinates API."""
+
+    host = "public.opendatasoft.com"
+    # The maximum number of zip codes to look up in a single search query. This keeps the query
+    # string well below the URL length limits and the rows below the API's limit of 10000.
+    bulk_batch_size = 100
+
+    def _search(self, query, rows):
         """
-        Get the coordinates for the zip code.
+        Search the zip code dataset of the OpenDataSoft API.
 
-        :return: a tuple with the first index as the latitude and the second index as the longitude.
-        :rtype: tuple(float, float)
-        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        :param str query: the full-text search query
+        :param int rows: the maximum number of records to return
+        :return: the records from the search
+        :rtype: list(dict)
+        :raises CoordinatesAPIError: if the search fails
         """
         url = "https://public.opendatasoft.com/api/records/1.0/search/"
         headers = {"Content-Type": "application/json"}
         query_params = {
             "dataset": "us-zip-code-latitude-and-longitude",
-            "q": self.zip_code,
-            "rows": 1,
+            "q": query,
+            "rows": rows,
         }
         msg = "Failed to get the coordinates from the OpenDataSoft API"
         try:
-            rv = self.session.get(url, headers=headers, params=query_params, timeout=30)
+            rv = self.session.get(url, headers=headers, params=query_params, timeout=self.timeout)
         except RequestException:
             log.exception(msg)
             raise CoordinatesAPIError(msg)
@@ -38,9 +47,63 @@ class OpenDataSoftAPI(BaseCoordinatesAPI):
             )
             raise CoordinatesAPIError(msg)
 
-        if not rv.json()["records"]:
+        try:
+            return rv.json()["records"]
+        except (KeyError, TypeError, ValueError):
+            log.exception("The response from the OpenDataSoft API was in an unexpected format")
+            raise CoordinatesAPIError(msg)
+
+    def get_coordinates(self):
+        """
+        Get the coordinates for the zip code.
+
+        :return: a tuple with the first index as the latitude and the second index as the longitude.
+        :rtype: tuple(float, float)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        records = self._search(self.zip_code, 1)
+        if not records:
             msg = "The coordinates for the zip code could not be found using the OpenDataSoft API"
             log.error(msg)
             raise CoordinatesAPIError(msg)
 
-        return tuple(rv.json()["records"][0]["fields"]["geopoint"])
+        return tuple(records[0]["fields"]["geopoint"])
+
+    def get_coordinates_bulk(self, zip_codes):
+        """
+        Get the coordinates for many zip codes with a search query per batch of zip codes.
+
+        The zip codes of a batch whose search fails are reported as not found so that the other
+        batches are still used. Their coordinates aren't stored, so they are looked up again by
+        the next run.
+
+        :param iterable zip_codes: the zip codes to get the coordinates for
+        :return: a tuple where the first value is a dictionary of the found zip codes to their
+            coordinates and the second value is a list of the zip codes that were not found
+        :rtype: tuple(dict, list)
+        """
+        zip_codes = list(dict.fromkeys(zip_codes))
+        coordinates = {}
+        for start in range(0, len(zip_codes), self.bulk_batch_size):
+            stop = start + self.bulk_batch_size
+            batch = zip_codes[start:stop]
+            query = " OR ".join(f"zip:{zip_code}" for zip_code in batch)
+            try:
+                records = self._search(query, len(batch))
+            except CoordinatesAPIError:
+                log.warning("Skipping the batch of %d zip code(s) whose search failed", len(batch))
+                continue
+
+            for record in records:
+                zip_code = record["fields"].get("zip")
+                if zip_code in batch and "geopoint" in record["fields"]:
+                    coordinates[zip_code] = tuple(record["fields"]["geopoint"])
+
+        not_found = [zip_code for zip_code in zip_codes if zip_code not in coordinates]
+        if not_found:
+            log.warning(
+                "The coordinates for %d zip code(s) could not be found using the OpenDataSoft API",
+                len(not_found),
+            )
+
+        return coordinates, not_found
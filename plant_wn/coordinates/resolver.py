@@ -0,0 +1,210 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import functools
+import logging
+import os
+import threading
+
+from plant_wn.coordinates.opendatasoft import OpenDataSoftAPI
+from plant_wn.web import db, models
+
+log = logging.getLogger(__name__)
+
+# The maximum number of zip codes to query the database for at a time, which keeps the number of
+# bound parameters below SQLite's limit
+_QUERY_BATCH_SIZE = 500
+
+# The resolvers shared by the process keyed by the coordinates API class or partial and the API
+# key so that their LRU caches outlive a notifier run
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+class CoordinatesResolver:
+    """
+    Resolve the coordinates of zip codes while avoiding the coordinates API when possible.
+
+    The coordinates are first looked up in a process-local LRU cache, then in the
+    ``zip_codes.coordinates`` column, and finally in the coordinates API. The coordinates from the
+    coordinates API are written back to the database since the coordinates of a zip code never
+    change.
+    """
+
+    def __init__(self, coordinates_api_cls=OpenDataSoftAPI, api_key=None, cache_size=4096):
+        """
+        Initialize the CoordinatesResolver.
+
+        :param type coordinates_api_cls: the BaseCoordinatesAPI subclass to get the coordinates
+            with when they are not stored
+        :param str api_key: the optional API key for the coordinates API
+        :param int cache_size: the maximum number of zip codes in the LRU cache
+        """
+        self.coordinates_api_cls = coordinates_api_cls
+        self.api_key = api_key
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_cached(self, zip_code):
+        with self._lock:
+            coordinates = self._cache.get(zip_code)
+            if coordinates is not None:
+                self._cache.move_to_end(zip_code)
+            return coordinates
+
+    def _set_cached(self, zip_code, coordinates):
+        with self._lock:
+            self._cache[zip_code] = coordinates
+            self._cache.move_to_end(zip_code)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def resolve(self, zip_code):
+        """
+        Get the coordinates of the zip code.
+
+        If the coordinates are retrieved from the coordinates API, they are stored on the zip code
+        row and the database session is committed.
+
+        :param zip_code: the zip code or the ZipCode object to get the coordinates of
+        :type zip_code: str or models.ZipCode
+        :return: a tuple with the first index as the latitude and the second index as the
+            longitude.
+        :rtype: tuple(float, float)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        if isinstance(zip_code, models.ZipCode):
+            zip_code_obj = zip_code
+            zip_code = zip_code_obj.zip_code
+        else:
+            zip_code_obj = None
+
+        coordinates = self._get_cached(zip_code)
+        if coordinates is not None:
+            return coordinates
+
+        if zip_code_obj is None:
+            zip_code_obj = db.session.query(models.ZipCode).filter_by(zip_code=zip_code).first()
+
+        if zip_code_obj is not None:
+            coordinates = zip_code_obj.get_coordinates()
+
+        if coordinates is None:
+            log.debug("Getting the coordinates of %s from the coordinates API", zip_code)
+            coordinates = self.coordinates_api_cls(zip_code, api_key=self.api_key).get_coordinates()
+            if zip_code_obj is not None:
+                zip_code_obj.set_coordinates(coordinates)
+                db.session.commit()
+
+        self._set_cached(zip_code, coordinates)
+        return coordinates
+
+    def resolve_many(self, zip_codes):
+        """
+        Get the coordinates of many zip codes.
+
+        The zip codes whose coordinates are not cached or stored are retrieved with a single call to
+        ``get_coordinates_bulk`` of the coordinates API. Those coordinates are stored on the zip
+        code rows and the database session is committed.
+
+        :param iterable zip_codes: the zip codes or the ZipCode objects to get the coordinates of
+        :return: a tuple where the first value is a dictionary of the found zip codes to their
+            coordinates and the second value is a list of the zip codes that were not found
+        :rtype: tuple(dict, list)
+        :raises CoordinatesAPIError: if the coordinates cannot be determined.
+        """
+        zip_code_objs = {}
+        coordinates = {}
+        uncached = []
+        seen = set()
+        for zip_code in zip_codes:
+            if isinstance(zip_code, models.ZipCode):
+                zip_code_objs[zip_code.zip_code] = zip_code
+                zip_code = zip_code.zip_code
+
+            if zip_code in seen:
+                continue
+
+            seen.add(zip_code)
+            cached_coordinates = self._get_cached(zip_code)
+            if cached_coordinates is None:
+                uncached.append(zip_code)
+            else:
+                coordinates[zip_code] = cached_coordinates
+
+        to_query = [zip_code for zip_code in uncached if zip_code not in zip_code_objs]
+        for start in range(0, len(to_query), _QUERY_BATCH_SIZE):
+            stop = start + _QUERY_BATCH_SIZE
+            query = db.session.query(models.ZipCode).filter(
+                models.ZipCode.zip_code.in_(to_query[start:stop])
+            )
+            for zip_code_obj in query:
+                zip_code_objs[zip_code_obj.zip_code] = zip_code_obj
+
+        unresolved = []
+        for zip_code in uncached:
+            stored_coordinates = None
+            if zip_code in zip_code_objs:
+                stored_coordinates = zip_code_objs[zip_code].get_coordinates()
+
+            if stored_coordinates is None:
+                unresolved.append(zip_code)
+            else:
+                coordinates[zip_code] = stored_coordinates
+
+        not_found = []
+        if unresolved:
+            log.debug("Getting the coordinates of %d zip codes from the API", len(unresolved))
+            api = self.coordinates_api_cls(api_key=self.api_key)
+            api_coordinates, not_found = api.get_coordinates_bulk(unresolved)
+            for zip_code, zip_code_coordinates in api_coordinates.items():
+                if zip_code in zip_code_objs:
+                    zip_code_objs[zip_code].set_coordinates(zip_code_coordinates)
+            coordinates.update(api_coordinates)
+            if any(zip_code in zip_code_objs for zip_code in api_coordinates):
+                db.session.commit()
+
+        for zip_code in uncached:
+            if zip_code in coordinates:
+                self._set_cached(zip_code, coordinates[zip_code])
+
+        return coordinates, not_found
+
+
+def _reset_resolvers():
+    """Replace the lock of the shared resolvers after a fork since it may have been held."""
+    global _resolvers_lock
+
+    _resolvers_lock = threading.Lock()
+    for resolver in _resolvers.values():
+        resolver._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_resolvers)
+
+
+def get_coordinates_resolver(coordinates_api_cls=OpenDataSoftAPI, api_key=None):
+    """
+    Get the coordinates resolver shared by the process for the coordinates API.
+
+    :param type coordinates_api_cls: the BaseCoordinatesAPI subclass to get the coordinates with
+        when they are not stored
+    :param str api_key: the optional API key for the coordinates API
+    :return: the shared resolver
+    :rtype: CoordinatesResolver
+    """
+    api_cls_key = coordinates_api_cls
+    if isinstance(coordinates_api_cls, functools.partial):
+        # Equal partials, such as the ones created from the same config, share the resolver
+        api_cls_key = (
+            coordinates_api_cls.func,
+            coordinates_api_cls.args,
+            tuple(sorted(coordinates_api_cls.keywords.items())),
+        )
+
+    key = (api_cls_key, api_key)
+    with _resolvers_lock:
+        if key not in _resolvers:
+            _resolvers[key] = CoordinatesResolver(coordinates_api_cls, api_key=api_key)
+        return _resolvers[key]
@@ -0,0 +1,267 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import json
+import time
+import uuid
+
+import sqlalchemy
+
+from plant_wn.web import db, models
+from plant_wn.web.json_utils import dumps
+from plant_wn.web.sql_utils import get_insert_ignore
+
+# The number of values to put in an IN clause, which must stay below SQLite's limit of 999
+# parameters
+_CHUNK_SIZE = 500
+
+# A notification claimed by a worker where ``payload`` is the decoded JSON of the alert
+Delivery = collections.namedtuple(
+    "Delivery", ("id", "idempotency_key", "attempts", "claim_token", "payload")
+)
+
+
+def _chunks(values):
+    values = list(values)
+    for i in range(0, len(values), _CHUNK_SIZE):
+        yield values[i : i + _CHUNK_SIZE]  # noqa: E203
+
+
+def get_idempotency_key(plant_id, date, threshold):
+    """
+    Get the key that identifies the alert of a plant's threshold on a day.
+
+    :param int plant_id: the ID of the plant
+    :param datetime.date date: the day the threshold is exceeded on
+    :param str threshold: the name of the threshold
+    :return: the idempotency key
+    :rtype: str
+    """
+    return f"{plant_id}:{date.isoformat()}:{threshold}"
+
+
+def enqueue_alerts(alerts):
+    """
+    Add the alerts to the queue of notifications unless they were already enqueued.
+
+    The alerts are only written to the queue so that the notifier run isn't slowed down by the
+    delivery, which is done by the dispatch workers.
+
+    :param list alerts: the ``plant_wn.notifier.engine.Alert`` tuples to enqueue
+    :return: the number of alerts that were enqueued
+    :rtype: int
+    """
+    alerts_by_key = {}
+    for alert in alerts:
+        key = get_idempotency_key(alert.plant_id, alert.date, alert.threshold)
+        alerts_by_key[key] = alert
+
+    table = models.Notification.__table__
+    existing = set()
+    for keys in _chunks(alerts_by_key):
+        query = sqlalchemy.select([table.c.idempotency_key]).where(
+            table.c.idempotency_key.in_(keys)
+        )
+        existing.update(row[0] for row in db.session.execute(query))
+    new_keys = sorted(alerts_by_key.keys() - existing)
+
+    plants = {}
+    for plant_ids in _chunks({alerts_by_key[key].plant_id for key in new_keys}):
+        query = (
+            sqlalchemy.select(
+                [
+                    models.Plant.id,
+                    models.Plant.name,
+                    models.User.id,
+                    models.User.username,
+                    models.User.email,
+                ]
+            )
+            .select_from(models.Plant.__table__.join(models.User.__table__))
+            .where(models.Plant.id.in_(plant_ids))
+        )
+        for plant_id, name, user_id, username, email in db.session.execute(query):
+            plants[plant_id] = (name, {"email": email, "id": user_id, "username": username})
+
+    now = time.time()
+    rows = []
+    for key in new_keys:
+        alert = alerts_by_key[key]
+        if alert.plant_id not in plants:
+            # The plant was deleted since the alerts were computed
+            continue
+        plant_name, user = plants[alert.plant_id]
+        payload = {
+            "date": alert.date.isoformat(),
+            "forecast": alert.forecast,
+            "plant": {"id": alert.plant_id, "name": plant_name},
+            "threshold": alert.threshold,
+            "user": user,
+            "value": alert.value,
+        }
+        rows.append(
+            {
+                "attempts": 0,
+                "available_at": now,
+                "created_at": now,
+                "idempotency_key": key,
+                "payload": dumps(payload),
+                "status": "pending",
+                "user_id": user["id"],
+            }
+        )
+
+    if rows:
+        # Another notifier run may have enqueued the same alerts since they were looked up
+        db.session.execute(get_insert_ignore(table), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def claim_notifications(limit, lease, max_attempts):
+    """
+    Claim the pending notifications that are due so that no other worker delivers them.
+
+    The claim expires after the lease so that the notifications of a worker that dies are
+    delivered by another worker. This means a notification may be delivered more than once, which
+    is why every delivery has an idempotency key. A notification whose lease expired after its
+    last attempt is marked as failed instead of being claimed again.
+
+    :param int limit: the maximum number of notifications to claim
+    :param float lease: the number of seconds the worker has to deliver the notifications
+    :param int max_attempts: the number of attempts after which a notification is given up on
+    :return: the claimed notifications
+    :rtype: list(Delivery)
+    """
+    table = models.Notification.__table__
+    now = time.time()
+    is_due = sqlalchemy.and_(
+        table.c.status == "pending",
+        table.c.available_at <= now,
+        sqlalchemy.or_(table.c.claimed_until.is_(None), table.c.claimed_until <= now),
+    )
+    db.session.execute(
+        table.update()
+        .where(sqlalchemy.and_(is_due, table.c.attempts >= max_attempts))
+        .values(
+            claim_token=None,
+            claimed_until=None,
+            last_error="The lease expired during the last attempt",
+            status="failed",
+        )
+    )
+    is_claimable = sqlalchemy.and_(is_due, table.c.attempts < max_attempts)
+    candidates = [
+        row[0]
+        for row in db.session.execute(
+            sqlalchemy.select([table.c.id])
+            .where(is_claimable)
+            .order_by(table.c.available_at, table.c.id)
+            .limit(limit)
+        )
+    ]
+    if not candidates:
+        db.session.commit()
+        return []
+
+    # The conditions are checked again so that a notification claimed by another worker since it
+    # was selected is skipped
+    claim_token = uuid.uuid4().hex
+    db.session.execute(
+        table.update()
+        .where(sqlalchemy.and_(table.c.id.in_(candidates), is_claimable))
+        .values(attempts=table.c.attempts + 1, claim_token=claim_token, claimed_until=now + lease)
+    )
+    db.session.commit()
+
+    query = (
+        sqlalchemy.select([table.c.id, table.c.idempotency_key, table.c.attempts, table.c.payload])
+        .where(table.c.claim_token == claim_token)
+        .order_by(table.c.id)
+    )
+    deliveries = [
+        Delivery(row_id, key, attempts, claim_token, json.loads(payload))
+        for row_id, key, attempts, payload in db.session.execute(query)
+    ]
+    db.session.rollback()
+    return deliveries
+
+
+def get_backoff(attempts, backoff, max_backoff):
+    """
+    Get the number of seconds to wait before the next delivery attempt.
+
+    :param int attempts: the number of attempts so far
+    :param float backoff: the number of seconds to wait after the first attempt, which is doubled
+        after every subsequent attempt
+    :param float max_backoff: the maximum number of seconds to wait
+    :return: the number of seconds to wait
+    :rtype: float
+    """
+    return min(max_backoff, backoff * 2 ** (attempts - 1))
+
+
+def record_results(sent, failed, max_attempts, backoff, max_backoff):
+    """
+    Record the outcome of the delivery of claimed notifications and release their claims.
+
+    The outcome of a notification that was claimed by another worker since its claim expired is
+    ignored.
+
+    :param list sent: the ``Delivery`` tuples that were delivered
+    :param list failed: tuples of the ``Delivery`` that wasn't delivered and the ``DispatchError``
+    :param int max_attempts: the number of attempts after which a notification is given up on
+    :param float backoff: the number of seconds to wait after the first failed attempt
+    :param float max_backoff: the maximum number of seconds to wait between attempts
+    :return: the number of notifications that will be retried and that were given up on
+    :rtype: tuple(int, int)
+    """
+    table = models.Notification.__table__
+    is_claimed = sqlalchemy.and_(
+        table.c.id == sqlalchemy.bindparam("notification_id"),
+        table.c.claim_token == sqlalchemy.bindparam("token"),
+    )
+    now = time.time()
+    if sent:
+        db.session.execute(
+            table.update()
+            .where(is_claimed)
+            .values(
+                claim_token=None, claimed_until=None, last_error=None, sent_at=now, status="sent"
+            ),
+            [{"notification_id": delivery.id, "token": delivery.claim_token} for delivery in sent],
+        )
+
+    retried = given_up = 0
+    rows = []
+    for delivery, error in failed:
+        row = {
+            "notification_id": delivery.id,
+            "token": delivery.claim_token,
+            "new_last_error": str(error),
+        }
+        if error.retryable and delivery.attempts < max_attempts:
+            retried += 1
+            row["new_available_at"] = now + get_backoff(delivery.attempts, backoff, max_backoff)
+            row["new_status"] = "pending"
+        else:
+            given_up += 1
+            row["new_available_at"] = now
+            row["new_status"] = "failed"
+        rows.append(row)
+
+    if rows:
+        db.session.execute(
+            table.update()
+            .where(is_claimed)
+            .values(
+                available_at=sqlalchemy.bindparam("new_available_at"),
+                claim_token=None,
+                claimed_until=None,
+                last_error=sqlalchemy.bindparam("new_last_error"),
+                status=sqlalchemy.bindparam("new_status"),
+            ),
+            rows,
+        )
+
+    db.session.commit()
+    return retried, given_up
@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+import hashlib
+import hmac
+import smtplib
+import threading
+
+import requests
+
+from plant_wn.exceptions import ConfigError, DispatchError
+from plant_wn.web.json_utils import dumps
+
+# The HTTP status codes of a webhook response that mean the delivery may succeed when retried
+_RETRYABLE_STATUS_CODES = frozenset((408, 425, 429))
+
+
+class BaseTransport(ABC):
+    """An abstract class for a way to deliver notifications to users."""
+
+    @abstractmethod
+    def send(self, delivery):
+        """
+        Deliver the notification.
+
+        The transport is shared by the dispatch worker threads, so this must be thread-safe.
+
+        :param plant_wn.dispatch.queue.Delivery delivery: the notification to deliver
+        :raises DispatchError: if the notification could not be delivered
+        """
+
+    def close(self):
+        """Release the resources of the transport."""
+
+
+class SMTPTransport(BaseTransport):
+    """Deliver the notifications as emails to the addresses of the users."""
+
+    def __init__(
+        self, host, port=25, sender=None, username=None, password=None, starttls=False, timeout=30
+    ):
+        """
+        Initialize the SMTPTransport.
+
+        :param str host: the host of the SMTP server
+        :param int port: the port of the SMTP server
+        :param str sender: the address the emails are from
+        :param str username: the optional username to log in to the SMTP server with
+        :param str password: the password to log in to the SMTP server with
+        :param bool starttls: whether to upgrade the connection to TLS with STARTTLS
+        :param float timeout: the number of seconds to wait for the SMTP server before giving up
+        """
+        self.host = host
+        self.port = port
+        self.sender = sender or f"plant-wn@{host}"
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        # Each worker thread keeps its own connection open between the notifications
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    def _discard_connection(self, connection):
+        with self._connections_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        try:
+            connection.close()
+        except OSError:  # pragma: no cover
+            pass
+        self._local.connection = None
+
+    def get_message(self, delivery):
+        """
+        Get the email of the notification.
+
+        :param plant_wn.dispatch.queue.Delivery delivery: the notification to deliver
+        :return: the email
+        :rtype: email.message.EmailMessage
+        :raises DispatchError: if the user doesn't have an email address
+        """
+        payload = delivery.payload
+        if not payload["user"]["email"]:
+            raise DispatchError(
+                f'The user "{payload["user"]["username"]}" does not have an email address',
+                retryable=False,
+            )
+
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = payload["user"]["email"]
+        message["Subject"] = f'Weather alert for your plant "{payload["plant"]["name"]}"'
+        # The Message-ID is derived from the idempotency key so that duplicate deliveries can be
+        # recognized by the recipient
+        message["Message-ID"] = f"<{delivery.idempotency_key.replace(':', '.')}@plant-wn>"
+        threshold = payload["threshold"].replace("_", " ")
+        message.set_content(
+            f'The {threshold} threshold of {payload["value"]} of your plant '
+            f'"{payload["plant"]["name"]}" is exceeded on {payload["date"]} with a forecast of '
+            f'{payload["forecast"]}.\n'
+        )
+        return message
+
+    def send(self, delivery):
+        """
+        Email the notification.
+
+        :param plant_wn.dispatch.queue.Delivery delivery: the notification to deliver
+        :raises DispatchError: if the email could not be sent
+        """
+        message = self.get_message(delivery)
+        # A connection that was kept open may have been closed by the server in the meantime, in
+        # which case a new connection is opened once
+        for is_last_try in (False, True):
+            connection = getattr(self._local, "connection", None)
+            is_new = connection is None
+            try:
+                if is_new:
+                    connection = self._local.connection = self._connect()
+                connection.send_message(message)
+                return
+            except smtplib.SMTPServerDisconnected as e:
+                self._discard_connection(connection)
+                if is_new or is_last_try:
+                    raise DispatchError(f"The SMTP server disconnected: {e}")
+            except smtplib.SMTPRecipientsRefused as e:
+                raise DispatchError(f"The recipient was refused: {e}", retryable=False)
+            except smtplib.SMTPResponseException as e:
+                # The SMTP transaction may be left in an undefined state, so the connection is not
+                # reused for the next notification
+                if connection is not None:
+                    self._discard_connection(connection)
+                # 5xx replies are permanent failures
+                raise DispatchError(
+                    f"The SMTP server rejected the email: {e.smtp_code} {e.smtp_error!r}",
+                    retryable=e.smtp_code < 500,
+                )
+            except (OSError, smtplib.SMTPException) as e:
+                if connection is not None:
+                    self._discard_connection(connection)
+                raise DispatchError(f"The email could not be sent: {e}")
+
+    def close(self):
+        """Close the connections to the SMTP server."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.quit()
+            except (OSError, smtplib.SMTPException):
+                connection.close()
+
+
+class WebhookTransport(BaseTransport):
+    """Deliver the notifications as JSON in POST requests to a webhook."""
+
+    def __init__(self, url, secret=None, timeout=30):
+        """
+        Initialize the WebhookTransport.
+
+        :param str url: the URL of the webhook
+        :param str secret: the optional secret to sign the request bodies with
+        :param float timeout: the number of seconds to wait for the webhook before giving up
+        """
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+        # The retries are done by the queue with a backoff rather than by the session
+        self._session = requests.Session()
+
+    def send(self, delivery):
+        """
+        POST the notification to the webhook.
+
+        The request has the ``Idempotency-Key`` header so that the webhook can ignore duplicate
+        deliveries. If a secret is configured, the ``X-Plant-WN-Signature`` header has the
+        HMAC-SHA256 of the body in the format of ``sha256=<hex digest>``.
+
+        :param plant_wn.dispatch.queue.Delivery delivery: the notification to deliver
+        :raises DispatchError: if the webhook could not be reached or didn't accept the request
+        """
+        body = dumps(delivery.payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Idempotency-Key": delivery.idempotency_key}
+        if self.secret:
+            digest = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Plant-WN-Signature"] = f"sha256={digest}"
+
+        try:
+            response = self._session.post(
+                self.url, data=body, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise DispatchError(f"The webhook could not be reached: {e}")
+
+        if not response.ok:
+            raise DispatchError(
+                f"The webhook responded with the status code {response.status_code}",
+                retryable=(
+                    response.status_code >= 500 or response.status_code in _RETRYABLE_STATUS_CODES
+                ),
+            )
+
+    def close(self):
+        """Close the connections to the webhook."""
+        self._session.close()
+
+
+def get_transport(config):
+    """
+    Create the notification transport from the configuration.
+
+    :param dict config: the dict containing the plant_wn config
+    :return: the transport
+    :rtype: BaseTransport
+    :raises ConfigError: if the transport is not configured correctly
+    """
+    transport = config["PLANT_WN_DISPATCH_TRANSPORT"]
+    if transport == "smtp":
+        return SMTPTransport(
+            config["PLANT_WN_SMTP_HOST"],
+            port=config["PLANT_WN_SMTP_PORT"],
+            sender=config["PLANT_WN_SMTP_SENDER"],
+            username=config["PLANT_WN_SMTP_USERNAME"],
+            password=config["PLANT_WN_SMTP_PASSWORD"],
+            starttls=config["PLANT_WN_SMTP_STARTTLS"],
+            timeout=config["PLANT_WN_DISPATCH_TIMEOUT"],
+        )
+    elif transport == "webhook":
+        if not config["PLANT_WN_WEBHOOK_URL"]:
+            raise ConfigError("PLANT_WN_WEBHOOK_URL must be set to use the webhook transport")
+        return WebhookTransport(
+            config["PLANT_WN_WEBHOOK_URL"],
+            secret=config["PLANT_WN_WEBHOOK_SECRET"],
+            timeout=config["PLANT_WN_DISPATCH_TIMEOUT"],
+        )
+
+    raise ConfigError(f'The notification transport "{transport}" is not supported')
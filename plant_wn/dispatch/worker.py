@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import logging
+import threading
+
+import flask
+from sqlalchemy.exc import SQLAlchemyError
+
+from plant_wn.dispatch import queue
+from plant_wn.exceptions import ConfigError, DispatchError
+from plant_wn.web import db
+
+log = logging.getLogger(__name__)
+
+
+class Dispatcher:
+    """
+    Deliver the queued notifications with a pool of worker threads.
+
+    Each worker repeatedly claims a batch of the due notifications, delivers them with the
+    transport and records the outcome. Since the workers coordinate through the claims in the
+    database, any number of dispatchers can drain the queue at once, whether they are threads of
+    the same process or other processes on any host.
+    """
+
+    def __init__(
+        self,
+        transport,
+        batch_size=50,
+        lease=1800,
+        max_attempts=5,
+        backoff=30,
+        max_backoff=3600,
+        poll_interval=5,
+    ):
+        """
+        Initialize the Dispatcher.
+
+        :param BaseTransport transport: the transport to deliver the notifications with
+        :param int batch_size: the maximum number of notifications a worker claims at a time
+        :param float lease: the number of seconds a worker has to deliver a batch before the
+            notifications may be claimed by another worker
+        :param int max_attempts: the number of attempts after which a notification is given up on
+        :param float backoff: the number of seconds to wait after the first failed attempt, which
+            is doubled after every subsequent failed attempt
+        :param float max_backoff: the maximum number of seconds to wait between attempts
+        :param float poll_interval: the number of seconds an idle worker waits before checking the
+            queue again
+        """
+        self.transport = transport
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+
+    def dispatch_batch(self):
+        """
+        Claim a batch of the due notifications and deliver them.
+
+        :return: the number of notifications that were sent, will be retried and were given up on
+            keyed by "sent", "retried" and "failed"
+        :rtype: collections.Counter
+        """
+        deliveries = queue.claim_notifications(self.batch_size, self.lease, self.max_attempts)
+        sent = []
+        failed = []
+        for delivery in deliveries:
+            try:
+                self.transport.send(delivery)
+            except DispatchError as e:
+                log.warning("Failed to deliver the notification %s: %s", delivery.id, e)
+                failed.append((delivery, e))
+            except Exception as e:
+                log.exception("Unexpected error delivering the notification %s", delivery.id)
+                failed.append((delivery, DispatchError(f"Unexpected error: {e}")))
+            else:
+                sent.append(delivery)
+
+        retried, given_up = queue.record_results(
+            sent, failed, self.max_attempts, self.backoff, self.max_backoff
+        )
+        return collections.Counter(sent=len(sent), retried=retried, failed=given_up)
+
+    def _work(self, app, stop_event, drain, totals, totals_lock):
+        with app.app_context():
+            while not stop_event.is_set():
+                try:
+                    counts = self.dispatch_batch()
+                except SQLAlchemyError:
+                    log.exception("Failed to access the notification queue")
+                    db.session.rollback()
+                    stop_event.wait(self.poll_interval)
+                    continue
+                finally:
+                    # Don't hold a connection or a transaction open while idle
+                    db.session.remove()
+
+                with totals_lock:
+                    totals.update(counts)
+                if not sum(counts.values()):
+                    if drain:
+                        return
+                    stop_event.wait(self.poll_interval)
+
+    def run(self, workers=1, stop_event=None, drain=False):
+        """
+        Deliver the notifications with a pool of worker threads until stopped.
+
+        This must be called within the Flask application context.
+
+        :param int workers: the number of worker threads
+        :param threading.Event stop_event: the optional event that stops the workers when set
+        :param bool drain: whether to stop each worker once there are no due notifications left
+            instead of waiting for new ones
+        :return: the number of notifications that were sent, will be retried and were given up on
+            keyed by "sent", "retried" and "failed"
+        :rtype: collections.Counter
+        """
+        app = flask.current_app._get_current_object()
+        stop_event = stop_event or threading.Event()
+        totals = collections.Counter()
+        totals_lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(app, stop_event, drain, totals, totals_lock),
+                name=f"plant-wn-dispatch-{i}",
+                daemon=True,
+            )
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        return totals
+
+
+def get_dispatcher(transport, config):
+    """
+    Create the dispatcher from the configuration.
+
+    :param BaseTransport transport: the transport to deliver the notifications with
+    :param dict config: the dict containing the plant_wn config
+    :return: the dispatcher
+    :rtype: Dispatcher
+    :raises ConfigError: if the lease may expire before a batch is delivered
+    """
+    batch_size = config["PLANT_WN_DISPATCH_BATCH_SIZE"]
+    lease = config["PLANT_WN_DISPATCH_LEASE"]
+    # Each notification of a batch may wait for the transport until it times out, so a shorter
+    # lease would let another worker claim and deliver the rest of the batch a second time
+    if lease <= batch_size * config["PLANT_WN_DISPATCH_TIMEOUT"]:
+        raise ConfigError(
+            "PLANT_WN_DISPATCH_LEASE must be greater than PLANT_WN_DISPATCH_BATCH_SIZE times "
+            "PLANT_WN_DISPATCH_TIMEOUT"
+        )
+
+    return Dispatcher(
+        transport,
+        batch_size=batch_size,
+        lease=lease,
+        max_attempts=config["PLANT_WN_DISPATCH_MAX_ATTEMPTS"],
+        backoff=config["PLANT_WN_DISPATCH_BACKOFF"],
+        max_backoff=config["PLANT_WN_DISPATCH_MAX_BACKOFF"],
+        poll_interval=config["PLANT_WN_DISPATCH_POLL_INTERVAL"],
+    )
@@ -9,6 +9,24 @@ class ConfigError(Exception):
     """An exception for invalid configuration."""
 
 
+class CoordinatesAPIError(AppError):
+    """An exception when there is an error in the coordinates API."""
+
+
+class DispatchError(AppError):
+    """An exception when a notification could not be delivered."""
+
+    def __init__(self, message, retryable=True):
+        """
+        Initialize the DispatchError.
+
+        :param str message: the reason the notification could not be delivered
+        :param bool retryable: whether delivering the notification again may succeed
+        """
+        super().__init__(message)
+        self.retryable = retryable
+
+
 class ValidationError(AppError):
     """An exception for invalid input."""
 
@@ -0,0 +1,292 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import datetime
+import hashlib
+import logging
+import time
+
+import numpy as np
+import sqlalchemy
+
+from plant_wn.coordinates.opendatasoft import OpenDataSoftAPI
+from plant_wn.coordinates.resolver import get_coordinates_resolver
+from plant_wn.exceptions import AppError
+from plant_wn.notifier import evaluation
+from plant_wn.notifier.evaluation import METRICS
+from plant_wn.weather.aio import fetch_forecasts
+from plant_wn.weather.buckets import get_cell_center
+from plant_wn.weather.climacell import ClimaCellAPI
+from plant_wn.web import db, models
+
+log = logging.getLogger(__name__)
+
+# An alert for a plant whose threshold is exceeded on a forecasted day. The day is the index of
+# the forecast where 0 is today and the date is the date of that day in the forecast.
+Alert = collections.namedtuple(
+    "Alert", ("plant_id", "threshold", "day", "date", "forecast", "value")
+)
+
+
+def get_metric_forecasts(weather_api):
+    """
+    Get the daily forecast of every metric that a threshold can be set on.
+
+    :param BaseWeatherAPI weather_api: the weather API for the location
+    :return: a dictionary where the keys are the threshold names and the values are lists of
+        floats where the first index is today
+    :rtype: dict
+    :raises WeatherAPIError: if the forecast cannot be determined
+    """
+    temperatures = weather_api.get_temperature_forecast()
+    return {
+        "max_precipitation": weather_api.get_precipitation_forecast(),
+        "max_temp": [max_temp for _, max_temp in temperatures],
+        "min_temp": [min_temp for min_temp, _ in temperatures],
+        "max_wind": weather_api.get_wind_forecast(),
+    }
+
+
+def get_forecast_digest(metric_forecasts, today):
+    """
+    Get a digest of the forecast of a location that changes when the alerts it causes may change.
+
+    The date is part of the digest since the days of the alerts are relative to today.
+
+    :param dict metric_forecasts: the forecast of every metric from ``get_metric_forecasts``
+    :param datetime.date today: the date of the first day of the forecast
+    :return: the hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(today.isoformat().encode("utf-8"))
+    for metric in METRICS:
+        days = np.asarray(metric_forecasts[metric], dtype=np.float64)
+        digest.update(len(days).to_bytes(4, "little"))
+        digest.update(days.tobytes())
+    return digest.hexdigest()
+
+
+def _stage_forecast_digests(zip_codes, forecasts):
+    """
+    Store the digests of the forecasts that changed and mark their zip codes as not evaluated.
+
+    :param list zip_codes: the ZipCode objects of the run
+    :param dict forecasts: the zip code IDs to the forecast of every metric
+    :return: the number of zip codes whose forecast changed
+    :rtype: int
+    """
+    today = datetime.date.today()
+    rows = []
+    for zip_code in zip_codes:
+        if zip_code.id not in forecasts:
+            continue
+        digest = get_forecast_digest(forecasts[zip_code.id], today)
+        if digest != zip_code.forecast_digest:
+            rows.append({"zip_code_id": zip_code.id, "new_digest": digest})
+
+    if rows:
+        table = models.ZipCode.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == sqlalchemy.bindparam("zip_code_id"))
+            .values(evaluated_at=None, forecast_digest=sqlalchemy.bindparam("new_digest")),
+            rows,
+        )
+    return len(rows)
+
+
+def _mark_evaluated(zip_code_ids, evaluated_at):
+    """
+    Record that the plants in the zip codes were evaluated against their current forecasts.
+
+    The changes are left to the caller to commit.
+
+    :param list zip_code_ids: the IDs of the zip codes
+    :param float evaluated_at: the epoch time of the start of the run
+    """
+    table = models.ZipCode.__table__
+    zip_code_ids = sorted(zip_code_ids)
+    # Stay below SQLite's limit of 999 parameters
+    for i in range(0, len(zip_code_ids), 500):
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_(zip_code_ids[i : i + 500]))  # noqa: E203
+            .values(evaluated_at=evaluated_at)
+        )
+
+
+def get_alerts(thresholds, forecasts, result, dates):
+    """
+    Convert the result of an evaluation to alerts.
+
+    :param evaluation.ThresholdMatrix thresholds: the thresholds that were evaluated
+    :param evaluation.ForecastMatrix forecasts: the forecasts that were evaluated
+    :param evaluation.EvaluationResult result: the result of the evaluation
+    :param dict dates: the zip code IDs to the date of each day of their forecast
+    :return: the alerts ordered by the plant ID, threshold and day
+    :rtype: list(Alert)
+    """
+    zip_code_ids = thresholds.zip_code_ids[result.plant_index]
+    rows = np.searchsorted(forecasts.zip_code_ids, zip_code_ids)
+    day_index = result.day_index.tolist()
+    alerts = zip(
+        thresholds.plant_ids[result.plant_index].tolist(),
+        (METRICS[metric_index] for metric_index in result.metric_index.tolist()),
+        day_index,
+        (dates[zip_code_id][day] for zip_code_id, day in zip(zip_code_ids.tolist(), day_index)),
+        forecasts.values[rows, result.metric_index, result.day_index].tolist(),
+        thresholds.values[result.plant_index, result.metric_index].tolist(),
+    )
+    return sorted(Alert(*alert) for alert in alerts)
+
+
+def run_notifier(
+    weather_api_cls=ClimaCellAPI,
+    coordinates_api_cls=OpenDataSoftAPI,
+    weather_api_key=None,
+    coordinates_api_key=None,
+    forecast_cache=None,
+    concurrency=16,
+    zip_code_id_range=None,
+    incremental=False,
+    history=None,
+    bucket_radius=0,
+    can_mark_evaluated=None,
+):
+    """
+    Evaluate the thresholds of every plant against the forecast of its location.
+
+    The forecast for each zip code is only retrieved once regardless of how many plants share it.
+    The forecasts are fetched concurrently and the thresholds of all the plants are then compared
+    against the forecasts at once. If the coordinates or the forecast of a zip code cannot be
+    determined, its plants are skipped and the run continues.
+
+    :param type weather_api_cls: the BaseWeatherAPI subclass to get the forecasts with
+    :param type coordinates_api_cls: the BaseCoordinatesAPI subclass to get the coordinates with
+    :param str weather_api_key: the optional API key for the weather API
+    :param str coordinates_api_key: the optional API key for the coordinates API
+    :param BaseForecastCache forecast_cache: the optional cache for the forecasts
+    :param int concurrency: the maximum number of forecasts to fetch at once
+    :param tuple zip_code_id_range: the optional inclusive minimum and exclusive maximum of the IDs
+        of the zip codes to evaluate the plants of, where either can be None to be unbounded
+    :param bool incremental: whether to only evaluate the plants whose forecast changed since the
+        last incremental run or whose thresholds were changed since then. The alerts of the other
+        plants were already returned by an earlier run.
+    :param ForecastHistory history: the optional store to append the forecasts that weren't in the
+        cache to
+    :param float bucket_radius: the number of kilometers within which the zip codes share the
+        forecast of the center of their cell of a grid, which saves a forecast per zip code in
+        dense areas. The default of 0 fetches the forecast of each zip code's own coordinates.
+    :param callable can_mark_evaluated: the optional function that is called in the transaction
+        that marks the zip codes as evaluated by an incremental run. When it returns False, the
+        forecast digests and the marks are rolled back so that the next run evaluates the plants
+        again.
+    :return: the alerts for all the plants
+    :rtype: list(Alert)
+    """
+    # Plants changed during the run are evaluated again by the next run
+    started_at = time.time()
+    zip_codes = evaluation.filter_zip_code_ids(
+        db.session.query(models.ZipCode).filter(
+            models.ZipCode.id.in_(db.session.query(models.Plant.zip_code_id).distinct())
+        ),
+        models.ZipCode.id,
+        zip_code_id_range,
+    ).all()
+    coordinates_resolver = get_coordinates_resolver(coordinates_api_cls, coordinates_api_key)
+    try:
+        coordinates, not_found = coordinates_resolver.resolve_many(zip_codes)
+    except AppError:
+        log.exception("Skipping all the plants since the coordinates could not be determined")
+        coordinates, not_found = {}, []
+
+    for zip_code in not_found:
+        log.warning(
+            "Skipping the plants in the zip code %s since its coordinates could not be found",
+            zip_code,
+        )
+
+    # Zip codes with the same coordinates, or in the same cell when bucketing, share a forecast
+    zip_codes_by_coordinates = collections.defaultdict(list)
+    for zip_code in zip_codes:
+        if zip_code.zip_code in coordinates:
+            location = coordinates[zip_code.zip_code]
+            if bucket_radius > 0:
+                location = get_cell_center(location, bucket_radius)
+            zip_codes_by_coordinates[location].append(zip_code.zip_code)
+    if bucket_radius > 0:
+        log.info(
+            "The %d zip code(s) share %d forecast(s) within %s km",
+            sum(len(zip_code_list) for zip_code_list in zip_codes_by_coordinates.values()),
+            len(zip_codes_by_coordinates),
+            bucket_radius,
+        )
+
+    forecasts = {}
+    # The zip code IDs to the date of each day of their forecast
+    dates = {}
+    # The coordinates and forecasts to append to the history, which are only the ones that were
+    # fetched by this run so that the cached forecasts aren't appended again
+    fetched = []
+    zip_code_ids = {zip_code.zip_code: zip_code.id for zip_code in zip_codes}
+    results = fetch_forecasts(
+        weather_api_cls,
+        zip_codes_by_coordinates.keys(),
+        concurrency,
+        api_key=weather_api_key,
+        cache=forecast_cache,
+    )
+    for result in results:
+        location_zip_codes = zip_codes_by_coordinates[result.coordinates]
+        error = result.error
+        if error is None:
+            try:
+                metric_forecasts = get_metric_forecasts(result.weather_api)
+                forecast_dates = result.weather_api.get_forecast_dates()
+            except AppError as e:
+                error = e
+
+        if error is not None:
+            log.error(
+                "Skipping the plants in the zip code(s) %s since the forecast could not be "
+                "determined: %s",
+                ", ".join(location_zip_codes),
+                error,
+            )
+            continue
+
+        for zip_code in location_zip_codes:
+            forecasts[zip_code_ids[zip_code]] = metric_forecasts
+            dates[zip_code_ids[zip_code]] = forecast_dates
+        if history is not None and result.weather_api.fetched_at is not None:
+            # The forecast is recorded at the coordinates of each zip code that used it rather
+            # than at the center of their cell so that the history is queried the same way with
+            # or without bucketing
+            for location in sorted({coordinates[zip_code] for zip_code in location_zip_codes}):
+                fetched.append((location, result.weather_api.forecast))
+
+    if fetched:
+        try:
+            history.append(fetched)
+        except OSError:
+            log.exception("Failed to append the forecasts to the history")
+
+    if incremental:
+        changed_count = _stage_forecast_digests(zip_codes, forecasts)
+        log.info(
+            "The forecasts of %d of the %d zip code(s) changed since the last run",
+            changed_count,
+            len(forecasts),
+        )
+
+    thresholds = evaluation.load_thresholds(zip_code_id_range, stale_only=incremental)
+    forecast_matrix = evaluation.build_forecast_matrix(forecasts)
+    result = evaluation.evaluate(thresholds, forecast_matrix)
+    alerts = get_alerts(thresholds, forecast_matrix, result, dates)
+    if incremental:
+        _mark_evaluated(forecasts.keys(), started_at)
+        if can_mark_evaluated is None or can_mark_evaluated():
+            db.session.commit()
+        else:
+            db.session.rollback()
+            log.warning("The zip codes were not marked as evaluated")
+    return alerts
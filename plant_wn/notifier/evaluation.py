@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+
+import numpy as np
+import sqlalchemy
+
+from plant_wn.web import db, models
+
+# The names of the thresholds on the Plant model that are evaluated. The order determines the
+# metric index in the matrices below.
+METRICS = ("max_precipitation", "max_temp", "min_temp", "max_wind")
+# Whether the alert for the metric is raised when the forecast is below the threshold instead of
+# above it
+_IS_MINIMUM = np.array([metric.startswith("min_") for metric in METRICS])
+# The number of plants to compare at a time to bound the size of the plants × days matrices
+CHUNK_SIZE = 65536
+
+# The thresholds of the plants where ``values`` is a plants × metrics matrix. A threshold that is
+# not set or is disabled is NaN so that it never compares as exceeded.
+ThresholdMatrix = collections.namedtuple("ThresholdMatrix", ("plant_ids", "zip_code_ids", "values"))
+# The forecasts of the zip codes where ``values`` is a zip codes × metrics × days matrix. The
+# ``zip_code_ids`` are sorted and the days past the end of a shorter forecast are NaN.
+ForecastMatrix = collections.namedtuple("ForecastMatrix", ("zip_code_ids", "values"))
+# The result of an evaluation where ``mask`` is a plants × metrics matrix that is True when the
+# threshold is exceeded on any day. The three index arrays have an entry per exceeded threshold
+# and day.
+EvaluationResult = collections.namedtuple(
+    "EvaluationResult", ("mask", "plant_index", "metric_index", "day_index")
+)
+
+
+def filter_zip_code_ids(query, column, zip_code_id_range=None):
+    """
+    Filter the query to the zip code IDs in the range.
+
+    :param sqlalchemy.orm.Query query: the query to filter
+    :param column: the column of the zip code IDs to filter on
+    :param tuple zip_code_id_range: the inclusive minimum and exclusive maximum of the zip code IDs
+        where either can be None to be unbounded, or None to not filter the query
+    :return: the filtered query
+    :rtype: sqlalchemy.orm.Query
+    """
+    min_zip_code_id, max_zip_code_id = zip_code_id_range or (None, None)
+    if min_zip_code_id is not None:
+        query = query.filter(column >= min_zip_code_id)
+    if max_zip_code_id is not None:
+        query = query.filter(column < max_zip_code_id)
+    return query
+
+
+def load_thresholds(zip_code_id_range=None, stale_only=False):
+    """
+    Load the thresholds of every plant in a single query without creating ORM objects.
+
+    :param tuple zip_code_id_range: the optional inclusive minimum and exclusive maximum of the IDs
+        of the zip codes to load the plants of, where either can be None to be unbounded
+    :param bool stale_only: whether to only load the plants whose zip code wasn't evaluated
+        against its current forecast or whose thresholds changed since it was
+    :return: the thresholds of every plant
+    :rtype: ThresholdMatrix
+    """
+    columns = [models.Plant.id, models.Plant.zip_code_id]
+    for metric in METRICS:
+        enabled = getattr(models.Plant, f"{metric}_enabled")
+        value = getattr(models.Plant, f"{metric}_value")
+        columns.append(sqlalchemy.case([(enabled, value)], else_=sqlalchemy.null()))
+
+    query = db.session.query(*columns)
+    if stale_only:
+        query = query.join(models.ZipCode).filter(
+            sqlalchemy.or_(
+                models.ZipCode.evaluated_at.is_(None),
+                models.Plant.thresholds_modified_at >= models.ZipCode.evaluated_at,
+            )
+        )
+    rows = filter_zip_code_ids(query, models.Plant.zip_code_id, zip_code_id_range).all()
+    if not rows:
+        return ThresholdMatrix(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty((0, len(METRICS)), dtype=np.float64),
+        )
+
+    # The IDs are kept out of the float matrix so that they are never rounded. None is converted
+    # to NaN when the dtype is float.
+    return ThresholdMatrix(
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=np.int64),
+        np.array([row[2:] for row in rows], dtype=np.float64),
+    )
+
+
+def build_forecast_matrix(forecasts):
+    """
+    Build the forecast matrix of the zip codes.
+
+    :param dict forecasts: a dictionary where the keys are the zip code IDs and the values are
+        dictionaries of the metric names to the list of daily forecasts
+    :return: the forecast matrix
+    :rtype: ForecastMatrix
+    """
+    zip_code_ids = np.array(sorted(forecasts), dtype=np.int64)
+    num_days = max(
+        (len(days) for metrics in forecasts.values() for days in metrics.values()), default=0
+    )
+    values = np.full((len(zip_code_ids), len(METRICS), num_days), np.nan)
+    for row, zip_code_id in enumerate(zip_code_ids.tolist()):
+        for metric_index, metric in enumerate(METRICS):
+            days = forecasts[zip_code_id][metric]
+            values[row, metric_index, : len(days)] = days
+
+    return ForecastMatrix(zip_code_ids, values)
+
+
+def evaluate(thresholds, forecasts):
+    """
+    Compare the thresholds of every plant against the forecast of its zip code.
+
+    Plants whose zip code is not in the forecast matrix are never considered exceeded.
+
+    :param ThresholdMatrix thresholds: the thresholds of the plants
+    :param ForecastMatrix forecasts: the forecasts of the zip codes
+    :return: the alert mask and the indexes of the exceeded thresholds and days
+    :rtype: EvaluationResult
+    """
+    num_plants = len(thresholds.plant_ids)
+    mask = np.zeros((num_plants, len(METRICS)), dtype=bool)
+    indexes = ([], [], [])
+    empty = np.empty(0, dtype=np.int64)
+    if not num_plants or not len(forecasts.zip_code_ids):
+        return EvaluationResult(mask, empty, empty, empty)
+
+    # Map each plant to the row of its zip code in the forecast matrix
+    rows = np.searchsorted(forecasts.zip_code_ids, thresholds.zip_code_ids)
+    rows = np.minimum(rows, len(forecasts.zip_code_ids) - 1)
+    has_forecast = forecasts.zip_code_ids[rows] == thresholds.zip_code_ids
+
+    for start in range(0, num_plants, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, num_plants)
+        chunk_rows = rows[start:stop][has_forecast[start:stop]]
+        chunk_plants = np.arange(start, stop)[has_forecast[start:stop]]
+        for metric_index in range(len(METRICS)):
+            # A plants × days matrix of the forecast of the metric
+            days = forecasts.values[chunk_rows, metric_index, :]
+            limits = thresholds.values[chunk_plants, metric_index, np.newaxis]
+            # Comparisons with NaN are always False so disabled thresholds and missing days are
+            # never considered exceeded
+            if _IS_MINIMUM[metric_index]:
+                exceeded = days < limits
+            else:
+                exceeded = days > limits
+
+            plant_offsets, day_index = np.nonzero(exceeded)
+            if not len(day_index):
+                continue
+
+            plant_index = chunk_plants[plant_offsets]
+            mask[plant_index, metric_index] = True
+            indexes[0].append(plant_index)
+            indexes[1].append(np.full(len(day_index), metric_index))
+            indexes[2].append(day_index)
+
+    if not indexes[0]:
+        return EvaluationResult(mask, empty, empty, empty)
+
+    return EvaluationResult(mask, *(np.concatenate(index) for index in indexes))
@@ -0,0 +1,335 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+import flask
+import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
+
+from plant_wn.exceptions import ValidationError
+from plant_wn.notifier.engine import run_notifier
+from plant_wn.web import db, models
+from plant_wn.web.sql_utils import get_insert_ignore
+
+log = logging.getLogger(__name__)
+
+
+def get_owner():
+    """
+    Get a unique identifier of the worker for the leases it owns.
+
+    :return: the identifier in the format of ``<hostname>:<PID>:<random>``
+    :rtype: str
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def get_shard_ranges(shard_count):
+    """
+    Split the zip codes with plants into ranges of their IDs with about as many zip codes each.
+
+    The ranges are balanced by the number of zip codes rather than plants since fetching the
+    forecast of each zip code dominates the duration of a notifier run.
+
+    :param int shard_count: the number of ranges
+    :return: a list of the inclusive minimum and exclusive maximum of the zip code IDs of each
+        range, where the first minimum and the last maximum are None so that the ranges cover
+        zip codes created later
+    :rtype: list(tuple)
+    """
+    zip_code_ids = [
+        row[0]
+        for row in db.session.query(models.Plant.zip_code_id)
+        .distinct()
+        .order_by(models.Plant.zip_code_id)
+    ]
+    boundaries = [None]
+    for shard in range(1, shard_count):
+        # IDs start at 1, so the shards of a run without plants are empty except for the last one
+        boundaries.append(
+            zip_code_ids[len(zip_code_ids) * shard // shard_count] if zip_code_ids else 0
+        )
+    boundaries.append(None)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def create_run(run_id, shard_count):
+    """
+    Create the shards of the notifier run unless they were already created by another worker.
+
+    :param str run_id: the identifier of the notifier run
+    :param int shard_count: the number of shards to split the zip codes into
+    :raises ValidationError: if the run already exists with a different number of shards
+    """
+    if shard_count < 1:
+        raise ValidationError("The number of shards must be at least 1")
+
+    table = models.NotifierShard.__table__
+    rows = [
+        {
+            "attempts": 0,
+            "max_zip_code_id": max_zip_code_id,
+            "min_zip_code_id": min_zip_code_id,
+            "run_id": run_id,
+            "shard": shard,
+            "shard_count": shard_count,
+            "status": "pending",
+        }
+        for shard, (min_zip_code_id, max_zip_code_id) in enumerate(get_shard_ranges(shard_count))
+    ]
+    # Every row is inserted in the same statement so that concurrent workers can't mix the ranges
+    # they each computed
+    db.session.execute(get_insert_ignore(table), rows)
+    db.session.commit()
+
+    existing_count = db.session.execute(
+        sqlalchemy.select([table.c.shard_count]).where(table.c.run_id == run_id).limit(1)
+    ).scalar()
+    if existing_count != shard_count:
+        raise ValidationError(
+            f'The notifier run "{run_id}" already exists with {existing_count} shard(s)'
+        )
+
+
+def claim_shard(run_id, owner, lease):
+    """
+    Claim a shard of the notifier run that isn't done and isn't leased by another worker.
+
+    :param str run_id: the identifier of the notifier run
+    :param str owner: the identifier of the worker
+    :param float lease: the number of seconds until the lease expires unless it is renewed
+    :return: the claimed shard or None if there are no shards left to claim
+    :rtype: models.NotifierShard or None
+    """
+    table = models.NotifierShard.__table__
+    while True:
+        now = time.time()
+        is_claimable = sqlalchemy.and_(
+            table.c.run_id == run_id,
+            table.c.status == "pending",
+            sqlalchemy.or_(table.c.lease_expires_at.is_(None), table.c.lease_expires_at <= now),
+        )
+        shard = db.session.execute(
+            sqlalchemy.select([table.c.shard]).where(is_claimable).order_by(table.c.shard).limit(1)
+        ).scalar()
+        if shard is None:
+            db.session.rollback()
+            return None
+
+        # The conditions are checked again since another worker may have claimed the shard since
+        # it was selected
+        result = db.session.execute(
+            table.update()
+            .where(sqlalchemy.and_(table.c.shard == shard, is_claimable))
+            .values(
+                attempts=table.c.attempts + 1,
+                heartbeat_at=now,
+                lease_expires_at=now + lease,
+                owner=owner,
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.query(models.NotifierShard).get((run_id, shard))
+
+
+def renew_lease(run_id, shard, owner, lease):
+    """
+    Extend the lease of the shard that the worker owns.
+
+    :param str run_id: the identifier of the notifier run
+    :param int shard: the number of the shard
+    :param str owner: the identifier of the worker
+    :param float lease: the number of seconds from now until the lease expires
+    :return: False if the lease was lost to another worker
+    :rtype: bool
+    """
+    renewed = _extend_lease(run_id, shard, owner, lease)
+    db.session.commit()
+    return renewed
+
+
+def _extend_lease(run_id, shard, owner, lease):
+    """
+    Extend the lease of the shard that the worker owns without committing the transaction.
+
+    The shard is locked until the transaction ends, so another worker can't take it over before
+    the changes made in the transaction are committed.
+
+    :param str run_id: the identifier of the notifier run
+    :param int shard: the number of the shard
+    :param str owner: the identifier of the worker
+    :param float lease: the number of seconds from now until the lease expires
+    :return: False if the lease was lost to another worker
+    :rtype: bool
+    """
+    table = models.NotifierShard.__table__
+    now = time.time()
+    result = db.session.execute(
+        table.update()
+        .where(
+            sqlalchemy.and_(
+                table.c.run_id == run_id,
+                table.c.shard == shard,
+                table.c.owner == owner,
+                table.c.status == "pending",
+            )
+        )
+        .values(heartbeat_at=now, lease_expires_at=now + lease)
+    )
+    return result.rowcount == 1
+
+
+def complete_shard(run_id, shard, owner, alert_count):
+    """
+    Mark the shard that the worker owns as done.
+
+    :param str run_id: the identifier of the notifier run
+    :param int shard: the number of the shard
+    :param str owner: the identifier of the worker
+    :param int alert_count: the number of alerts found in the shard
+    :return: False if the lease was lost to another worker, which may evaluate the shard again
+    :rtype: bool
+    """
+    table = models.NotifierShard.__table__
+    result = db.session.execute(
+        table.update()
+        .where(
+            sqlalchemy.and_(
+                table.c.run_id == run_id, table.c.shard == shard, table.c.owner == owner
+            )
+        )
+        .values(
+            alert_count=alert_count, completed_at=time.time(), lease_expires_at=None, status="done",
+        )
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+class LeaseHeartbeat:
+    """
+    Renew the lease of a shard in a background thread while the shard is being evaluated.
+
+    This must be used within the Flask application context.
+    """
+
+    def __init__(self, run_id, shard, owner, lease):
+        """
+        Initialize the LeaseHeartbeat.
+
+        :param str run_id: the identifier of the notifier run
+        :param int shard: the number of the shard
+        :param str owner: the identifier of the worker
+        :param float lease: the number of seconds until the lease expires, which is renewed every
+            third of it
+        """
+        self.run_id = run_id
+        self.shard = shard
+        self.owner = owner
+        self.lease = lease
+        # Set when the lease was taken over by another worker
+        self.lost = threading.Event()
+        self._app = flask.current_app._get_current_object()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"plant-wn-lease-{run_id}-{shard}", daemon=True
+        )
+
+    def _run(self):
+        with self._app.app_context():
+            while not self._stop.wait(self.lease / 3):
+                try:
+                    renewed = renew_lease(self.run_id, self.shard, self.owner, self.lease)
+                except SQLAlchemyError:
+                    # The lease is still valid until it expires, so try again on the next beat
+                    log.exception("Failed to renew the lease of the shard %s", self.shard)
+                    db.session.rollback()
+                    continue
+                finally:
+                    db.session.remove()
+
+                if not renewed:
+                    log.warning("The lease of the shard %s was lost", self.shard)
+                    self.lost.set()
+                    return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_shards(run_id, shard_count, lease=300, owner=None, on_alerts=None, **notifier_kwargs):
+    """
+    Evaluate the shards of the notifier run until none are left to claim.
+
+    Any number of workers on any number of hosts may call this with the same run ID to split the
+    run between them. The shards of a worker that stops renewing its leases are evaluated again by
+    another worker, so the alerts of a shard may be found more than once.
+
+    This must be used within the Flask application context.
+
+    :param str run_id: the identifier of the notifier run
+    :param int shard_count: the number of shards to split the zip codes into
+    :param float lease: the number of seconds until the lease of a shard expires unless it is
+        renewed
+    :param str owner: the identifier of the worker, which defaults to ``get_owner()``
+    :param callable on_alerts: the optional function that is called with the alerts of each shard
+        before the shard is marked as done
+    :param notifier_kwargs: the keyword arguments to pass to ``run_notifier``
+    :return: the alerts of the shards evaluated by this worker
+    :rtype: list(plant_wn.notifier.engine.Alert)
+    :raises ValidationError: if the run already exists with a different number of shards
+    """
+    owner = owner or get_owner()
+    create_run(run_id, shard_count)
+    alerts = []
+    while True:
+        shard = claim_shard(run_id, owner, lease)
+        if shard is None:
+            return alerts
+
+        log.info("Evaluating the shard %s of %s of the run %s", shard.shard, shard_count, run_id)
+        # Whether the zip codes of the shard were marked as evaluated by an incremental run, which
+        # is only done while the lease is held
+        marked_evaluated = []
+
+        def can_mark_evaluated():
+            held = _extend_lease(run_id, shard.shard, owner, lease)
+            marked_evaluated.append(held)
+            return held
+
+        with LeaseHeartbeat(run_id, shard.shard, owner, lease) as heartbeat:
+            shard_alerts = run_notifier(
+                zip_code_id_range=(shard.min_zip_code_id, shard.max_zip_code_id),
+                can_mark_evaluated=can_mark_evaluated,
+                **notifier_kwargs,
+            )
+            # The alerts of a shard whose zip codes were marked as evaluated must be kept since no
+            # other worker will find them again. Otherwise, the worker that took over the shard
+            # evaluates it again.
+            lost = not marked_evaluated[0] if marked_evaluated else heartbeat.lost.is_set()
+            if lost:
+                log.warning(
+                    "Discarding the alerts of the shard %s since its lease was lost", shard.shard
+                )
+                continue
+
+            if on_alerts is not None:
+                on_alerts(shard_alerts)
+
+        alerts.extend(shard_alerts)
+        if not complete_shard(run_id, shard.shard, owner, len(shard_alerts)):
+            log.warning(
+                "The lease of the shard %s was lost before it was done so it may be evaluated "
+                "again",
+                shard.shard,
+            )
@@ -1,20 +1,129 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import os
+import threading
+
 import requests
 from requests.packages.urllib3.util.retry import Retry
 
+# The configuration of the shared sessions, which is set by ``configure_sessions``
+_session_config = {
+    "keep_alive": True,
+    "pool_block": False,
+    "pool_size": 10,
+    "retries": 3,
+    "timeout": 30,
+}
+# The shared sessions keyed by the host and the number of retries
+_sessions = {}
+_sessions_lock = threading.Lock()
+# The process that created the shared sessions. Connections must not be shared with forked
+# processes such as gunicorn workers.
+_sessions_pid = os.getpid()
+
 
-def get_requests_session():
+def get_requests_session(pool_size=10, pool_block=False, keep_alive=True, retries=3):
     """
     Create a requests session with retries enabled.
 
+    :param int pool_size: the maximum number of connections to keep per host
+    :param bool pool_block: whether to wait for a free connection when the pool is exhausted
+        instead of opening a connection that is discarded after use
+    :param bool keep_alive: whether to reuse connections between requests
+    :param int retries: the number of times to retry a request that failed to connect, failed to
+        read or got a 5xx response, with an exponential backoff starting at a second
     :return: the configured requests session
     :rtype: requests.Session
     """
     session = requests.Session()
     retry = Retry(
-        total=3, read=3, connect=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504)
+        total=retries,
+        read=retries,
+        connect=retries,
+        backoff_factor=1,
+        status_forcelist=(500, 502, 503, 504),
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block, max_retries=retry
     )
-    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
     return session
+
+
+def _reset_sessions():
+    """Forget the shared sessions of the parent process after a fork."""
+    global _sessions, _sessions_lock, _sessions_pid
+
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+    _sessions_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_sessions)
+
+
+def configure_sessions(pool_size=10, pool_block=False, keep_alive=True, timeout=30, retries=3):
+    """
+    Configure the shared sessions and discard the ones that were already created.
+
+    :param int pool_size: the maximum number of connections to keep per host
+    :param bool pool_block: whether to wait for a free connection when the pool is exhausted
+    :param bool keep_alive: whether to reuse connections between requests
+    :param float timeout: the number of seconds to wait for the server before giving up
+    :param int retries: the number of times to retry a failed request
+    """
+    with _sessions_lock:
+        _session_config.update(
+            keep_alive=keep_alive,
+            pool_block=pool_block,
+            pool_size=pool_size,
+            retries=retries,
+            timeout=timeout,
+        )
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def get_shared_session(host=None, retries=None):
+    """
+    Get the requests session shared by the process for the host.
+
+    Sharing a session per host reuses the pooled connections, which avoids a TCP and TLS handshake
+    on every request.
+
+    :param str host: the host that the session is used for or None for a general purpose session
+    :param int retries: the number of times to retry a failed request, which defaults to the
+        configured number
+    :return: the shared requests session
+    :rtype: requests.Session
+    """
+    if _sessions_pid != os.getpid():
+        # This handles the forks on Python versions without os.register_at_fork
+        _reset_sessions()
+
+    if retries is None:
+        retries = _session_config["retries"]
+    with _sessions_lock:
+        key = (host, retries)
+        if key not in _sessions:
+            _sessions[key] = get_requests_session(
+                pool_size=_session_config["pool_size"],
+                pool_block=_session_config["pool_block"],
+                keep_alive=_session_config["keep_alive"],
+                retries=retries,
+            )
+        return _sessions[key]
+
+
+def get_timeout():
+    """
+    Get the configured timeout for requests made with the shared sessions.
+
+    :return: the number of seconds to wait for the server before giving up
+    :rtype: float
+    """
+    return _session_config["timeout"]
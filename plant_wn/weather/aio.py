@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+
+from plant_wn.exceptions import AppError, WeatherAPIError
+
+log = logging.getLogger(__name__)
+
+# The result of fetching the forecast of a location. When the forecast could not be determined,
+# ``weather_api`` is None and ``error`` is the exception that was raised.
+FetchResult = collections.namedtuple("FetchResult", ("coordinates", "weather_api", "error"))
+
+
+class AsyncWeatherAPI:
+    """
+    The asyncio counterpart of BaseWeatherAPI.
+
+    The wrapped weather API is synchronous, so its methods are run in an executor to allow many
+    requests to the provider to be in flight at once without blocking the event loop.
+    """
+
+    def __init__(self, weather_api, executor=None):
+        """
+        Initialize the AsyncWeatherAPI.
+
+        :param BaseWeatherAPI weather_api: the weather API to run asynchronously
+        :param concurrent.futures.Executor executor: the executor to run the weather API in or
+            None to use the event loop's default executor
+        """
+        self.weather_api = weather_api
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def get_forecast(self):
+        """
+        Get the forecast from the cache or the external service.
+
+        :return: the forecast of the wrapped weather API
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return await self._run(getattr, self.weather_api, "forecast")
+
+    async def get_forecast_dates(self):
+        """
+        Get the date of each day of the forecast.
+
+        :return: a list of dates where the first index is today
+        :rtype: list(datetime.date)
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return await self._run(self.weather_api.get_forecast_dates)
+
+    async def get_precipitation_forecast(self):
+        """
+        Get the daily precipitation accumulation forecast in inches.
+
+        :return: a list of floats where the first index is today
+        :rtype: list(float)
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return await self._run(self.weather_api.get_precipitation_forecast)
+
+    async def get_temperature_forecast(self):
+        """
+        Get the daily temperature forecast in Fahrenheit.
+
+        :return: a list of tuples of the minimum and maximum temperatures where the first index is
+            today
+        :rtype: list(tuple)
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return await self._run(self.weather_api.get_temperature_forecast)
+
+    async def get_wind_forecast(self):
+        """
+        Get the daily maximum wind forecast in miles per hour.
+
+        :return: a list of floats where the first index is today
+        :rtype: list(float)
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return await self._run(self.weather_api.get_wind_forecast)
+
+
+async def iter_forecasts(weather_api_cls, coordinates, concurrency=16, **kwargs):
+    """
+    Fetch the forecasts of many locations with at most ``concurrency`` requests in flight.
+
+    The locations are consumed lazily from the iterable, so it may be a generator over a large
+    number of locations.
+
+    :param type weather_api_cls: the BaseWeatherAPI subclass to get the forecasts with
+    :param iterable coordinates: the coordinates of the locations
+    :param int concurrency: the maximum number of forecasts to fetch at once
+    :param kwargs: the keyword arguments to pass to ``weather_api_cls``
+    :return: an asynchronous generator of the results in the order they complete, where any
+        exception other than an AppError is converted to a WeatherAPIError
+    :rtype: AsyncGenerator(FetchResult)
+    """
+
+    async def fetch(location, executor):
+        try:
+            weather_api = weather_api_cls(location, **kwargs)
+            await AsyncWeatherAPI(weather_api, executor).get_forecast()
+        except AppError as error:
+            return FetchResult(location, None, error)
+        except Exception as e:
+            # A bug or an unexpected response of a provider only fails the location
+            log.exception("Unexpected error getting the forecast of %s", location)
+            return FetchResult(location, None, WeatherAPIError(f"Unexpected error: {e}"))
+        return FetchResult(location, weather_api, None)
+
+    locations = iter(coordinates)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    try:
+        while True:
+            # Keep the window of in-flight requests full
+            for location in locations:
+                pending.add(asyncio.ensure_future(fetch(location, executor)))
+                if len(pending) >= concurrency:
+                    break
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        executor.shutdown(wait=False)
+
+
+def fetch_forecasts(weather_api_cls, coordinates, concurrency=16, **kwargs):
+    """
+    Fetch the forecasts of many locations concurrently from synchronous code.
+
+    :param type weather_api_cls: the BaseWeatherAPI subclass to get the forecasts with
+    :param iterable coordinates: the coordinates of the locations
+    :param int concurrency: the maximum number of forecasts to fetch at once
+    :param kwargs: the keyword arguments to pass to ``weather_api_cls``
+    :return: the results in the order they completed
+    :rtype: list(FetchResult)
+    """
+
+    async def collect():
+        return [
+            result
+            async for result in iter_forecasts(weather_api_cls, coordinates, concurrency, **kwargs)
+        ]
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(collect())
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
@@ -1,13 +1,27 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import abc
+import logging
+import time
 
-from plant_wn.requests_utils import get_requests_session
+from plant_wn.requests_utils import get_shared_session, get_timeout
+from plant_wn.weather.forecast import Forecast
+from plant_wn.weather.singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Coalesces the concurrent fetches of the forecast of the same location in the process
+_forecast_flight = SingleFlight()
 
 
 class BaseWeatherAPI(abc.ABC):
     """The base class for all weather APIs."""
 
-    def __init__(self, coordinates, api_key=None):
+    # The host of the external service, which determines the shared requests session to use
+    host = None
+    # The name of the weather provider, which is used in the forecast cache keys
+    name = None
+
+    def __init__(self, coordinates, api_key=None, cache=None):
         """
         Initialize the BaseWeatherAPI subclass.
 
@@ -15,12 +29,106 @@ class BaseWeatherAPI(abc.ABC):
             and the second value is the latitude.
         :param str api_key: an optional API key to use when getting the weather from an external
             service.
+        :param BaseForecastCache cache: an optional cache to get the forecast from before getting
+            it from the external service.
         """
         self.api_key = api_key
+        self.cache = cache
         self.coordinates = coordinates
-        self.session = get_requests_session()
+        # The epoch time the forecast was fetched from the external service by this object, which
+        # is None when it came from the cache or from the fetch of another object
+        self.fetched_at = None
+        self.session = get_shared_session(self.host)
+        self.timeout = get_timeout()
+
+    @property
+    def forecast(self):
+        """
+        Get the forecast from the cache or the external service.
+
+        Concurrent callers in the process that need the forecast of the same location share a
+        single fetch from the external service.
+
+        raises WeatherAPIError: if the forecast could not be determined.
+        """
+        if getattr(self, "_forecast", None) is None:
+            forecast = None
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.get_key(self.name, self.coordinates)
+                forecast = self._get_cached_forecast(cache_key)
+                flight_key = cache_key
+            else:
+                flight_key = (self.name, tuple(self.coordinates))
+
+            if forecast is None:
+                forecast = _forecast_flight.do(flight_key, lambda: self._load_forecast(cache_key))
+
+            self._forecast = forecast
+
+        return self._forecast
+
+    def _get_cached_forecast(self, cache_key):
+        """
+        Get the forecast from the cache.
+
+        :param str cache_key: the cache key of the forecast
+        :return: the forecast or None if it is not cached or the cached forecast is invalid
+        :rtype: Forecast
+        """
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+
+        try:
+            return Forecast.from_json(cached)
+        except ValueError:
+            log.warning("Ignoring the invalid cached forecast of %s", cache_key, exc_info=True)
+            return None
+
+    def _load_forecast(self, cache_key):
+        """
+        Fetch the forecast and store it in the cache.
+
+        The cache is checked again since another process may have fetched the forecast while this
+        process was waiting.
+
+        :param str cache_key: the cache key of the forecast or None if there is no cache
+        :return: the forecast
+        :raises WeatherAPIError: if the forecast could not be determined.
+        """
+        if self.cache is not None:
+            forecast = self._get_cached_forecast(cache_key)
+            if forecast is not None:
+                return forecast
+
+        forecast = self.fetch_forecast()
+        self.fetched_at = time.time()
+        if self.cache is not None:
+            self.cache.set(cache_key, forecast.to_json())
+        return forecast
 
     @abc.abstractmethod
+    def fetch_forecast(self):
+        """
+        Fetch the forecast from the external service without using the cache.
+
+        :return: the forecast parsed from the response of the external service
+        :rtype: Forecast
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return  # pragma: no cover
+
+    def get_forecast_dates(self):
+        """
+        Get the date of each day of the forecast.
+
+        :return: a list of dates where the first index is today
+        :rtype: list(datetime.date)
+        :raises WeatherAPIError: if the forecast cannot be determined.
+        """
+        return self.forecast.get_dates()
+
     def get_precipitation_forecast(self):
         """
         Get the daily precipitation accumulation forecast in inches.
@@ -30,9 +138,8 @@ class BaseWeatherAPI(abc.ABC):
         :rtype: list(float)
         :raises WeatherAPIError: if the forecast cannot be determined.
         """
-        return  # pragma: no cover
+        return self.forecast.precipitation.tolist()
 
-    @abc.abstractmethod
     def get_temperature_forecast(self):
         """
         Get the daily temperature forecast in Fahrenheit.
@@ -43,9 +150,9 @@ class BaseWeatherAPI(abc.ABC):
         :rtype: list(tuple)
         :raises WeatherAPIError: if the forecast cannot be determined.
         """
-        return  # pragma: no cover
+        forecast = self.forecast
+        return list(zip(forecast.min_temp, forecast.max_temp))
 
-    @abc.abstractmethod
     def get_wind_forecast(self):
         """
         Get the daily maximum wind forecast in miles per hour.
@@ -55,4 +162,4 @@ class BaseWeatherAPI(abc.ABC):
         :rtype: list(float)
         :raises WeatherAPIError: if the forecast cannot be determined.
         """
-        return  # pragma: no cover
+        return self.forecast.max_wind.tolist()
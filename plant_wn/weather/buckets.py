@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import math
+
+# The mean radius of the Earth in kilometers
+EARTH_RADIUS = 6371.0
+# The number of kilometers in a degree of latitude
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+# The number of decimal places the centers of the cells are rounded to, which is about 11 meters
+_PRECISION = 4
+
+
+def get_cell_center(coordinates, radius):
+    """
+    Get the center of the cell of the grid that the location is in.
+
+    The grid has rows of the same height in degrees of latitude. Each row is divided into cells
+    whose width in degrees of longitude is widened by the latitude of the row's edge closest to
+    the equator, so that no cell is wider than it is high in kilometers. The cells are squares of
+    ``radius × √2`` kilometers at most, so every location in a cell is within about the radius of
+    the cell's center.
+
+    The grid only depends on the radius, so the same location always has the same center across
+    runs, processes and shards of a run.
+
+    :param tuple coordinates: the (latitude, longitude) of the location
+    :param float radius: the maximum number of kilometers between a location and its cell's center
+    :return: the (latitude, longitude) of the center of the cell
+    :rtype: tuple(float, float)
+    """
+    latitude, longitude = coordinates
+    side = radius * math.sqrt(2)
+    row_height = side / _KM_PER_DEGREE
+    row = math.floor(latitude / row_height)
+    # The edge of the row closest to the equator is where the cells are the widest
+    min_latitude = min(abs(row * row_height), abs((row + 1) * row_height), 90)
+    cosine = math.cos(math.radians(min_latitude))
+    if cosine * 360 * _KM_PER_DEGREE <= side:
+        # Near the poles, the whole row is a single cell
+        center_longitude = 0.0
+    else:
+        column_width = side / (_KM_PER_DEGREE * cosine)
+        center_longitude = (math.floor(longitude / column_width) + 0.5) * column_width
+        # The cells at the antimeridian may have their center past it
+        if center_longitude > 180:
+            center_longitude -= 360
+    center_latitude = max(-90.0, min(90.0, (row + 0.5) * row_height))
+    return (round(center_latitude, _PRECISION), round(center_longitude, _PRECISION))
@@ -0,0 +1,196 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# The version of the format of the cached forecasts, which is part of the cache keys so that the
+# entries in an older format are never read. Increment this when ``Forecast.to_json`` changes.
+FORMAT_VERSION = 2
+
+
+class BaseForecastCache(abc.ABC):
+    """The base class for all forecast caches."""
+
+    def __init__(self, ttl=10800, max_entries=50000, precision=2):
+        """
+        Initialize the BaseForecastCache subclass.
+
+        :param int ttl: the number of seconds a cached forecast is valid for
+        :param int max_entries: the maximum number of forecasts to keep in the cache
+        :param int precision: the number of decimal places to round the coordinates to in the
+            cache key. Two decimal places is roughly one kilometer.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+
+    def get_key(self, provider, coordinates):
+        """
+        Get the cache key for the forecast of the coordinates from the provider.
+
+        :param str provider: the name of the weather provider
+        :param tuple(float, float) coordinates: the latitude and longitude of the location
+        :return: the cache key
+        :rtype: str
+        """
+        # Adding 0.0 normalizes -0.0 to 0.0 so that both round to the same key
+        latitude, longitude = (
+            f"{round(float(value), self.precision) + 0.0:.{self.precision}f}"
+            for value in coordinates
+        )
+        return f"{provider}:v{FORMAT_VERSION}:{latitude}:{longitude}"
+
+    @abc.abstractmethod
+    def get(self, key):
+        """
+        Get the cached forecast.
+
+        :param str key: the cache key as returned from ``get_key``
+        :return: the cached forecast or None if it is not cached or has expired
+        """
+        return  # pragma: no cover
+
+    @abc.abstractmethod
+    def set(self, key, forecast):
+        """
+        Cache the forecast.
+
+        :param str key: the cache key as returned from ``get_key``
+        :param forecast: the JSON serializable forecast to cache
+        """
+        return  # pragma: no cover
+
+
+class SQLiteForecastCache(BaseForecastCache):
+    """A forecast cache stored in a SQLite database that can be shared by processes on a host."""
+
+    def __init__(self, path, **kwargs):
+        """
+        Initialize the SQLiteForecastCache.
+
+        :param str path: the path to the SQLite database file, which is created if it is missing
+        :param kwargs: the keyword arguments to pass to ``BaseForecastCache``
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        # Evicting requires sorting the table, so it is only done after this many insertions
+        self._eviction_interval = max(self.max_entries // 10, 1)
+        self._insertions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """
+        Get the SQLite connection of the current thread.
+
+        A new connection is created after a fork since SQLite connections must not be shared
+        between processes.
+
+        :rtype: sqlite3.Connection
+        """
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # Write-ahead logging allows readers in other processes while a forecast is written
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS forecasts "
+                "(key TEXT PRIMARY KEY, forecast TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_forecasts_expires_at ON forecasts (expires_at)"
+            )
+            self._local.connection = connection
+            self._local.pid = pid
+
+        return self._local.connection
+
+    def get(self, key):
+        """
+        Get the cached forecast.
+
+        :param str key: the cache key as returned from ``get_key``
+        :return: the cached forecast or None if it is not cached, has expired or is undecodable
+        """
+        try:
+            row = self.connection.execute(
+                "SELECT forecast FROM forecasts WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            log.exception("Failed to read the forecast cache at %s", self.path)
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            log.warning("Removing the undecodable forecast %s from the forecast cache", key)
+            try:
+                self.connection.execute("DELETE FROM forecasts WHERE key = ?", (key,))
+            except sqlite3.Error:
+                log.exception("Failed to write to the forecast cache at %s", self.path)
+            return None
+
+    def set(self, key, forecast):
+        """
+        Cache the forecast and evict the expired and oldest forecasts when necessary.
+
+        :param str key: the cache key as returned from ``get_key``
+        :param forecast: the JSON serializable forecast to cache
+        """
+        try:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO forecasts (key, forecast, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(forecast), time.time() + self.ttl),
+            )
+        except sqlite3.Error:
+            log.exception("Failed to write to the forecast cache at %s", self.path)
+            return
+
+        with self._lock:
+            self._insertions += 1
+            evict = self._insertions % self._eviction_interval == 0
+
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Remove the expired forecasts and the oldest forecasts past the maximum size."""
+        try:
+            self.connection.execute("DELETE FROM forecasts WHERE expires_at <= ?", (time.time(),))
+            self.connection.execute(
+                "DELETE FROM forecasts WHERE key IN (SELECT key FROM forecasts "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        except sqlite3.Error:
+            log.exception("Failed to evict forecasts from the forecast cache at %s", self.path)
+
+
+def get_forecast_cache(config):
+    """
+    Create the forecast cache from the configuration.
+
+    :param dict config: the dict containing the plant_wn config
+    :return: the forecast cache or None if it is not configured
+    :rtype: BaseForecastCache or None
+    """
+    if not config.get("PLANT_WN_FORECAST_CACHE_PATH"):
+        return None
+
+    return SQLiteForecastCache(
+        config["PLANT_WN_FORECAST_CACHE_PATH"],
+        ttl=config["PLANT_WN_FORECAST_CACHE_TTL"],
+        max_entries=config["PLANT_WN_FORECAST_CACHE_MAX_ENTRIES"],
+        precision=config["PLANT_WN_FORECAST_CACHE_PRECISION"],
+    )
@@ -0,0 +1,307 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from plant_wn.exceptions import WeatherAPIError
+from plant_wn.requests_utils import get_shared_session
+from plant_wn.weather.base import BaseWeatherAPI
+
+log = logging.getLogger(__name__)
+
+# The number of recent latencies of a provider that its hedge delay is computed from
+_LATENCY_SAMPLES = 200
+# The number of latencies of a provider that are needed before they determine its hedge delay
+# and its place in the order of the providers
+_MIN_LATENCY_SAMPLES = 20
+# The weight of the latest request in the moving average of the error rate of a provider
+_ERROR_RATE_WEIGHT = 0.1
+# The maximum number of requests to a provider in flight at once in the process. The requests
+# beyond it are queued in the provider's executor, so a slow provider never holds up the hedged
+# requests to the others.
+_MAX_WORKERS_PER_PROVIDER = 16
+
+# The health of the providers keyed by their names, which is shared by the process
+_health = {}
+_health_lock = threading.Lock()
+# The threads that make the requests to each provider keyed by its name, so that a request can be
+# waited on for only as long as the hedge delay
+_executors = {}
+# The process that created the shared state. The executors' threads don't exist in forked
+# processes such as gunicorn workers.
+_state_pid = os.getpid()
+
+
+class ProviderHealth:
+    """The recent latencies and error rate of a weather provider."""
+
+    def __init__(self):
+        """Initialize the ProviderHealth."""
+        self._latencies = collections.deque(maxlen=_LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+        self.error_rate = 0.0
+
+    def record_success(self, latency):
+        """
+        Record a request that returned a valid forecast.
+
+        :param float latency: the number of seconds the request took
+        """
+        with self._lock:
+            self._latencies.append(latency)
+            self.error_rate *= 1 - _ERROR_RATE_WEIGHT
+
+    def record_failure(self):
+        """Record a request that didn't return a valid forecast."""
+        with self._lock:
+            self.error_rate = self.error_rate * (1 - _ERROR_RATE_WEIGHT) + _ERROR_RATE_WEIGHT
+
+    def get_latency(self, percentile):
+        """
+        Get the percentile of the recent latencies.
+
+        :param float percentile: the percentile between 0 and 100
+        :return: the number of seconds or None if there aren't enough latencies yet
+        :rtype: float or None
+        """
+        with self._lock:
+            if len(self._latencies) < _MIN_LATENCY_SAMPLES:
+                return None
+            return float(np.percentile(self._latencies, percentile))
+
+    def get_expected_latency(self):
+        """
+        Get the expected number of seconds until the provider returns a valid forecast.
+
+        This is the median latency divided by the success rate so that a fast provider that often
+        fails is ordered after a slower one that doesn't.
+
+        :return: the number of seconds or None if there aren't enough latencies yet
+        :rtype: float or None
+        """
+        median = self.get_latency(50)
+        if median is None:
+            return None
+        return median / max(1 - self.error_rate, 0.01)
+
+
+def _reset_state():
+    """Forget the health and the executors of the parent process after a fork."""
+    global _health, _health_lock, _executors, _state_pid
+
+    _health = {}
+    _health_lock = threading.Lock()
+    _executors = {}
+    _state_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_state)
+
+
+def get_provider_health(name):
+    """
+    Get the health of the weather provider shared by the process.
+
+    :param str name: the name of the weather provider
+    :return: the health of the provider
+    :rtype: ProviderHealth
+    """
+    if _state_pid != os.getpid():
+        # This handles the forks on Python versions without os.register_at_fork
+        _reset_state()
+
+    with _health_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth()
+        return _health[name]
+
+
+def _fetch(provider, health):
+    """
+    Fetch the forecast from the provider and record the outcome in its health.
+
+    :param BaseWeatherAPI provider: the weather API of the provider
+    :param ProviderHealth health: the health of the provider
+    :return: the forecast
+    :rtype: Forecast
+    :raises WeatherAPIError: if the provider didn't return a valid forecast
+    """
+    start = time.monotonic()
+    try:
+        forecast = provider.fetch_forecast()
+        if not len(forecast):
+            raise WeatherAPIError(f"The forecast from {provider.name} was empty")
+    except Exception:
+        health.record_failure()
+        raise
+    health.record_success(time.monotonic() - start)
+    return forecast
+
+
+def _get_executor(name):
+    """
+    Get the executor that makes the requests to the provider.
+
+    :param str name: the name of the weather provider
+    :return: the executor shared by the process
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    if _state_pid != os.getpid():
+        # This handles the forks on Python versions without os.register_at_fork
+        _reset_state()
+
+    with _health_lock:
+        if name not in _executors:
+            _executors[name] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_MAX_WORKERS_PER_PROVIDER, thread_name_prefix=f"plant-wn-{name}"
+            )
+        return _executors[name]
+
+
+class CompositeWeatherAPI(BaseWeatherAPI):
+    """
+    A weather API that gets the forecast from the first of several providers to return one.
+
+    The providers are tried in the order of their health. If the first provider hasn't returned
+    the forecast within a percentile of its recent latencies, a hedged request is made to the next
+    provider and whichever valid forecast comes first is used. A provider that fails is failed over
+    to immediately.
+    """
+
+    name = "composite"
+
+    def __init__(
+        self,
+        coordinates,
+        api_key=None,
+        cache=None,
+        providers=(),
+        hedge_percentile=95,
+        hedge_delay=2,
+    ):
+        """
+        Initialize the CompositeWeatherAPI.
+
+        :param tuple(float, float) coordinates: a tuple where the first value is the longitude
+            and the second value is the latitude.
+        :param str api_key: unused since each provider has its own API key
+        :param BaseForecastCache cache: an optional cache to get the forecast from before getting
+            it from the providers. The forecasts of every provider share the same cache entry.
+        :param list providers: tuples of the BaseWeatherAPI subclass and the API key of each
+            provider in the order of preference, which must have different names
+        :param float hedge_percentile: the percentile of the recent latencies of a provider after
+            which a hedged request is made to the next provider
+        :param float hedge_delay: the number of seconds after which a hedged request is made while
+            there aren't enough recent latencies of the provider
+        """
+        super().__init__(coordinates, api_key=api_key, cache=cache)
+        if not providers:
+            raise ValueError("At least one weather provider must be configured")
+        names = [provider_cls.name for provider_cls, _ in providers]
+        if len(set(names)) != len(names):
+            # The providers share their health by name, so the same name would be hedged with itself
+            raise ValueError("The weather providers must have different names")
+        self.providers = [
+            provider_cls(coordinates, api_key=provider_api_key)
+            for provider_cls, provider_api_key in providers
+        ]
+        for provider in self.providers:
+            # A failed request is failed over to the next provider rather than retried, which
+            # would otherwise delay the failover by the backoff of the retries
+            provider.session = get_shared_session(provider.host, retries=0)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+
+    def get_ordered_providers(self):
+        """
+        Get the providers in the order they should be tried in.
+
+        The providers with enough recent latencies are ordered by their expected latency, followed
+        by the rest in the configured order.
+
+        :return: the weather APIs of the providers
+        :rtype: list(BaseWeatherAPI)
+        """
+
+        def get_key(indexed_provider):
+            index, provider = indexed_provider
+            expected_latency = get_provider_health(provider.name).get_expected_latency()
+            return (expected_latency is None, expected_latency or 0, index)
+
+        return [provider for _, provider in sorted(enumerate(self.providers), key=get_key)]
+
+    def get_hedge_delay(self, provider):
+        """
+        Get the number of seconds to wait for the provider before making a hedged request.
+
+        :param BaseWeatherAPI provider: the weather API of the provider
+        :return: the number of seconds
+        :rtype: float
+        """
+        latency = get_provider_health(provider.name).get_latency(self.hedge_percentile)
+        return self.hedge_delay if latency is None else latency
+
+    def fetch_forecast(self):
+        """
+        Fetch the forecast from the providers without using the cache.
+
+        The first valid forecast wins. The requests that are still queued are then cancelled and
+        the ones that are running are ignored. They run to completion in the background so that
+        their latency is still recorded.
+
+        :return: the first valid forecast returned by a provider
+        :rtype: Forecast
+        :raises WeatherAPIError: if none of the providers returned a valid forecast
+        """
+        remaining = self.get_ordered_providers()
+        in_flight = {}
+        errors = []
+        hedge_at = None
+
+        def start_next():
+            nonlocal hedge_at
+            provider = remaining.pop(0)
+            future = _get_executor(provider.name).submit(
+                _fetch, provider, get_provider_health(provider.name)
+            )
+            in_flight[future] = provider
+            hedge_at = time.monotonic() + self.get_hedge_delay(provider)
+
+        start_next()
+        try:
+            while in_flight:
+                timeout = max(hedge_at - time.monotonic(), 0) if remaining else None
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    log.debug(
+                        "Hedging the forecast request for %s with %s",
+                        self.coordinates,
+                        remaining[0].name,
+                    )
+                    start_next()
+                    continue
+
+                for future in done:
+                    provider = in_flight.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        log.warning("Failed to get the forecast from %s: %s", provider.name, e)
+                        errors.append(f"{provider.name}: {e}")
+                        if remaining:
+                            start_next()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        raise WeatherAPIError(
+            f"Failed to get the forecast from every weather provider ({'; '.join(errors)})"
+        )
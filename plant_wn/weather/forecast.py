@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from array import array
+import datetime
+
+
+class Forecast:
+    """
+    A provider-neutral daily forecast stored as columns.
+
+    Each column has a value per day where the first index is today. The values are stored in
+    arrays of doubles rather than in lists of objects to keep cached forecasts compact.
+    """
+
+    __slots__ = ("dates", "precipitation", "min_temp", "max_temp", "max_wind")
+
+    def __init__(self, dates=(), precipitation=(), min_temp=(), max_temp=(), max_wind=()):
+        """
+        Initialize the Forecast.
+
+        :param iterable dates: the ``datetime.date`` of each day
+        :param iterable precipitation: the precipitation accumulation of each day in inches
+        :param iterable min_temp: the minimum temperature of each day in Fahrenheit
+        :param iterable max_temp: the maximum temperature of each day in Fahrenheit
+        :param iterable max_wind: the maximum wind speed of each day in miles per hour
+        :raises ValueError: if the columns don't have the same length
+        """
+        # The dates are stored as their proleptic Gregorian ordinals
+        self.dates = array("l", (date.toordinal() for date in dates))
+        self.precipitation = array("d", precipitation)
+        self.min_temp = array("d", min_temp)
+        self.max_temp = array("d", max_temp)
+        self.max_wind = array("d", max_wind)
+        lengths = {len(getattr(self, column)) for column in self.__slots__}
+        if len(lengths) > 1:
+            raise ValueError("The columns of the forecast must have the same length")
+
+    def __eq__(self, other):
+        if not isinstance(other, Forecast):
+            return NotImplemented
+        return all(getattr(self, column) == getattr(other, column) for column in self.__slots__)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"<Forecast of {len(self)} day(s) starting on {self.get_dates()[:1]}>"
+
+    def get_dates(self):
+        """
+        Get the date of each day of the forecast.
+
+        :rtype: list(datetime.date)
+        """
+        return [datetime.date.fromordinal(ordinal) for ordinal in self.dates]
+
+    @classmethod
+    def from_json(cls, json_input):
+        """
+        Convert the JSON object from ``to_json`` to a Forecast object.
+
+        :param dict json_input: the JSON object representing the forecast
+        :return: the Forecast object
+        :rtype: Forecast
+        :raises ValueError: if the JSON object is not a valid forecast
+        """
+        forecast = cls.__new__(cls)
+        try:
+            forecast.dates = array("l", json_input["dates"])
+            for column in ("precipitation", "min_temp", "max_temp", "max_wind"):
+                setattr(forecast, column, array("d", json_input[column]))
+        except (KeyError, OverflowError, TypeError) as e:
+            raise ValueError(f"The forecast is invalid: {e!r}")
+
+        if len({len(getattr(forecast, column)) for column in cls.__slots__}) > 1:
+            raise ValueError("The columns of the forecast must have the same length")
+        return forecast
+
+    def to_json(self):
+        """
+        Serialize the Forecast object.
+
+        :return: the JSON object representing the forecast
+        :rtype: dict
+        """
+        return {column: getattr(self, column).tolist() for column in self.__slots__}
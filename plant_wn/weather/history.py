@@ -0,0 +1,292 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import contextlib
+import datetime
+import fcntl
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# The fixed-width little-endian type of each column. Each column of a partition is a file of the
+# packed values, so the row N of every column is at the offset N × the width of the column.
+COLUMNS = collections.OrderedDict(
+    (
+        ("latitude", np.dtype("<f8")),
+        ("longitude", np.dtype("<f8")),
+        # The epoch time the forecast was fetched
+        ("fetched_at", np.dtype("<f8")),
+        # The proleptic Gregorian ordinal of the forecasted day
+        ("date", np.dtype("<i4")),
+        ("precipitation", np.dtype("<f4")),
+        ("min_temp", np.dtype("<f4")),
+        ("max_temp", np.dtype("<f4")),
+        ("max_wind", np.dtype("<f4")),
+    )
+)
+# The directory of the lock files of the partitions, which serialize the appends and compactions.
+# They are kept outside of the partitions so that they aren't replaced when a partition is.
+_LOCKS_DIR = ".locks"
+
+# The rows of the history where each field is an array of a column
+History = collections.namedtuple("History", tuple(COLUMNS))
+
+
+def _empty_history():
+    return History(*(np.empty(0, dtype=dtype) for dtype in COLUMNS.values()))
+
+
+class ForecastHistory:
+    """
+    An append-only store of every forecast that was fetched, in columnar files partitioned by date.
+
+    Each partition is a directory named after the date the forecasts in it were fetched on, with a
+    file per column. Readers memory-map the column files, so the columns that a query doesn't
+    select rows from are never read in full. Appends and compactions of a partition take an
+    exclusive ``flock`` on a lock file of the partition so that the columns stay aligned across
+    processes.
+    """
+
+    def __init__(self, path, precision=4):
+        """
+        Initialize the ForecastHistory.
+
+        :param str path: the directory of the partitions, which is created if it doesn't exist
+        :param int precision: the number of decimal places the coordinates are rounded to so that
+            the history of a location can be looked up by its coordinates
+        """
+        self.path = path
+        self.precision = precision
+        os.makedirs(os.path.join(path, _LOCKS_DIR), exist_ok=True)
+
+    def _get_partition_path(self, date):
+        return os.path.join(self.path, date.isoformat())
+
+    @contextlib.contextmanager
+    def _lock(self, date):
+        lock_path = os.path.join(self.path, _LOCKS_DIR, date.isoformat())
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_partitions(self):
+        """
+        Get the dates of the partitions.
+
+        :return: the sorted dates
+        :rtype: list(datetime.date)
+        """
+        dates = []
+        for name in os.listdir(self.path):
+            try:
+                dates.append(datetime.datetime.strptime(name, "%Y-%m-%d").date())
+            except ValueError:
+                # Skip the lock files and the temporary directories of compactions
+                continue
+        return sorted(dates)
+
+    def append(self, forecasts, fetched_at=None):
+        """
+        Append the daily values of the forecasts to the partition of the day they were fetched.
+
+        :param iterable forecasts: tuples of the coordinates as a (latitude, longitude) tuple and
+            the ``plant_wn.weather.forecast.Forecast``
+        :param float fetched_at: the epoch time the forecasts were fetched, which defaults to now
+        :return: the number of rows that were appended
+        :rtype: int
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        columns = {column: [] for column in COLUMNS}
+        for (latitude, longitude), forecast in forecasts:
+            days = len(forecast)
+            columns["latitude"].append(np.full(days, round(latitude, self.precision)))
+            columns["longitude"].append(np.full(days, round(longitude, self.precision)))
+            columns["fetched_at"].append(np.full(days, fetched_at))
+            for column in ("date", "precipitation", "min_temp", "max_temp", "max_wind"):
+                # The dates are in the dates column of the forecast
+                values = forecast.dates if column == "date" else getattr(forecast, column)
+                columns[column].append(np.asarray(values))
+
+        if not columns["date"]:
+            return 0
+
+        arrays = {
+            column: np.concatenate(values).astype(COLUMNS[column])
+            for column, values in columns.items()
+        }
+        date = datetime.date.fromtimestamp(fetched_at)
+        partition_path = self._get_partition_path(date)
+        with self._lock(date):
+            os.makedirs(partition_path, exist_ok=True)
+            rows = self._get_row_count(partition_path)
+            for column, array in arrays.items():
+                with open(os.path.join(partition_path, column), "ab") as column_file:
+                    # Discard the rows of a column that are past the end of the shortest column,
+                    # which are the remains of an append that was interrupted
+                    column_file.truncate(rows * COLUMNS[column].itemsize)
+                    column_file.write(array.tobytes())
+        return len(arrays["date"])
+
+    @staticmethod
+    def _get_row_count(partition_path):
+        """
+        Get the number of complete rows in the partition.
+
+        :param str partition_path: the directory of the partition
+        :return: the number of rows that every column has
+        :rtype: int
+        """
+        counts = []
+        for column, dtype in COLUMNS.items():
+            try:
+                size = os.path.getsize(os.path.join(partition_path, column))
+            except FileNotFoundError:
+                return 0
+            counts.append(size // dtype.itemsize)
+        return min(counts)
+
+    def _map_partition(self, partition_path):
+        """
+        Memory-map the columns of the partition.
+
+        :param str partition_path: the directory of the partition
+        :return: the read-only arrays of the columns keyed by the column names
+        :rtype: dict
+        """
+        rows = self._get_row_count(partition_path)
+        if not rows:
+            return None
+        return {
+            column: np.memmap(
+                os.path.join(partition_path, column), dtype=dtype, mode="r", shape=(rows,)
+            )
+            for column, dtype in COLUMNS.items()
+        }
+
+    def query(self, coordinates=None, bounds=None, start=None, end=None):
+        """
+        Get the history of a location or a region.
+
+        :param tuple coordinates: the optional (latitude, longitude) of the location
+        :param tuple bounds: the optional (min latitude, min longitude, max latitude, max
+            longitude) of the region, which are inclusive
+        :param datetime.date start: the optional first date the forecasts were fetched on
+        :param datetime.date end: the optional last date the forecasts were fetched on
+        :return: the rows ordered by the date they were fetched on
+        :rtype: History
+        """
+        results = []
+        for date in self.get_partitions():
+            if (start and date < start) or (end and date > end):
+                continue
+
+            columns = self._map_partition(self._get_partition_path(date))
+            if columns is None:
+                continue
+
+            mask = np.ones(len(columns["date"]), dtype=bool)
+            if coordinates is not None:
+                mask &= columns["latitude"] == round(coordinates[0], self.precision)
+                mask &= columns["longitude"] == round(coordinates[1], self.precision)
+            if bounds is not None:
+                min_latitude, min_longitude, max_latitude, max_longitude = bounds
+                mask &= (columns["latitude"] >= min_latitude) & (
+                    columns["latitude"] <= max_latitude
+                )
+                mask &= (columns["longitude"] >= min_longitude) & (
+                    columns["longitude"] <= max_longitude
+                )
+            # Indexing with the mask copies the selected rows out of the mapped files
+            results.append([columns[column][mask] for column in COLUMNS])
+
+        if not results:
+            return _empty_history()
+        return History(*(np.concatenate(arrays) for arrays in zip(*results)))
+
+    def apply_retention(self, retention_days, today=None):
+        """
+        Delete the partitions of the forecasts fetched more than the retention ago.
+
+        :param int retention_days: the number of days to keep the partitions for
+        :param datetime.date today: the current date, which defaults to today
+        :return: the dates of the deleted partitions
+        :rtype: list(datetime.date)
+        """
+        cutoff = (today or datetime.date.today()) - datetime.timedelta(days=retention_days)
+        deleted = [date for date in self.get_partitions() if date < cutoff]
+        for date in deleted:
+            with self._lock(date):
+                shutil.rmtree(self._get_partition_path(date))
+            os.remove(os.path.join(self.path, _LOCKS_DIR, date.isoformat()))
+        return deleted
+
+    def compact(self, date):
+        """
+        Rewrite the partition with only the latest fetch of each location and forecasted day.
+
+        The notifier may append the same cached forecast several times a day. The rows are also
+        sorted by the location so that the rows of a location are contiguous. The partition is
+        replaced by renaming a new directory, so this should only be done to the partitions that
+        are no longer appended to.
+
+        :param datetime.date date: the date of the partition
+        :return: the number of rows that were removed
+        :rtype: int
+        """
+        partition_path = self._get_partition_path(date)
+        with self._lock(date):
+            columns = self._map_partition(partition_path)
+            if columns is None:
+                return 0
+
+            rows = len(columns["date"])
+            # Sort by the location, the forecasted day and then the newest fetch first so that the
+            # first row of each group is the one to keep
+            order = np.lexsort(
+                (-columns["fetched_at"], columns["date"], columns["longitude"], columns["latitude"])
+            )
+            keys = np.stack(
+                [
+                    columns["latitude"][order],
+                    columns["longitude"][order],
+                    columns["date"][order].astype(np.float64),
+                ]
+            )
+            is_first = np.ones(rows, dtype=bool)
+            is_first[1:] = np.any(keys[:, 1:] != keys[:, :-1], axis=0)
+            keep = order[is_first]
+
+            temp_path = f"{partition_path}.compacting"
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+            for column in COLUMNS:
+                columns[column][keep].tofile(os.path.join(temp_path, column))
+            # Release the memory maps of the files that are replaced
+            del columns
+
+            old_path = f"{partition_path}.old"
+            os.rename(partition_path, old_path)
+            os.rename(temp_path, partition_path)
+        shutil.rmtree(old_path)
+        return rows - len(keep)
+
+
+def get_forecast_history(config):
+    """
+    Create the forecast history from the configuration.
+
+    :param dict config: the dict containing the plant_wn config
+    :return: the forecast history or None if it is not configured
+    :rtype: ForecastHistory or None
+    """
+    if not config.get("PLANT_WN_HISTORY_PATH"):
+        return None
+
+    return ForecastHistory(config["PLANT_WN_HISTORY_PATH"])
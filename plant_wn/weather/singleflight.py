@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+
+
+class _Call:
+    """An in-flight call whose result is shared with the callers waiting on it."""
+
+    __slots__ = ("done", "error", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into a single call.
+
+    The first caller for a key runs the function, and any caller for the same key that arrives
+    while it is running waits for it and shares its result or exception instead of running the
+    function again.
+    """
+
+    def __init__(self):
+        """Initialize the SingleFlight."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run the function unless a call with the same key is already in flight.
+
+        :param key: the hashable key that identifies the call
+        :param callable func: the function to call without arguments
+        :return: the return value of the function
+        :raises Exception: the exception raised by the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self):
+        """
+        Get the number of calls that are in flight.
+
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._calls)
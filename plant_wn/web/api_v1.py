@@ -1,44 +1,273 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import base64
+import binascii
+import itertools
+import json
+
 import flask
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from flask_jwt_extended import jwt_required
+import sqlalchemy
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import text
 from werkzeug.exceptions import NotFound, Unauthorized
 
 from plant_wn.web import models
 from plant_wn.web.app import db
-from plant_wn.exceptions import AppError
+from plant_wn.web.auth import create_token, get_current_user_id
+from plant_wn.web.bulk import apply_operations, export_plants, import_plants, validate_operations
+from plant_wn.web.json_utils import dumps, json_response
+from plant_wn.exceptions import AppError, ValidationError
 
 api_v1 = flask.Blueprint("api_v1", __name__)
+# The number of plants to read from the database at a time when streaming the plants
+_STREAM_BATCH_SIZE = 500
+
+
+def _decode_cursor(cursor):
+    """
+    Decode a cursor of the plants listing.
+
+    :param str cursor: the cursor from the ``next`` key of a previous page
+    :return: a tuple of the name and ID of the last plant of the previous page
+    :rtype: tuple(str, int)
+    :raises ValidationError: if the cursor is invalid
+    """
+    invalid_exception = ValidationError("The cursor is invalid")
+    try:
+        padded_cursor = cursor + "=" * (-len(cursor) % 4)
+        name, plant_id = json.loads(base64.urlsafe_b64decode(padded_cursor.encode("ascii")))
+    except (binascii.Error, TypeError, ValueError):
+        raise invalid_exception
+
+    if not isinstance(name, str) or type(plant_id) is not int:
+        raise invalid_exception
+
+    return name, plant_id
+
+
+def _encode_cursor(plant):
+    """
+    Encode the cursor of the page that follows the plant.
+
+    :param models.Plant plant: the last plant of the page
+    :return: the opaque cursor
+    :rtype: str
+    """
+    payload = dumps([plant.name, plant.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def _get_limit():
+    """
+    Get the validated ``limit`` query parameter.
+
+    :return: the maximum number of items to return or None if the parameter was not set
+    :rtype: int or None
+    :raises ValidationError: if the parameter is invalid
+    """
+    limit = flask.request.args.get("limit")
+    if limit is None:
+        return None
+
+    max_limit = flask.current_app.config["PLANT_WN_PLANTS_MAX_LIMIT"]
+    invalid_exception = ValidationError(f"The limit must be an integer between 1 and {max_limit}")
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise invalid_exception
+
+    if not 1 <= limit <= max_limit:
+        raise invalid_exception
+
+    return limit
+
+
+def _get_plants_version(user_id):
+    """
+    Get the version of the user's plants.
+
+    :param int user_id: the ID of the user
+    :return: the version that is incremented on every change to the user's plants
+    :rtype: int
+    :raises werkzeug.exceptions.NotFound: if the user doesn't exist
+    """
+    plants_version = db.session.query(models.User.plants_version).filter_by(id=user_id).scalar()
+    if plants_version is None:
+        raise NotFound()
+    return plants_version
+
+
+def _set_cache_headers(response, etag):
+    """
+    Set the headers that allow clients to revalidate the response.
+
+    :param flask.Response response: the response to set the headers on
+    :param str etag: the strong ETag of the response
+    :return: the input response
+    :rtype: flask.Response
+    """
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    return response
 
 
 @api_v1.route("/plants")
 @jwt_required
 def get_plants():
     """
-    Retrieve the user's plants.
+    Retrieve the user's plants ordered by name.
+
+    When the ``limit`` query parameter is set, the response is a page of plants with a ``next``
+    key set to the cursor of the following page or None if it is the last page. The cursor is then
+    passed as the ``cursor`` query parameter to get the following page.
+
+    When the request accepts ``application/x-ndjson`` over ``application/json``, the plants are
+    streamed as newline-delimited JSON as they are read from the database. A page of plants is
+    read before it is sent instead, and the cursor of the following page is then set in the
+    ``X-Next-Cursor`` header unless it is the last page.
+
+    The response has an ETag based on the user's plants version, so a request with a matching
+    ``If-None-Match`` header gets a 304 response without the plants being queried. Otherwise, the
+    version is read in the same query as the plants.
 
     :rtype: flask.Response
+    :raises ValidationError: if the query parameters are invalid
     """
-    username = get_jwt_identity()
-    user_id = db.session.query(models.User.id).filter_by(username=username).scalar()
-    if not user_id:
-        raise NotFound()
+    user_id = get_current_user_id()
+    # The query parameters are validated first so that an invalid request is never answered with
+    # a 304
+    limit = _get_limit()
+    cursor = flask.request.args.get("cursor")
+    after = _decode_cursor(cursor) if cursor else None
+    best_mimetype = flask.request.accept_mimetypes.best_match(
+        ("application/json", "application/x-ndjson")
+    )
+    is_streamed = best_mimetype == "application/x-ndjson"
 
-    plants = (
-        db.session.query(models.Plant)
-        .filter_by(user_id=user_id)
-        .options(
-            joinedload(models.Plant.max_precipitation),
-            joinedload(models.Plant.max_temp),
-            joinedload(models.Plant.min_temp),
-            joinedload(models.Plant.max_wind),
-            joinedload(models.Plant.zip_code),
+    def get_etag(plants_version):
+        # The ETag is scoped to the user and the representation since the URL is the same for both
+        return f"{user_id}.{plants_version}.{'ndjson' if is_streamed else 'json'}"
+
+    # Only a revalidation needs the version before the plants are queried
+    if flask.request.if_none_match:
+        etag = get_etag(_get_plants_version(user_id))
+        if flask.request.if_none_match.contains(etag):
+            return _set_cache_headers(flask.Response(status=304), etag)
+
+    # The version is read in the same statement as the plants so that listing them is a single
+    # round trip and the ETag always matches the plants that were read
+    plants_version = (
+        sqlalchemy.select([models.User.plants_version]).where(models.User.id == user_id).as_scalar()
+    )
+    query = (
+        db.session.query(models.Plant, plants_version)
+        .filter(models.Plant.user_id == user_id)
+        .options(joinedload(models.Plant.zip_code))
+        .order_by(models.Plant.name, models.Plant.id)
+    )
+
+    if after is not None:
+        name, plant_id = after
+        query = query.filter(
+            sqlalchemy.or_(
+                models.Plant.name > name,
+                sqlalchemy.and_(models.Plant.name == name, models.Plant.id > plant_id),
+            )
+        )
+
+    def get_rows_etag(rows):
+        # Without any plants to read the version from, it is looked up on its own
+        return get_etag(rows[0][1] if rows else _get_plants_version(user_id))
+
+    if is_streamed and limit is None:
+        rows = iter(query.yield_per(_STREAM_BATCH_SIZE))
+        # The first row is read before the response is started since the ETag is a header
+        first_rows = list(itertools.islice(rows, 1))
+
+        def generate_plants():
+            for plant, _ in itertools.chain(first_rows, rows):
+                yield dumps(plant.to_json()) + "\n"
+
+        response = flask.Response(
+            flask.stream_with_context(generate_plants()), mimetype="application/x-ndjson"
         )
-        .order_by(models.Plant.name)
-        .all()
+        return _set_cache_headers(response, get_rows_etag(first_rows))
+
+    if limit is None:
+        rows = query.all()
+        response = json_response({"items": [plant.to_json() for plant, _ in rows]})
+        return _set_cache_headers(response, get_rows_etag(rows))
+
+    # Query an extra plant to determine if there is a following page
+    rows = query.limit(limit + 1).all()
+    plants = [plant for plant, _ in rows]
+    next_cursor = None
+    if len(plants) > limit:
+        plants = plants[:limit]
+        next_cursor = _encode_cursor(plants[-1])
+
+    if is_streamed:
+        response = flask.Response(
+            (dumps(plant.to_json()) + "\n" for plant in plants), mimetype="application/x-ndjson"
+        )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        response = json_response(
+            {"items": [plant.to_json() for plant in plants], "next": next_cursor}
+        )
+    return _set_cache_headers(response, get_rows_etag(rows))
+
+
+@api_v1.route("/plants/batch", methods=["POST"])
+@jwt_required
+def batch_plants():
+    """
+    Apply many create, update_thresholds and delete operations on the user's plants at once.
+
+    All the operations are validated before any are applied, and they are then applied in a single
+    transaction.
+
+    :rtype: flask.Response
+    :raises ValidationError: if any of the operations are invalid
+    """
+    user_id = get_current_user_id()
+    json_input = flask.request.get_json(force=True)
+    if not isinstance(json_input, dict) or json_input.keys() != {"operations"}:
+        raise ValidationError("The input JSON must be an object with only the operations key")
+
+    operations = json_input["operations"]
+    max_operations = flask.current_app.config["PLANT_WN_PLANTS_BATCH_MAX_OPERATIONS"]
+    validate_operations(user_id, operations, max_operations)
+    return flask.jsonify({"results": apply_operations(user_id, operations)})
+
+
+@api_v1.route("/plants/export")
+@jwt_required
+def export_user_plants():
+    """
+    Export the user's plants as newline-delimited JSON.
+
+    :rtype: flask.Response
+    """
+    user_id = get_current_user_id()
+    return flask.Response(
+        flask.stream_with_context(export_plants(user_id)), mimetype="application/x-ndjson"
     )
-    return flask.jsonify({"items": [plant.to_json() for plant in plants]})
+
+
+@api_v1.route("/plants/import", methods=["POST"])
+@jwt_required
+def import_user_plants():
+    """
+    Import plants for the user from newline-delimited JSON in the request body.
+
+    :rtype: tuple(flask.Response, int)
+    :raises ValidationError: if a line of the request body is invalid
+    """
+    user_id = get_current_user_id()
+    count = import_plants(user_id, flask.request.stream)
+    return flask.jsonify({"imported": count}), 201
 
 
 @api_v1.route("/healthcheck")
@@ -74,7 +303,9 @@ def login():
         raise Unauthorized("The username or password was incorrect. Please try again.")
 
     user.validate_password(json_input["password"])
-    access_token = create_access_token(identity=user.username)
+    # Persist the password hash if it was replaced due to a change in the work factor
+    db.session.commit()
+    access_token = create_token(user)
     return flask.jsonify({"token": access_token})
 
 
@@ -9,8 +9,10 @@ from flask_migrate import Migrate
 from werkzeug.exceptions import default_exceptions, HTTPException
 
 from plant_wn.exceptions import AppError, ConfigError, ValidationError
+from plant_wn.requests_utils import configure_sessions
 from plant_wn.web import db
 from plant_wn.web.api_v1 import api_v1
+from plant_wn.web.passwords import configure_password_hashing
 
 # Import the models here so that Alembic will be guaranteed to detect them
 import plant_wn.web.models  # noqa: F401
@@ -44,6 +46,9 @@ def validate_api_config(config):
     if config["ENV"] != "development" and config["SECRET_KEY"] == "change-me":
         raise ConfigError("SECRET_KEY cannot use the default value in production")
 
+    if config["PLANT_WN_COORDINATES_API"] not in ("gazetteer", "opendatasoft"):
+        raise ConfigError('PLANT_WN_COORDINATES_API must be "gazetteer" or "opendatasoft"')
+
 
 def create_app(config_obj=None):  # pragma: no cover
     """
@@ -73,6 +78,23 @@ def create_app(config_obj=None):  # pragma: no cover
         # Add the Flask handler that streams to WSGI stderr
         logger.addHandler(default_handler)
 
+    # Configure the HTTP sessions shared by the weather and coordinates APIs
+    configure_sessions(
+        pool_size=app.config["PLANT_WN_HTTP_POOL_SIZE"],
+        pool_block=app.config["PLANT_WN_HTTP_POOL_BLOCK"],
+        keep_alive=app.config["PLANT_WN_HTTP_KEEP_ALIVE"],
+        timeout=app.config["PLANT_WN_HTTP_TIMEOUT"],
+        retries=app.config["PLANT_WN_HTTP_RETRIES"],
+    )
+
+    # Configure the process pool that hashes passwords off of the request threads
+    configure_password_hashing(
+        workers=app.config["PLANT_WN_PASSWORD_WORKERS"],
+        queue_size=app.config["PLANT_WN_PASSWORD_QUEUE_SIZE"],
+        rounds=app.config["PLANT_WN_PASSWORD_ROUNDS"],
+        retry_after=app.config["PLANT_WN_PASSWORD_RETRY_AFTER"],
+    )
+
     # Initialize the database
     db.init_app(app)
     # Initialize the database migrations
@@ -104,6 +126,10 @@ def json_error(error):
             msg = error.description
         response = jsonify({"error": msg})
         response.status_code = error.code
+        # Keep the headers of the exception such as Retry-After
+        for header, value in error.get_headers():
+            if header.lower() != "content-type":
+                response.headers[header] = value
     else:
         status_code = 500
         msg = str(error)
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+import time
+
+import flask
+from flask_jwt_extended import create_access_token, get_jwt_claims, get_jwt_identity
+from werkzeug.exceptions import NotFound
+
+from plant_wn.web import db, models
+
+# The maximum number of usernames to cache the user IDs of for tokens without the uid claim
+_USER_ID_CACHE_SIZE = 1024
+# A cache of the usernames to tuples of the user ID and when the entry expires
+_user_id_cache = {}
+_user_id_cache_lock = threading.Lock()
+
+
+def create_token(user):
+    """
+    Create an access token for the user.
+
+    The user ID is stored in the signed uid claim so that authenticated requests don't need to
+    look up the user by the username.
+
+    :param models.User user: the user to create the token for
+    :return: the encoded access token
+    :rtype: str
+    """
+    return create_access_token(identity=user.username, user_claims={"uid": user.id})
+
+
+def get_current_user_id():
+    """
+    Get the ID of the user of the access token of the current request.
+
+    Tokens issued before the uid claim was added fall back to looking up the user by the
+    username, which is cached for ``PLANT_WN_USER_ID_CACHE_TTL`` seconds.
+
+    :return: the ID of the user
+    :rtype: int
+    :raises werkzeug.exceptions.NotFound: if the user of a token without the uid claim doesn't
+        exist
+    """
+    user_id = get_jwt_claims().get("uid")
+    # bool is a subclass of int but is not a valid ID
+    if type(user_id) is int:
+        return user_id
+
+    username = get_jwt_identity()
+    now = time.monotonic()
+    with _user_id_cache_lock:
+        cached = _user_id_cache.get(username)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    user_id = db.session.query(models.User.id).filter_by(username=username).scalar()
+    if not user_id:
+        raise NotFound()
+
+    expires_at = now + flask.current_app.config["PLANT_WN_USER_ID_CACHE_TTL"]
+    with _user_id_cache_lock:
+        if len(_user_id_cache) >= _USER_ID_CACHE_SIZE:
+            # Make room by removing the expired entries, or all of them if none have expired
+            for key in [key for key, value in _user_id_cache.items() if value[1] <= now]:
+                del _user_id_cache[key]
+            if len(_user_id_cache) >= _USER_ID_CACHE_SIZE:
+                _user_id_cache.clear()
+        _user_id_cache[username] = (user_id, expires_at)
+
+    return user_id
@@ -0,0 +1,365 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import json
+import time
+
+import sqlalchemy
+
+from plant_wn.exceptions import ValidationError
+from plant_wn.web import db, models
+from plant_wn.web.json_utils import dumps
+from plant_wn.web.sql_utils import get_insert_ignore
+
+# The keys of each type of batch operation
+_OPERATION_KEYS = {
+    "create": {"op", "plant"},
+    "delete": {"id", "op"},
+    "update_thresholds": {"id", "op", "thresholds"},
+}
+# The number of plants to insert per transaction. This also bounds the number of zip codes in the
+# IN clause of the zip code lookup, which must stay below SQLite's limit of 999 parameters.
+IMPORT_BATCH_SIZE = 500
+
+
+def _upsert_zip_codes(zip_codes):
+    """
+    Create the zip codes that don't exist yet and get the IDs of all of them.
+
+    :param set zip_codes: the zip codes as strings
+    :return: a dictionary of the zip codes to their IDs
+    :rtype: dict
+    """
+    table = models.ZipCode.__table__
+    db.session.execute(
+        get_insert_ignore(table), [{"zip_code": zip_code} for zip_code in sorted(zip_codes)]
+    )
+    query = sqlalchemy.select([table.c.zip_code, table.c.id]).where(table.c.zip_code.in_(zip_codes))
+    return dict(db.session.execute(query).fetchall())
+
+
+def _get_threshold_values(threshold_names, plant_json):
+    """
+    Get the column values of the thresholds in the JSON.
+
+    :param iterable threshold_names: the names of the thresholds to get the column values of
+    :param dict plant_json: the validated JSON object with the thresholds, where a missing
+        threshold is the same as a threshold of null
+    :return: a dictionary of the column names to their values
+    :rtype: dict
+    """
+    values = {}
+    for threshold_name in threshold_names:
+        threshold = models.Threshold.from_json(plant_json.get(threshold_name))
+        values[f"{threshold_name}_enabled"] = threshold.enabled if threshold else None
+        values[f"{threshold_name}_value"] = threshold.value if threshold else None
+    return values
+
+
+def _get_plant_row(user_id, plant_json, zip_code_ids):
+    """
+    Get the row of the plants table for the plant JSON.
+
+    :param int user_id: the ID of the user that owns the plant
+    :param dict plant_json: the validated JSON object representing the plant
+    :param dict zip_code_ids: a dictionary of the zip codes to their IDs
+    :return: the column values of the row
+    :rtype: dict
+    """
+    row = {
+        "name": plant_json["name"],
+        "user_id": user_id,
+        "zip_code_id": zip_code_ids[plant_json["zip_code"]],
+    }
+    row.update(_get_threshold_values(models.Plant.threshold_names, plant_json))
+    return row
+
+
+def _insert_plants(user_id, plants_json):
+    """
+    Insert the plants of a user in a single transaction.
+
+    :param int user_id: the ID of the user that owns the plants
+    :param list plants_json: the validated JSON objects representing the plants
+    """
+    zip_code_ids = _upsert_zip_codes({plant_json["zip_code"] for plant_json in plants_json})
+    rows = [_get_plant_row(user_id, plant_json, zip_code_ids) for plant_json in plants_json]
+    db.session.execute(models.Plant.__table__.insert(), rows)
+    # The plants aren't inserted through the ORM, so the version must be incremented explicitly
+    models.increment_plants_version(db.session, {user_id})
+    db.session.commit()
+
+
+def _parse_line(line):
+    """
+    Parse and validate a line of newline-delimited JSON representing a plant.
+
+    :param line: the line as a string or bytes
+    :return: the JSON object representing the plant or None if the line is blank
+    :rtype: dict or None
+    :raises ValidationError: if the line is invalid
+    """
+    if isinstance(line, bytes):
+        try:
+            line = line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValidationError("The line is not valid UTF-8")
+
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        plant_json = json.loads(line)
+    except ValueError:
+        raise ValidationError("The line is not valid JSON")
+
+    models.Plant.validate_json(plant_json)
+    return plant_json
+
+
+def import_plants(user_id, lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import plants from newline-delimited JSON.
+
+    Each line is a JSON object in the format of ``Plant.to_json``, where the IDs are ignored. The
+    plants are inserted in batches, each in its own transaction, so that a large import doesn't
+    hold a single long transaction. If a line is invalid, the batches before it stay imported.
+
+    :param int user_id: the ID of the user to import the plants for
+    :param iterable lines: the lines of newline-delimited JSON as strings or bytes
+    :param int batch_size: the number of plants to insert per transaction
+    :return: the number of plants that were imported
+    :rtype: int
+    :raises ValidationError: if a line is invalid
+    """
+    count = 0
+    batch = []
+    for line_number, line in enumerate(lines, 1):
+        try:
+            plant_json = _parse_line(line)
+        except ValidationError as e:
+            raise ValidationError(
+                f"Line {line_number} is invalid. {e}. {count} plant(s) from the lines before it "
+                "were imported."
+            )
+
+        if plant_json is None:
+            continue
+
+        batch.append(plant_json)
+        if len(batch) >= batch_size:
+            _insert_plants(user_id, batch)
+            count += len(batch)
+            batch = []
+
+    if batch:
+        _insert_plants(user_id, batch)
+        count += len(batch)
+
+    return count
+
+
+def export_plants(user_id):
+    """
+    Export the plants of a user as newline-delimited JSON.
+
+    The rows are streamed from a server-side cursor where the database supports it, so the plants
+    are never all in memory at once.
+
+    :param int user_id: the ID of the user to export the plants of
+    :return: a generator of the lines of JSON in the format of ``Plant.to_json``
+    :rtype: generator(str)
+    """
+    plants = models.Plant.__table__
+    zip_codes = models.ZipCode.__table__
+    threshold_columns = []
+    for threshold_name in models.Plant.threshold_names:
+        threshold_columns.append(plants.c[f"{threshold_name}_enabled"])
+        threshold_columns.append(plants.c[f"{threshold_name}_value"])
+
+    query = (
+        sqlalchemy.select([plants.c.id, plants.c.name, zip_codes.c.zip_code, *threshold_columns])
+        .select_from(plants.join(zip_codes))
+        .where(plants.c.user_id == user_id)
+        .order_by(plants.c.name, plants.c.id)
+    )
+    result = db.session.connection().execution_options(stream_results=True).execute(query)
+    try:
+        for row in result:
+            plant_json = {"id": row[0], "name": row[1], "zip_code": row[2]}
+            for index, threshold_name in enumerate(models.Plant.threshold_names):
+                enabled, value = row[3 + index * 2], row[4 + index * 2]
+                plant_json[threshold_name] = (
+                    None if value is None else {"enabled": enabled, "id": row[0], "value": value}
+                )
+            yield dumps(plant_json) + "\n"
+    finally:
+        result.close()
+
+
+def _validate_operation(operation):
+    """
+    Validate the structure of a batch operation.
+
+    :param dict operation: the JSON object representing the operation
+    :raises ValidationError: if the operation is invalid
+    """
+    if not isinstance(operation, dict) or operation.get("op") not in _OPERATION_KEYS:
+        raise ValidationError(f'The op key must be one of: {", ".join(sorted(_OPERATION_KEYS))}')
+
+    expected_keys = _OPERATION_KEYS[operation["op"]]
+    if operation.keys() != expected_keys:
+        raise ValidationError(
+            f'The {operation["op"]} operation must only have the following keys: '
+            f'{", ".join(sorted(expected_keys))}'
+        )
+
+    if operation["op"] == "create":
+        models.Plant.validate_json(operation["plant"])
+        return
+
+    if type(operation["id"]) is not int:
+        raise ValidationError("The id key must be an integer")
+
+    if operation["op"] == "update_thresholds":
+        thresholds = operation["thresholds"]
+        if not isinstance(thresholds, dict) or not thresholds:
+            raise ValidationError("The thresholds key must be a non-empty object")
+
+        invalid_keys = thresholds.keys() - set(models.Plant.threshold_names)
+        if invalid_keys:
+            raise ValidationError(
+                f"The following thresholds are invalid: {', '.join(sorted(invalid_keys))}"
+            )
+
+        for threshold_name, threshold_json in thresholds.items():
+            try:
+                models.Threshold.validate_json(threshold_json)
+            except ValidationError as e:
+                raise ValidationError(f"The {threshold_name} threshold is invalid. {e}")
+
+
+def validate_operations(user_id, operations, max_operations):
+    """
+    Validate all the batch operations before any of them are applied.
+
+    :param int user_id: the ID of the user that owns the plants
+    :param list operations: the JSON objects representing the operations
+    :param int max_operations: the maximum number of operations allowed in the batch
+    :raises ValidationError: if an operation is invalid or refers to a plant that the user doesn't
+        own
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError("The operations key must be a non-empty array")
+    elif len(operations) > max_operations:
+        raise ValidationError(f"A batch cannot have more than {max_operations} operations")
+
+    # Maps the IDs of the plants to the index of the operation that changes them
+    plant_ids = {}
+    for index, operation in enumerate(operations):
+        try:
+            _validate_operation(operation)
+        except ValidationError as e:
+            raise ValidationError(f"Operation {index} is invalid. {e}")
+
+        if operation["op"] != "create":
+            if operation["id"] in plant_ids:
+                raise ValidationError(
+                    f'Operation {index} is invalid. The plant {operation["id"]} is already '
+                    f"changed by operation {plant_ids[operation['id']]}"
+                )
+            plant_ids[operation["id"]] = index
+
+    owned_ids = set()
+    plants = models.Plant.__table__
+    ids = sorted(plant_ids)
+    # Keep the number of parameters of each query below SQLite's limit
+    for start in range(0, len(ids), IMPORT_BATCH_SIZE):
+        stop = start + IMPORT_BATCH_SIZE
+        query = sqlalchemy.select([plants.c.id]).where(
+            sqlalchemy.and_(plants.c.user_id == user_id, plants.c.id.in_(ids[start:stop]))
+        )
+        owned_ids.update(row[0] for row in db.session.execute(query))
+
+    for plant_id, index in sorted(plant_ids.items(), key=lambda item: item[1]):
+        if plant_id not in owned_ids:
+            raise ValidationError(
+                f"Operation {index} is invalid. The plant {plant_id} does not exist"
+            )
+
+
+def apply_operations(user_id, operations):
+    """
+    Apply the validated batch operations in a single transaction.
+
+    The updates are grouped by the thresholds they set so that each group is a single
+    executemany, and the deletes are a single statement.
+
+    :param int user_id: the ID of the user that owns the plants
+    :param list operations: the validated JSON objects representing the operations
+    :return: the result of each operation in the same order as the operations
+    :rtype: list(dict)
+    """
+    plants = models.Plant.__table__
+    results = [None] * len(operations)
+    creates = [(i, op) for i, op in enumerate(operations) if op["op"] == "create"]
+    updates = collections.defaultdict(list)
+    deletes = []
+    for index, operation in enumerate(operations):
+        if operation["op"] == "update_thresholds":
+            updates[tuple(sorted(operation["thresholds"]))].append(operation)
+            results[index] = {"id": operation["id"], "op": "update_thresholds", "status": 200}
+        elif operation["op"] == "delete":
+            deletes.append(operation["id"])
+            results[index] = {"id": operation["id"], "op": "delete", "status": 204}
+
+    now = time.time()
+    try:
+        if creates:
+            zip_code_ids = _upsert_zip_codes({op["plant"]["zip_code"] for _, op in creates})
+            insert = plants.insert()
+            for index, operation in creates:
+                # Each create is its own INSERT since the IDs of the new plants are returned
+                row = _get_plant_row(user_id, operation["plant"], zip_code_ids)
+                plant_id = db.session.execute(insert, row).inserted_primary_key[0]
+                results[index] = {"id": plant_id, "op": "create", "status": 201}
+
+        for threshold_names, group in updates.items():
+            values = {"thresholds_modified_at": now}
+            for threshold_name in threshold_names:
+                for suffix in ("enabled", "value"):
+                    column = f"{threshold_name}_{suffix}"
+                    values[column] = sqlalchemy.bindparam(f"new_{column}")
+            statement = (
+                plants.update()
+                .where(
+                    sqlalchemy.and_(
+                        plants.c.id == sqlalchemy.bindparam("plant_id"),
+                        plants.c.user_id == user_id,
+                    )
+                )
+                .values(values)
+            )
+            rows = []
+            for operation in group:
+                row = {"plant_id": operation["id"]}
+                threshold_values = _get_threshold_values(threshold_names, operation["thresholds"])
+                row.update((f"new_{column}", value) for column, value in threshold_values.items())
+                rows.append(row)
+            db.session.execute(statement, rows)
+
+        if deletes:
+            db.session.execute(
+                plants.delete().where(
+                    sqlalchemy.and_(plants.c.user_id == user_id, plants.c.id.in_(deletes))
+                )
+            )
+
+        # The plants aren't written through the ORM, so the version must be incremented explicitly
+        models.increment_plants_version(db.session, {user_id})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
@@ -3,6 +3,7 @@ import os
 
 BASE_DIR = os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir)
 DEV_DB_FILE = os.path.join(BASE_DIR, "plant_wn.db")
+DEV_FORECAST_CACHE_FILE = os.path.join(BASE_DIR, "plant_wn_forecasts.db")
 TEST_DB_FILE = os.path.join(BASE_DIR, "plant_wn_test.db")
 
 
@@ -14,9 +15,115 @@ class Config(object):
     JWT_IDENTITY_CLAIM = "sub"
     # Additional loggers to set to the level defined in PLANT_WN_LOG_LEVEL
     PLANT_WN_ADDITIONAL_LOGGERS = []
+    # The coordinates API used by the notifier, which is either "gazetteer" or "opendatasoft"
+    PLANT_WN_COORDINATES_API = "opendatasoft"
+    # The optional API key for the coordinates API used by the notifier
+    PLANT_WN_COORDINATES_API_KEY = None
+    # The number of seconds to wait after the first failed delivery of a notification, which is
+    # doubled after every subsequent failed delivery
+    PLANT_WN_DISPATCH_BACKOFF = 30
+    # The maximum number of notifications a dispatch worker claims at a time
+    PLANT_WN_DISPATCH_BATCH_SIZE = 50
+    # The number of seconds a dispatch worker has to deliver the notifications it claimed before
+    # they may be claimed by another worker. It must be greater than PLANT_WN_DISPATCH_BATCH_SIZE
+    # times PLANT_WN_DISPATCH_TIMEOUT.
+    PLANT_WN_DISPATCH_LEASE = 1800
+    # The number of delivery attempts after which a notification is given up on
+    PLANT_WN_DISPATCH_MAX_ATTEMPTS = 5
+    # The maximum number of seconds to wait between the delivery attempts of a notification
+    PLANT_WN_DISPATCH_MAX_BACKOFF = 3600
+    # The number of seconds an idle dispatch worker waits before checking the queue again
+    PLANT_WN_DISPATCH_POLL_INTERVAL = 5
+    # The number of seconds to wait for the SMTP server or the webhook before giving up
+    PLANT_WN_DISPATCH_TIMEOUT = 30
+    # The transport that delivers the notifications, which is either "smtp" or "webhook"
+    PLANT_WN_DISPATCH_TRANSPORT = "smtp"
+    # The number of dispatch worker threads per process
+    PLANT_WN_DISPATCH_WORKERS = 4
+    # The maximum number of forecasts to keep in the forecast cache
+    PLANT_WN_FORECAST_CACHE_MAX_ENTRIES = 50000
+    # The path to the SQLite database of the forecast cache shared by all processes on the host.
+    # The forecast cache is disabled when this is not set.
+    PLANT_WN_FORECAST_CACHE_PATH = None
+    # The number of decimal places to round the coordinates to in the forecast cache keys
+    PLANT_WN_FORECAST_CACHE_PRECISION = 2
+    # The number of seconds a cached forecast is valid for
+    PLANT_WN_FORECAST_CACHE_TTL = 10800
+    # Whether to reuse the connections to the weather and coordinates APIs between requests
+    PLANT_WN_HTTP_KEEP_ALIVE = True
+    # Whether to wait for a free connection when the connection pool of a host is exhausted
+    PLANT_WN_HTTP_POOL_BLOCK = False
+    # The maximum number of connections to keep per host of the weather and coordinates APIs
+    PLANT_WN_HTTP_POOL_SIZE = 16
+    # The number of times to retry a failed request to the weather and coordinates APIs, with a
+    # backoff of 1, 2, 4... seconds between them. Consider 0 or 1 when several weather providers
+    # are configured since a slow or failing provider is then hedged or failed over instead.
+    PLANT_WN_HTTP_RETRIES = 3
+    # The number of seconds to wait for the weather and coordinates APIs before giving up
+    PLANT_WN_HTTP_TIMEOUT = 30
+    # The directory of the history of the forecasts fetched by the notifier. The history is not
+    # kept when this is not set.
+    PLANT_WN_HISTORY_PATH = None
+    # The number of days to keep the forecast history for
+    PLANT_WN_HISTORY_RETENTION_DAYS = 365
+    # The path to the gazetteer table used by the "gazetteer" coordinates API, which must be set
+    # to use it. The table is generated with the build-gazetteer command.
+    PLANT_WN_GAZETTEER_PATH = None
     PLANT_WN_LOG_FORMAT = "%(asctime)s %(name)s %(levelname)s %(module)s.%(funcName)s %(message)s"
     # This sets the level of the "flask.app" logger, which is accessed from current_app.logger
     PLANT_WN_LOG_LEVEL = "INFO"
+    # The number of seconds until the lease of a shard of a sharded notifier run expires unless the
+    # worker evaluating it renews it. The lease is renewed every third of this.
+    PLANT_WN_NOTIFIER_LEASE = 300
+    # The number of seconds clients are told to wait when too many passwords are being hashed
+    PLANT_WN_PASSWORD_RETRY_AFTER = 1
+    # The maximum number of passwords waiting to be hashed before requests are rejected with a 503
+    PLANT_WN_PASSWORD_QUEUE_SIZE = 16
+    # The bcrypt work factor of new password hashes. Stored hashes with a different work factor are
+    # replaced when the user logs in.
+    PLANT_WN_PASSWORD_ROUNDS = 12
+    # The number of processes that hash passwords, or 0 to hash them on the request thread
+    PLANT_WN_PASSWORD_WORKERS = 2
+    # The maximum number of operations in a request to the plants batch endpoint
+    PLANT_WN_PLANTS_BATCH_MAX_OPERATIONS = 500
+    # The maximum value of the limit query parameter of the plants listing
+    PLANT_WN_PLANTS_MAX_LIMIT = 1000
+    # The SMTP server of the "smtp" notification transport
+    PLANT_WN_SMTP_HOST = "localhost"
+    # The optional credentials to log in to the SMTP server with
+    PLANT_WN_SMTP_PASSWORD = None
+    PLANT_WN_SMTP_PORT = 25
+    # The address the notification emails are from. It defaults to plant-wn@<PLANT_WN_SMTP_HOST>.
+    PLANT_WN_SMTP_SENDER = None
+    # Whether to upgrade the connection to the SMTP server to TLS with STARTTLS
+    PLANT_WN_SMTP_STARTTLS = False
+    PLANT_WN_SMTP_USERNAME = None
+    # The number of seconds to cache the user ID of tokens issued without the uid claim
+    PLANT_WN_USER_ID_CACHE_TTL = 60
+    # The optional API key for the weather API used by the notifier
+    PLANT_WN_WEATHER_API_KEY = None
+    # The API keys of the weather providers keyed by their names when several are configured. The
+    # providers without one use PLANT_WN_WEATHER_API_KEY.
+    PLANT_WN_WEATHER_API_KEYS = {}
+    # The number of kilometers within which zip codes share the forecast of the center of their
+    # cell of a grid instead of each fetching their own. Around 5 is below the grid resolution of
+    # most weather providers. The default of 0 disables the sharing.
+    PLANT_WN_WEATHER_BUCKET_RADIUS = 0
+    # The maximum number of forecasts the notifier fetches at once
+    PLANT_WN_WEATHER_CONCURRENCY = 16
+    # The number of seconds to wait for a weather provider before making a hedged request to the
+    # next one while there aren't enough recent latencies of the provider
+    PLANT_WN_WEATHER_HEDGE_DELAY = 2
+    # The percentile of the recent latencies of a weather provider after which a hedged request is
+    # made to the next one
+    PLANT_WN_WEATHER_HEDGE_PERCENTILE = 95
+    # The weather providers used by the notifier in the order of preference. Only "climacell" is
+    # supported. When several are configured, the forecast is taken from the first one to answer.
+    PLANT_WN_WEATHER_PROVIDERS = ["climacell"]
+    # The optional secret to sign the requests of the "webhook" notification transport with
+    PLANT_WN_WEBHOOK_SECRET = None
+    # The URL that the "webhook" notification transport POSTs the notifications to
+    PLANT_WN_WEBHOOK_URL = None
     SECRET_KEY = "change-me"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -31,6 +138,7 @@ class ProductionConfig(Config):
 class DevelopmentConfig(Config):
     """The development plant_wn Flask configuration."""
 
+    PLANT_WN_FORECAST_CACHE_PATH = DEV_FORECAST_CACHE_FILE
     PLANT_WN_LOG_LEVEL = "DEBUG"
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DEV_DB_FILE}"
 
@@ -45,6 +153,10 @@ class TestingConfig(DevelopmentConfig):
     #   https://github.com/miguelgrinberg/Flask-Migrate/issues/153
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{TEST_DB_FILE}"
     LOGIN_DISABLED = False
+    PLANT_WN_FORECAST_CACHE_PATH = None
+    # Keep password hashing fast and in-process in the tests
+    PLANT_WN_PASSWORD_ROUNDS = 4
+    PLANT_WN_PASSWORD_WORKERS = 0
 
 
 class TestingConfigNoAuth(TestingConfig):
@@ -0,0 +1,36 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import json
+
+import flask
+
+# A compact encoder that uses the C accelerated encoding path of the json module. The keys are
+# sorted to match the output of flask.jsonify.
+_encoder = json.JSONEncoder(separators=(",", ":"), sort_keys=True)
+
+
+def dumps(obj):
+    """
+    Serialize the object to a compact JSON string.
+
+    :param obj: the JSON serializable object
+    :return: the JSON string
+    :rtype: str
+    """
+    return _encoder.encode(obj)
+
+
+def json_response(obj, status=200):
+    """
+    Create a JSON response without the overhead of flask.jsonify.
+
+    This is meant for large responses where flask.jsonify's pretty printing and custom encoder
+    are noticeable.
+
+    :param obj: the JSON serializable object to use as the response body
+    :param int status: the status code of the response
+    :return: the JSON response
+    :rtype: flask.Response
+    """
+    return flask.current_app.response_class(
+        dumps(obj) + "\n", status=status, mimetype=flask.current_app.config["JSONIFY_MIMETYPE"]
+    )
@@ -1,12 +1,29 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import datetime
+import functools
+import multiprocessing
 import time
 
 import click
+from flask import current_app
 from flask.cli import FlaskGroup
 from sqlalchemy.exc import OperationalError
 
-from plant_wn import db
+from plant_wn.coordinates.gazetteer import build_gazetteer, GazetteerAPI
+from plant_wn.coordinates.opendatasoft import OpenDataSoftAPI
+from plant_wn.dispatch.queue import enqueue_alerts
+from plant_wn.dispatch.transports import get_transport
+from plant_wn.dispatch.worker import get_dispatcher
+from plant_wn.exceptions import ConfigError, ValidationError
+from plant_wn.notifier.engine import run_notifier
+from plant_wn.notifier.shards import run_shards
+from plant_wn.weather.cache import get_forecast_cache
+from plant_wn.weather.climacell import ClimaCellAPI
+from plant_wn.weather.composite import CompositeWeatherAPI
+from plant_wn.weather.history import get_forecast_history
+from plant_wn.web import db, models
 from plant_wn.web.app import create_app
+from plant_wn.web.bulk import export_plants, import_plants
 
 
 @click.group(cls=FlaskGroup, create_app=create_app)
@@ -31,5 +48,284 @@ def wait_for_db():
             break
 
 
+def get_coordinates_api_cls(config):
+    """
+    Get the coordinates API class configured in the Flask config.
+
+    :param dict config: the dict containing the plant_wn config
+    :return: the BaseCoordinatesAPI subclass to get the coordinates with
+    :rtype: type
+    :raises ConfigError: if the gazetteer table is not configured
+    """
+    if config["PLANT_WN_COORDINATES_API"] == "gazetteer":
+        if not config["PLANT_WN_GAZETTEER_PATH"]:
+            raise ConfigError(
+                "PLANT_WN_GAZETTEER_PATH must be set to the table generated by build-gazetteer to "
+                "use the gazetteer coordinates API"
+            )
+        return functools.partial(GazetteerAPI, path=config["PLANT_WN_GAZETTEER_PATH"])
+
+    return OpenDataSoftAPI
+
+
+# The weather APIs that can be set in PLANT_WN_WEATHER_PROVIDERS keyed by their names
+WEATHER_APIS = {"climacell": ClimaCellAPI}
+
+
+def get_weather_api_cls(config):
+    """
+    Get the weather API class configured in the Flask config.
+
+    :param dict config: the dict containing the plant_wn config
+    :return: the BaseWeatherAPI subclass to get the forecasts with
+    :rtype: type
+    :raises ConfigError: if a weather provider is not supported or is configured more than once
+    """
+    providers = []
+    names = config["PLANT_WN_WEATHER_PROVIDERS"]
+    for name in names:
+        if name not in WEATHER_APIS:
+            raise ConfigError(f'The weather provider "{name}" is not supported')
+        if names.count(name) > 1:
+            raise ConfigError(f'The weather provider "{name}" is configured more than once')
+        api_key = config["PLANT_WN_WEATHER_API_KEYS"].get(name, config["PLANT_WN_WEATHER_API_KEY"])
+        providers.append((WEATHER_APIS[name], api_key))
+
+    if not providers:
+        raise ConfigError("PLANT_WN_WEATHER_PROVIDERS must have at least one weather provider")
+    if len(providers) == 1:
+        # The API key is passed by the notifier from PLANT_WN_WEATHER_API_KEY
+        return providers[0][0]
+
+    return functools.partial(
+        CompositeWeatherAPI,
+        providers=providers,
+        hedge_percentile=config["PLANT_WN_WEATHER_HEDGE_PERCENTILE"],
+        hedge_delay=config["PLANT_WN_WEATHER_HEDGE_DELAY"],
+    )
+
+
+@cli.command(name="build-gazetteer")
+@click.argument("csv_file", type=click.File("r", encoding="utf-8"))
+@click.option("--output", help="The path to write the table to instead of PLANT_WN_GAZETTEER_PATH")
+def build_gazetteer_command(csv_file, output):
+    """
+    Build the offline gazetteer table from the OpenDataSoft CSV export.
+
+    The CSV_FILE is the export of the "us-zip-code-latitude-and-longitude" dataset.
+    """
+    path = output or current_app.config["PLANT_WN_GAZETTEER_PATH"]
+    if not path:
+        raise click.ClickException("Either --output or PLANT_WN_GAZETTEER_PATH must be set")
+
+    count = build_gazetteer(csv_file, path)
+    click.echo(f"The gazetteer table was built with {count} zip codes")
+
+
+def get_user_id(username):
+    """
+    Get the ID of a user for a command.
+
+    :param str username: the username of the user
+    :return: the ID of the user
+    :rtype: int
+    :raises click.ClickException: if the user doesn't exist
+    """
+    user_id = db.session.query(models.User.id).filter_by(username=username).scalar()
+    if not user_id:
+        raise click.ClickException(f'The user "{username}" does not exist')
+    return user_id
+
+
+def _dispatch(workers, drain):
+    try:
+        transport = get_transport(current_app.config)
+        # The transport doesn't connect before the first notification, so there is nothing to
+        # close if the dispatcher is not configured correctly
+        dispatcher = get_dispatcher(transport, current_app.config)
+    except ConfigError as e:
+        raise click.ClickException(str(e))
+
+    try:
+        totals = dispatcher.run(workers=workers, drain=drain)
+    finally:
+        transport.close()
+    click.echo(
+        f"{totals['sent']} notification(s) were sent, {totals['retried']} will be retried and "
+        f"{totals['failed']} failed"
+    )
+
+
+@cli.command(name="compact-history")
+@click.option(
+    "--retention-days",
+    type=int,
+    help="The number of days to keep the history for instead of PLANT_WN_HISTORY_RETENTION_DAYS",
+)
+def compact_history(retention_days):
+    """
+    Delete the forecast history past the retention and compact the rest.
+
+    Only the days before today are compacted since today's history is still being appended to.
+    """
+    history = get_forecast_history(current_app.config)
+    if history is None:
+        raise click.ClickException("PLANT_WN_HISTORY_PATH must be set to keep a forecast history")
+
+    if retention_days is None:
+        retention_days = current_app.config["PLANT_WN_HISTORY_RETENTION_DAYS"]
+    deleted = history.apply_retention(retention_days)
+    removed_rows = 0
+    today = datetime.date.today()
+    for date in history.get_partitions():
+        if date < today:
+            removed_rows += history.compact(date)
+    click.echo(
+        f"{len(deleted)} day(s) of history were deleted and {removed_rows} duplicate row(s) were "
+        "removed"
+    )
+
+
+@cli.command(name="dispatch")
+@click.option(
+    "--workers", type=int, help="The number of worker threads instead of PLANT_WN_DISPATCH_WORKERS"
+)
+@click.option(
+    "--processes", default=1, type=int, help="The number of processes to run the workers in"
+)
+@click.option("--drain", is_flag=True, help="Exit once there are no due notifications left")
+def dispatch(workers, processes, drain):
+    """
+    Deliver the notifications in the queue until interrupted.
+
+    Any number of dispatch commands may run at once on any host to increase the delivery
+    throughput.
+    """
+    workers = workers or current_app.config["PLANT_WN_DISPATCH_WORKERS"]
+    if processes <= 1:
+        _dispatch(workers, drain)
+        return
+
+    app = current_app._get_current_object()
+
+    def run_process():
+        with app.app_context():
+            # The connections of the parent process must not be shared with the child process
+            db.engine.dispose()
+            _dispatch(workers, drain)
+
+    # The processes are forked so that they inherit the application
+    context = multiprocessing.get_context("fork")
+    children = [context.Process(target=run_process) for _ in range(processes)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+    if any(child.exitcode for child in children):
+        raise click.ClickException("One or more of the dispatch processes failed")
+
+
+@cli.command(name="export-plants")
+@click.argument("username")
+@click.option(
+    "--output", default="-", type=click.File("w", encoding="utf-8"), help="The file to write to"
+)
+def export_plants_command(username, output):
+    """Export the plants of the user USERNAME as newline-delimited JSON."""
+    for line in export_plants(get_user_id(username)):
+        output.write(line)
+
+
+@cli.command(name="import-plants")
+@click.argument("username")
+@click.argument("ndjson_file", type=click.File("rb"))
+def import_plants_command(username, ndjson_file):
+    """Import plants for the user USERNAME from the newline-delimited JSON in NDJSON_FILE."""
+    try:
+        count = import_plants(get_user_id(username), ndjson_file)
+    except ValidationError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{count} plant(s) were imported")
+
+
+@cli.command(name="notify")
+@click.option(
+    "--enqueue",
+    is_flag=True,
+    help="Add the alerts to the notification queue to be delivered by the dispatch command",
+)
+@click.option(
+    "--shards",
+    type=int,
+    help=(
+        "Split the zip codes into this many shards that any number of notify commands with the "
+        "same --run-id evaluate together"
+    ),
+)
+@click.option(
+    "--run-id",
+    default=lambda: datetime.date.today().isoformat(),
+    show_default="today's date",
+    help="The identifier of the sharded run",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Only evaluate the plants whose forecast or thresholds changed since the last incremental "
+        "run, whose alerts should already be in the notification queue"
+    ),
+)
+def notify(enqueue, shards, run_id, incremental):
+    """Evaluate the thresholds of every plant against the forecast of its location."""
+    try:
+        weather_api_cls = get_weather_api_cls(current_app.config)
+        coordinates_api_cls = get_coordinates_api_cls(current_app.config)
+    except ConfigError as e:
+        raise click.ClickException(str(e))
+
+    notifier_kwargs = {
+        "incremental": incremental,
+        "weather_api_cls": weather_api_cls,
+        "coordinates_api_cls": coordinates_api_cls,
+        "weather_api_key": current_app.config["PLANT_WN_WEATHER_API_KEY"],
+        "coordinates_api_key": current_app.config["PLANT_WN_COORDINATES_API_KEY"],
+        "forecast_cache": get_forecast_cache(current_app.config),
+        "history": get_forecast_history(current_app.config),
+        "concurrency": current_app.config["PLANT_WN_WEATHER_CONCURRENCY"],
+        "bucket_radius": current_app.config["PLANT_WN_WEATHER_BUCKET_RADIUS"],
+    }
+    enqueued_count = 0
+    if shards is None:
+        alerts = run_notifier(**notifier_kwargs)
+        if enqueue:
+            enqueued_count = enqueue_alerts(alerts)
+    else:
+
+        def enqueue_shard_alerts(shard_alerts):
+            nonlocal enqueued_count
+            enqueued_count += enqueue_alerts(shard_alerts)
+
+        try:
+            alerts = run_shards(
+                run_id,
+                shards,
+                lease=current_app.config["PLANT_WN_NOTIFIER_LEASE"],
+                on_alerts=enqueue_shard_alerts if enqueue else None,
+                **notifier_kwargs,
+            )
+        except ValidationError as e:
+            raise click.ClickException(str(e))
+
+    for alert in alerts:
+        click.echo(
+            f"Plant {alert.plant_id}: the {alert.threshold} threshold of {alert.value} is exceeded "
+            f"on {alert.date.isoformat()} with a forecast of {alert.forecast}"
+        )
+    click.echo(f"{len(alerts)} alert(s) were found")
+    if enqueue:
+        click.echo(f"{enqueued_count} new alert(s) were added to the notification queue")
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,53 @@
+"""
+Add the notifications queue and the email of users.
+
+Revision ID: 3f6b2d9a8c14
+Revises: e7a3b95f0c21
+Create Date: 2026-10-18 14:02:55.190436
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6b2d9a8c14"
+down_revision = "e7a3b95f0c21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("email", sa.String(), nullable=True))
+
+    op.create_table(
+        "notifications",
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.Float(), nullable=False),
+        sa.Column("claim_token", sa.String(), nullable=True),
+        sa.Column("claimed_until", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("idempotency_key", sa.String(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("sent_at", sa.Float(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("idempotency_key"),
+    )
+    with op.batch_alter_table("notifications", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_notifications_status_available_at", ["status", "available_at"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("notifications", schema=None) as batch_op:
+        batch_op.drop_index("ix_notifications_status_available_at")
+
+    op.drop_table("notifications")
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("email")
@@ -0,0 +1,28 @@
+"""
+Add the plants version of users.
+
+Revision ID: 5b2e8a41d7c3
+Revises: c0f0926276e4
+Create Date: 2026-10-18 10:12:31.418276
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b2e8a41d7c3"
+down_revision = "c0f0926276e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("plants_version", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("plants_version")
@@ -0,0 +1,39 @@
+"""
+Add the leases of the shards of notifier runs.
+
+Revision ID: 8b1e5c7d2f90
+Revises: 3f6b2d9a8c14
+Create Date: 2026-10-18 15:21:09.734512
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8b1e5c7d2f90"
+down_revision = "3f6b2d9a8c14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notifier_shards",
+        sa.Column("alert_count", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.Float(), nullable=True),
+        sa.Column("heartbeat_at", sa.Float(), nullable=True),
+        sa.Column("lease_expires_at", sa.Float(), nullable=True),
+        sa.Column("max_zip_code_id", sa.Integer(), nullable=True),
+        sa.Column("min_zip_code_id", sa.Integer(), nullable=True),
+        sa.Column("owner", sa.String(), nullable=True),
+        sa.Column("run_id", sa.String(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("shard_count", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("run_id", "shard"),
+    )
+
+
+def downgrade():
+    op.drop_table("notifier_shards")
@@ -0,0 +1,80 @@
+"""
+Store the thresholds as columns on the plants table.
+
+Revision ID: 9d4f1c6e2a87
+Revises: 5b2e8a41d7c3
+Create Date: 2026-10-18 11:03:54.108342
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9d4f1c6e2a87"
+down_revision = "5b2e8a41d7c3"
+branch_labels = None
+depends_on = None
+
+# The thresholds of a plant and the tables they were previously stored in
+THRESHOLDS = (
+    ("max_precipitation", "max_precipitations"),
+    ("max_temp", "max_temps"),
+    ("max_wind", "max_winds"),
+    ("min_temp", "min_temps"),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        for threshold, _ in THRESHOLDS:
+            batch_op.add_column(sa.Column(f"{threshold}_enabled", sa.Boolean(), nullable=True))
+            batch_op.add_column(sa.Column(f"{threshold}_value", sa.Float(), nullable=True))
+
+    for threshold, table in THRESHOLDS:
+        op.execute(
+            f"UPDATE plants SET "
+            f"{threshold}_enabled = "
+            f"(SELECT enabled FROM {table} WHERE {table}.id = plants.{threshold}_id), "
+            f"{threshold}_value = "
+            f"(SELECT value FROM {table} WHERE {table}.id = plants.{threshold}_id) "
+            f"WHERE {threshold}_id IS NOT NULL"
+        )
+
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        for threshold, _ in THRESHOLDS:
+            batch_op.drop_column(f"{threshold}_id")
+
+    for _, table in THRESHOLDS:
+        op.drop_table(table)
+
+
+def downgrade():
+    for _, table in THRESHOLDS:
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("enabled", sa.Boolean(), nullable=False),
+            sa.Column("value", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        for threshold, table in THRESHOLDS:
+            batch_op.add_column(sa.Column(f"{threshold}_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                f"fk_plants_{threshold}_id_{table}", table, [f"{threshold}_id"], ["id"]
+            )
+
+    # The ID of the plant is reused as the ID of each of its thresholds
+    for threshold, table in THRESHOLDS:
+        op.execute(
+            f"INSERT INTO {table} (id, enabled, value) "
+            f"SELECT id, COALESCE({threshold}_enabled, 1), {threshold}_value FROM plants "
+            f"WHERE {threshold}_value IS NOT NULL"
+        )
+        op.execute(f"UPDATE plants SET {threshold}_id = id WHERE {threshold}_value IS NOT NULL")
+
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        for threshold, _ in THRESHOLDS:
+            batch_op.drop_column(f"{threshold}_value")
+            batch_op.drop_column(f"{threshold}_enabled")
@@ -0,0 +1,36 @@
+"""
+Add the stamps that incremental notifier runs compare.
+
+Revision ID: c4a7e2b91d36
+Revises: 8b1e5c7d2f90
+Create Date: 2026-10-18 16:40:12.058817
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c4a7e2b91d36"
+down_revision = "8b1e5c7d2f90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The existing plants have no stamp and are evaluated by the first incremental run since none
+    # of the zip codes have been evaluated yet
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("thresholds_modified_at", sa.Float(), nullable=True))
+
+    with op.batch_alter_table("zip_codes", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("evaluated_at", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("forecast_digest", sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("zip_codes", schema=None) as batch_op:
+        batch_op.drop_column("forecast_digest")
+        batch_op.drop_column("evaluated_at")
+
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        batch_op.drop_column("thresholds_modified_at")
@@ -0,0 +1,27 @@
+"""
+Add the indexes for the access paths of the plants table.
+
+Revision ID: e7a3b95f0c21
+Revises: 9d4f1c6e2a87
+Create Date: 2026-10-18 11:48:07.562914
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e7a3b95f0c21"
+down_revision = "9d4f1c6e2a87"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        batch_op.create_index("ix_plants_user_id_name", ["user_id", "name"], unique=False)
+        batch_op.create_index(batch_op.f("ix_plants_zip_code_id"), ["zip_code_id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("plants", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_plants_zip_code_id"))
+        batch_op.drop_index("ix_plants_user_id_name")
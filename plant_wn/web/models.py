@@ -1,80 +1,260 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
-import bcrypt
+import itertools
+import math
+import time
+
 import sqlalchemy
 import sqlalchemy.orm
+from sqlalchemy.ext.mutable import MutableComposite
 from werkzeug.exceptions import Unauthorized
 
 from plant_wn.exceptions import ValidationError
-from plant_wn.web import db
+from plant_wn.web import db, passwords
 
 
-class Threshold:
-    """A base class for a threshold."""
+class Threshold(MutableComposite):
+    """
+    A base class for a threshold, which is stored in the columns of the plant it belongs to.
 
-    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    enabled = sqlalchemy.Column(sqlalchemy.Boolean, default=True, nullable=False)
-    value = sqlalchemy.Column(sqlalchemy.Float, nullable=False)
+    A threshold whose value is not set represents the absence of the threshold and is falsy.
+    """
 
-    def to_json(self):
+    def __init__(self, value=None, enabled=True):
+        """
+        Initialize the Threshold.
+
+        :param float value: the value of the threshold
+        :param bool enabled: whether the threshold is enabled
+        """
+        self.value = value
+        self.enabled = enabled
+
+    def __bool__(self):
+        return self.value is not None
+
+    def __composite_values__(self):
+        return self.value, self.enabled
+
+    def __eq__(self, other):
+        return isinstance(other, Threshold) and (
+            self.__composite_values__() == other.__composite_values__()
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return f"<{type(self).__name__} value={self.value!r} enabled={self.enabled!r}>"
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        # Mark the plant's columns as modified so that the change is persisted
+        self.changed()
+
+    @classmethod
+    def from_json(cls, json_input):
+        """
+        Convert the JSON object to a Threshold object.
+
+        :param dict json_input: the JSON input representing the Threshold object or None
+        :return: the Threshold object based on the JSON input or None
+        :rtype: Threshold or None
+        :raises ValidationError: if the input is invalid
+        """
+        cls.validate_json(json_input)
+        if json_input is None:
+            return None
+        return cls(value=float(json_input["value"]), enabled=json_input.get("enabled", True))
+
+    def to_json(self, threshold_id):
         """
         Serialize the Threshold object.
 
+        :param int threshold_id: the ID of the threshold, which is the ID of its plant
         :return: the JSON object representing the Threshold object
         :rtype: dict
         """
         return {
             "enabled": self.enabled,
-            "id": self.id,
+            "id": threshold_id,
             "value": self.value,
         }
 
+    @staticmethod
+    def validate_json(json_input):
+        """
+        Validate the input JSON.
 
-class MaxPrecipitation(db.Model, Threshold):
-    """A max precipitation threshold."""
+        The ID is accepted so that the output of ``to_json`` is valid input, but it is ignored.
 
-    __tablename__ = "max_precipitations"
+        :param dict json_input: the JSON input representing the Threshold object or None
+        :raises ValidationError: if the input is invalid
+        """
+        if json_input is None:
+            return
 
+        invalid_exception = ValidationError(
+            "A threshold must be null or an object with a finite numeric value key and optionally "
+            "a boolean enabled key"
+        )
+        if not isinstance(json_input, dict):
+            raise invalid_exception
+        elif "value" not in json_input or not json_input.keys() <= {"enabled", "id", "value"}:
+            raise invalid_exception
+        elif type(json_input["value"]) not in (float, int):
+            raise invalid_exception
+        elif not math.isfinite(json_input["value"]):
+            raise invalid_exception
+        elif not isinstance(json_input.get("enabled", True), bool):
+            raise invalid_exception
 
-class MaxTemp(db.Model, Threshold):
-    """A maximum temperature threshold."""
 
-    __tablename__ = "max_temps"
+class MaxPrecipitation(Threshold):
+    """A max precipitation threshold."""
 
 
-class MaxWind(db.Model, Threshold):
+class MaxTemp(Threshold):
     """A maximum temperature threshold."""
 
-    __tablename__ = "max_winds"
+
+class MaxWind(Threshold):
+    """A maximum wind threshold."""
 
 
-class MinTemp(db.Model, Threshold):
+class MinTemp(Threshold):
     """A minimum temperature threshold."""
 
-    __tablename__ = "min_temps"
+
+class NotifierShard(db.Model):
+    """
+    A lease on a shard of the zip codes of a notifier run.
+
+    The zip codes are split into ranges of their IDs so that the shards of a run can be evaluated
+    by any number of workers. A worker owns a shard while it renews the lease with heartbeats, and
+    a shard whose lease expired is claimed by another worker.
+    """
+
+    __tablename__ = "notifier_shards"
+    alert_count = sqlalchemy.Column(sqlalchemy.Integer)
+    # The number of times the shard was claimed
+    attempts = sqlalchemy.Column(sqlalchemy.Integer, default=0, nullable=False)
+    # The epoch times that the shard was evaluated, that the owner last renewed the lease and that
+    # the lease expires
+    completed_at = sqlalchemy.Column(sqlalchemy.Float)
+    heartbeat_at = sqlalchemy.Column(sqlalchemy.Float)
+    lease_expires_at = sqlalchemy.Column(sqlalchemy.Float)
+    # The inclusive minimum and exclusive maximum of the zip code IDs in the shard, where None is
+    # unbounded
+    max_zip_code_id = sqlalchemy.Column(sqlalchemy.Integer)
+    min_zip_code_id = sqlalchemy.Column(sqlalchemy.Integer)
+    # Identifies the worker that owns the lease
+    owner = sqlalchemy.Column(sqlalchemy.String)
+    # Identifies the notifier run, such as the date of a nightly run
+    run_id = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    shard = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    shard_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+    # One of "pending" or "done"
+    status = sqlalchemy.Column(sqlalchemy.String, default="pending", nullable=False)
+
+
+class Notification(db.Model):
+    """An alert in the queue of notifications to deliver to the owner of the plant."""
+
+    __tablename__ = "notifications"
+    # Supports finding the pending notifications that are due in the order they became due
+    __table_args__ = (
+        sqlalchemy.Index("ix_notifications_status_available_at", "status", "available_at"),
+    )
+    # The number of delivery attempts, which is incremented when a worker claims the notification
+    attempts = sqlalchemy.Column(sqlalchemy.Integer, default=0, nullable=False)
+    # The epoch time after which the notification may be claimed by a worker
+    available_at = sqlalchemy.Column(sqlalchemy.Float, nullable=False)
+    # The random token of the worker that claimed the notification and the epoch time that the
+    # claim expires. A notification whose claim expired is claimed again, which guarantees that it
+    # is delivered at least once even if a worker dies.
+    claim_token = sqlalchemy.Column(sqlalchemy.String)
+    claimed_until = sqlalchemy.Column(sqlalchemy.Float)
+    created_at = sqlalchemy.Column(sqlalchemy.Float, nullable=False)
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    # Identifies the alert as "<plant ID>:<date>:<threshold>" so that it is only enqueued once
+    idempotency_key = sqlalchemy.Column(sqlalchemy.String, nullable=False, unique=True)
+    last_error = sqlalchemy.Column(sqlalchemy.String)
+    # The JSON of the alert that is given to the transport
+    payload = sqlalchemy.Column(sqlalchemy.Text, nullable=False)
+    sent_at = sqlalchemy.Column(sqlalchemy.Float)
+    # One of "pending", "sent" or "failed"
+    status = sqlalchemy.Column(sqlalchemy.String, default="pending", nullable=False)
+    user_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"))
 
 
 class Plant(db.Model):
     """A plant that is tied to a location and thresholds."""
 
     __tablename__ = "plants"
+    # The plants of a user are listed by name. The ID is implicitly part of the index in SQLite, so
+    # the index also covers the keyset pagination on the name and ID.
+    __table_args__ = (sqlalchemy.Index("ix_plants_user_id_name", "user_id", "name"),)
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    max_precipitation_id = sqlalchemy.Column(
-        sqlalchemy.ForeignKey("max_precipitations.id"), nullable=True
-    )
-    max_temp_id = sqlalchemy.Column(sqlalchemy.ForeignKey("max_temps.id"), nullable=True)
-    min_temp_id = sqlalchemy.Column(sqlalchemy.ForeignKey("min_temps.id"), nullable=True)
-    max_wind_id = sqlalchemy.Column(sqlalchemy.ForeignKey("max_winds.id"), nullable=True)
+    max_precipitation_enabled = sqlalchemy.Column(sqlalchemy.Boolean, nullable=True)
+    max_precipitation_value = sqlalchemy.Column(sqlalchemy.Float, nullable=True)
+    max_temp_enabled = sqlalchemy.Column(sqlalchemy.Boolean, nullable=True)
+    max_temp_value = sqlalchemy.Column(sqlalchemy.Float, nullable=True)
+    max_wind_enabled = sqlalchemy.Column(sqlalchemy.Boolean, nullable=True)
+    max_wind_value = sqlalchemy.Column(sqlalchemy.Float, nullable=True)
+    min_temp_enabled = sqlalchemy.Column(sqlalchemy.Boolean, nullable=True)
+    min_temp_value = sqlalchemy.Column(sqlalchemy.Float, nullable=True)
     name = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    # The epoch time that the thresholds or the zip code last changed, which determines whether the
+    # plant is evaluated again by an incremental notifier run. The plants created before the column
+    # was added have none, so they are only evaluated again when their forecast changes.
+    thresholds_modified_at = sqlalchemy.Column(sqlalchemy.Float, default=time.time)
     user_id = sqlalchemy.Column(sqlalchemy.ForeignKey("users.id"), nullable=False)
-    zip_code_id = sqlalchemy.Column(sqlalchemy.ForeignKey("zip_codes.id"), nullable=False)
+    zip_code_id = sqlalchemy.Column(
+        sqlalchemy.ForeignKey("zip_codes.id"), index=True, nullable=False
+    )
 
-    max_precipitation = sqlalchemy.orm.relationship("MaxPrecipitation", uselist=False)
-    max_temp = sqlalchemy.orm.relationship("MaxTemp", uselist=False)
-    max_wind = sqlalchemy.orm.relationship("MaxWind", uselist=False)
-    min_temp = sqlalchemy.orm.relationship("MinTemp", uselist=False)
+    max_precipitation = sqlalchemy.orm.composite(
+        MaxPrecipitation, max_precipitation_value, max_precipitation_enabled
+    )
+    max_temp = sqlalchemy.orm.composite(MaxTemp, max_temp_value, max_temp_enabled)
+    max_wind = sqlalchemy.orm.composite(MaxWind, max_wind_value, max_wind_enabled)
+    min_temp = sqlalchemy.orm.composite(MinTemp, min_temp_value, min_temp_enabled)
     user = sqlalchemy.orm.relationship("User", back_populates="plants")
     zip_code = sqlalchemy.orm.relationship("ZipCode", uselist=False)
 
+    # The names of the threshold attributes, which are set once all the models are defined
+    threshold_names = ()
+
+    @staticmethod
+    def validate_json(json_input):
+        """
+        Validate the input JSON.
+
+        The ID is accepted so that the output of ``to_json`` is valid input, but it is ignored.
+
+        :param dict json_input: the JSON input representing the Plant object
+        :raises ValidationError: if the input is invalid
+        """
+        if not isinstance(json_input, dict):
+            raise ValidationError("The plant must be an object")
+
+        valid_keys = {"id", "name", "zip_code", *Plant.threshold_names}
+        invalid_keys = json_input.keys() - valid_keys
+        if invalid_keys:
+            raise ValidationError(
+                f"The following keys are invalid: {', '.join(sorted(invalid_keys))}"
+            )
+
+        for key in ("name", "zip_code"):
+            if not isinstance(json_input.get(key), str) or not json_input[key]:
+                raise ValidationError(f"The {key} key must be a non-empty string")
+
+        for threshold_name in Plant.threshold_names:
+            try:
+                Threshold.validate_json(json_input.get(threshold_name))
+            except ValidationError as e:
+                raise ValidationError(f"The {threshold_name} key is invalid. {e}")
+
     def to_json(self):
         """
         Serialize the Plant object.
@@ -82,19 +262,10 @@ class Plant(db.Model):
         :return: the JSON object representing the plant
         :rtype: dict
         """
-        rv = {
-            "id": self.id,
-            "name": self.name,
-            "zip_code": self.zip_code.zip_code
-        }
-        # Add all the thresholds to the JSON object
-        for attr in dir(self):
-            if (attr.startswith("min_") or attr.startswith("max_")) and not attr.endswith("_id"):
-                threshold_name = attr
-                if getattr(self, threshold_name):
-                    rv[threshold_name] = getattr(self, threshold_name).to_json()
-                else:
-                    rv[threshold_name] = None
+        rv = {"id": self.id, "name": self.name, "zip_code": self.zip_code.zip_code}
+        for threshold_name in Plant.threshold_names:
+            threshold = getattr(self, threshold_name)
+            rv[threshold_name] = threshold.to_json(self.id) if threshold else None
 
         return rv
 
@@ -103,8 +274,14 @@ class User(db.Model):
     """A user that owns one or more plants."""
 
     __tablename__ = "users"
+    # The optional address that the alerts are emailed to
+    email = sqlalchemy.Column(sqlalchemy.String)
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     plants = sqlalchemy.orm.relationship("Plant", back_populates="user")
+    # Incremented on every write to the user's plants or their thresholds
+    plants_version = sqlalchemy.Column(
+        sqlalchemy.Integer, default=0, nullable=False, server_default="0"
+    )
     username = sqlalchemy.Column(sqlalchemy.String, nullable=False, index=True, unique=True)
     password = sqlalchemy.Column(sqlalchemy.String, nullable=False)
 
@@ -117,14 +294,17 @@ class User(db.Model):
         :return: the User object based on the JSON input
         :rtype: User
         :raises ValidationError: if the input is invalid or the user already exists
+        :raises werkzeug.exceptions.ServiceUnavailable: if too many passwords are being hashed
         """
         User.validate_json(json_input)
 
         if db.session.query(User).filter_by(username=json_input["username"]).count():
             raise ValidationError(f'The user "{json_input["username"]}" already exists')
 
-        password = bcrypt.hashpw(json_input["password"].encode("utf-8"), bcrypt.gensalt())
-        return User(password=password, username=json_input["username"])
+        password = passwords.hash_password(json_input["password"])
+        return User(
+            email=json_input.get("email"), password=password, username=json_input["username"]
+        )
 
     def to_json(self):
         """
@@ -133,7 +313,10 @@ class User(db.Model):
         :return: the JSON object representing the user
         :rtype: dict
         """
-        return {"username": self.username}
+        rv = {"username": self.username}
+        if self.email:
+            rv["email"] = self.email
+        return rv
 
     @staticmethod
     def validate_json(json_input):
@@ -144,12 +327,12 @@ class User(db.Model):
         :raises ValidationError: if the input is invalid
         """
         invalid_exception = ValidationError(
-            "The input JSON must only contain the following keys with string values: password and "
-            "username"
+            "The input JSON must only contain the following keys with string values: password, "
+            "username and the optional email"
         )
         if not isinstance(json_input, dict):
             raise invalid_exception
-        elif json_input.keys() != {"password", "username"}:
+        elif not {"password", "username"} <= json_input.keys() <= {"email", "password", "username"}:
             raise invalid_exception
 
         for value in json_input.values():
@@ -160,17 +343,161 @@ class User(db.Model):
         """
         Validate the input password.
 
+        If the stored hash was created with a different work factor than the configured one, it is
+        replaced with a new hash of the password. The caller is responsible for committing it.
+
         :param str input_password: the password provided by the user
         :raises werkzeug.exceptions.Unauthorized: if the password is incorrect
+        :raises werkzeug.exceptions.ServiceUnavailable: if too many passwords are being hashed
         """
-        if not bcrypt.checkpw(input_password.encode("utf-8"), self.password):
+        if not passwords.check_password(input_password, self.password):
             raise Unauthorized("The username or password was incorrect. Please try again.")
 
+        if passwords.needs_rehash(self.password):
+            self.password = passwords.hash_password(input_password)
+
 
 class ZipCode(db.Model):
     """A zip code representing a location for a plant."""
 
     __tablename__ = "zip_codes"
     coordinates = sqlalchemy.Column(sqlalchemy.String)
+    # The epoch time of the start of the last notifier run that evaluated the plants in the zip code
+    # and the digest of the forecast they were evaluated against. The time is None when the
+    # forecast changed and the plants still need to be evaluated against it.
+    evaluated_at = sqlalchemy.Column(sqlalchemy.Float)
+    forecast_digest = sqlalchemy.Column(sqlalchemy.String)
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     zip_code = sqlalchemy.Column(sqlalchemy.String, index=True, nullable=False, unique=True)
+
+    def get_coordinates(self):
+        """
+        Get the stored coordinates of the zip code.
+
+        :return: a tuple with the first index as the latitude and the second index as the longitude
+            or None if the coordinates are not stored
+        :rtype: tuple(float, float) or None
+        """
+        if not self.coordinates:
+            return None
+
+        latitude, longitude = self.coordinates.split(",")
+        return float(latitude), float(longitude)
+
+    def set_coordinates(self, coordinates):
+        """
+        Set the stored coordinates of the zip code.
+
+        :param tuple(float, float) coordinates: a tuple with the first index as the latitude and
+            the second index as the longitude
+        """
+        latitude, longitude = coordinates
+        self.coordinates = f"{float(latitude)!r},{float(longitude)!r}"
+
+
+def _get_threshold_names(model):
+    """
+    Find the names of the threshold attributes of a model from its mapper.
+
+    :param type model: the model class to inspect
+    :return: the sorted names of the composite attributes of Threshold subclasses
+    :rtype: tuple(str)
+    """
+    return tuple(
+        sorted(
+            composite.key
+            for composite in sqlalchemy.inspect(model).composites
+            if issubclass(composite.composite_class, Threshold)
+        )
+    )
+
+
+# Inspecting the mapper once here avoids scanning the attributes of every plant when serializing
+Plant.threshold_names = _get_threshold_names(Plant)
+# The attributes of a plant that affect its evaluation by the notifier
+_PLANT_EVALUATION_KEYS = tuple(
+    f"{threshold_name}_{suffix}"
+    for threshold_name in Plant.threshold_names
+    for suffix in ("enabled", "value")
+) + ("zip_code", "zip_code_id")
+
+
+def _get_changed_plant_user_ids(session):
+    """
+    Get the IDs of the users whose plants changed in the flush.
+
+    The thresholds are stored on the plants, so a change to a threshold is a change to its plant.
+
+    :param sqlalchemy.orm.Session session: the session that was flushed
+    :return: the user IDs
+    :rtype: set(int)
+    """
+    user_ids = set()
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if not isinstance(instance, Plant):
+            continue
+        if instance in session.dirty and not session.is_modified(instance):
+            continue
+        user_ids.add(instance.user_id)
+        # Account for a plant that was moved to another user
+        user_ids.update(sqlalchemy.inspect(instance).attrs.user_id.history.deleted)
+
+    user_ids.discard(None)
+    return user_ids
+
+
+@sqlalchemy.event.listens_for(db.session, "before_flush")
+def _stamp_modified_thresholds_before_flush(session, flush_context, instances):
+    """
+    Set the thresholds modification time of the plants whose thresholds or zip code changed.
+
+    :param sqlalchemy.orm.Session session: the session that is being flushed
+    :param sqlalchemy.orm.UOWTransaction flush_context: the internal state of the flush
+    :param instances: not used
+    """
+    now = time.time()
+    for instance in session.dirty:
+        if not isinstance(instance, Plant):
+            continue
+        attrs = sqlalchemy.inspect(instance).attrs
+        if any(attrs[key].history.has_changes() for key in _PLANT_EVALUATION_KEYS):
+            instance.thresholds_modified_at = now
+
+
+@sqlalchemy.event.listens_for(db.session, "after_flush")
+def _increment_plants_version_after_flush(session, flush_context):
+    """
+    Increment the plants version of the users whose plants changed in the flush.
+
+    The update is part of the flush's transaction, so the version is committed or rolled back with
+    the changes it represents.
+
+    :param sqlalchemy.orm.Session session: the session that was flushed
+    :param sqlalchemy.orm.UOWTransaction flush_context: the internal state of the flush
+    """
+    increment_plants_version(session, _get_changed_plant_user_ids(session))
+
+
+def increment_plants_version(session, user_ids):
+    """
+    Increment the plants version of the users.
+
+    This is done automatically when plants are written through the ORM, but it must be called when
+    the plants table is written to directly.
+
+    :param sqlalchemy.orm.Session session: the session whose transaction to increment them in
+    :param iterable user_ids: the IDs of the users whose plants changed
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    session.execute(
+        User.__table__.update()
+        .where(User.id.in_(sorted(user_ids)))
+        .values(plants_version=User.plants_version + 1)
+    )
+    # Expire the loaded versions so that they aren't stale
+    for instance in session.identity_map.values():
+        if isinstance(instance, User) and instance.id in user_ids:
+            session.expire(instance, ["plants_version"])
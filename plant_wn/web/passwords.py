@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+# The configuration of the password hashing, which is set by ``configure_password_hashing``
+_config = {"queue_size": 16, "retry_after": 1, "rounds": 12, "workers": 2}
+# The process pool that hashes the passwords, which is created on first use
+_executor = None
+_executor_lock = threading.Lock()
+# Limits the number of passwords being hashed or waiting to be hashed
+_slots = threading.BoundedSemaphore(_config["workers"] + _config["queue_size"])
+# The process that created the process pool. The pool must not be used by forked processes such
+# as gunicorn workers.
+_executor_pid = os.getpid()
+
+
+def _reset_executor():
+    """Forget the process pool of the parent process after a fork."""
+    global _executor, _executor_lock, _executor_pid, _slots
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    _executor_pid = os.getpid()
+    _slots = threading.BoundedSemaphore(_config["workers"] + _config["queue_size"])
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+
+def configure_password_hashing(workers=2, queue_size=16, rounds=12, retry_after=1):
+    """
+    Configure the password hashing and shut down the process pool that was already created.
+
+    :param int workers: the number of processes that hash passwords or 0 to hash them in the
+        calling thread
+    :param int queue_size: the maximum number of passwords waiting for a free process
+    :param int rounds: the bcrypt work factor of new password hashes
+    :param int retry_after: the number of seconds clients are told to wait when the pool is full
+    """
+    global _executor, _slots
+
+    with _executor_lock:
+        _config.update(
+            queue_size=queue_size, retry_after=retry_after, rounds=rounds, workers=workers
+        )
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        _slots = threading.BoundedSemaphore(workers + queue_size)
+
+
+def _get_executor():
+    """
+    Get the process pool shared by the process.
+
+    :return: the process pool
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    global _executor
+
+    if _executor_pid != os.getpid():
+        # This handles the forks on Python versions without os.register_at_fork
+        _reset_executor()
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=_config["workers"])
+        return _executor
+
+
+def _run(func, *args):
+    """
+    Run the CPU-bound function in the process pool and wait for the result.
+
+    :param callable func: the function to run, which must be picklable
+    :param args: the arguments to pass to the function
+    :return: the return value of the function
+    :raises werkzeug.exceptions.ServiceUnavailable: if too many passwords are already being hashed
+    """
+    if not _config["workers"]:
+        return func(*args)
+
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise ServiceUnavailable(
+            "Too many login and sign up requests are being processed. Please try again later.",
+            retry_after=_config["retry_after"],
+        )
+
+    try:
+        return _get_executor().submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def _check_password(password, hashed_password):
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def check_password(password, hashed_password):
+    """
+    Check the password against the stored hash.
+
+    :param str password: the password provided by the user
+    :param bytes hashed_password: the stored bcrypt hash
+    :return: True if the password matches the hash
+    :rtype: bool
+    :raises werkzeug.exceptions.ServiceUnavailable: if too many passwords are already being hashed
+    """
+    return _run(_check_password, password.encode("utf-8"), hashed_password)
+
+
+def hash_password(password):
+    """
+    Hash the password with the configured work factor.
+
+    :param str password: the password to hash
+    :return: the bcrypt hash
+    :rtype: bytes
+    :raises werkzeug.exceptions.ServiceUnavailable: if too many passwords are already being hashed
+    """
+    return _run(_hash_password, password.encode("utf-8"), _config["rounds"])
+
+
+def needs_rehash(hashed_password):
+    """
+    Determine if the hash was created with a different work factor than the configured one.
+
+    :param bytes hashed_password: the stored bcrypt hash
+    :return: True if the password should be hashed again
+    :rtype: bool
+    """
+    # The hash is in the format of $2b$<rounds>$<salt and checksum>
+    try:
+        rounds = int(hashed_password.split(b"$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != _config["rounds"]
@@ -0,0 +1,23 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from sqlalchemy.dialects import postgresql
+
+from plant_wn.web import db
+
+
+def get_insert_ignore(table):
+    """
+    Get an INSERT statement that skips the rows that violate a unique constraint.
+
+    :param sqlalchemy.Table table: the table to insert into
+    :return: the INSERT statement
+    :rtype: sqlalchemy.sql.expression.Insert
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        return table.insert().prefix_with("OR IGNORE")
+    elif dialect == "mysql":
+        return table.insert().prefix_with("IGNORE")
+
+    return table.insert()  # pragma: no cover
@@ -14,6 +14,7 @@ setup(
         "flask-jwt-extended",
         "flask-migrate",
         "flask-sqlalchemy",
+        "numpy",
         "requests",
     ],
     classifiers=[
@@ -21,7 +22,7 @@ setup(
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
     ],
-    entry_points={"console_scripts": ["plant-wn=plan_wn.web.manage:cli"]},
+    entry_points={"console_scripts": ["plant-wn=plant_wn.web.manage:cli"]},
     license="GPLv3+",
     python_requires=">=3.6",
 )
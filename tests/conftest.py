@@ -61,4 +61,4 @@ def user(db):
 @pytest.fixture()
 def user_token(user):
     """Generate and return a JWT token for the user from the user fixture."""
-    return create_access_token(identity="han_solo")
+    return create_access_token(identity="han_solo", user_claims={"uid": user.id})
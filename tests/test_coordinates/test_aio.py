@@ -0,0 +1,28 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+from unittest import mock
+
+from plant_wn.coordinates.aio import AsyncCoordinatesAPI
+
+
+def test_async_coordinates_api():
+    mock_api = mock.Mock()
+    mock_api.get_coordinates.return_value = (35.774451, -78.63274)
+    mock_api.get_coordinates_bulk.return_value = ({"27601": (35.774451, -78.63274)}, [])
+    async_api = AsyncCoordinatesAPI(mock_api)
+
+    async def get_all():
+        return (
+            await async_api.get_coordinates(),
+            await async_api.get_coordinates_bulk(iter(["27601"])),
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        coordinates, bulk = loop.run_until_complete(get_all())
+    finally:
+        loop.close()
+
+    assert coordinates == (35.774451, -78.63274)
+    assert bulk == ({"27601": (35.774451, -78.63274)}, [])
+    mock_api.get_coordinates_bulk.assert_called_once_with(["27601"])
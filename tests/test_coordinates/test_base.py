@@ -0,0 +1,25 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from plant_wn.coordinates.base import BaseCoordinatesAPI
+from plant_wn.exceptions import CoordinatesAPIError
+
+
+class FakeCoordinatesAPI(BaseCoordinatesAPI):
+    """A coordinates API with hardcoded coordinates."""
+
+    coordinates = {"27601": (35.774451, -78.63274), "02108": (42.357603, -71.068432)}
+
+    def get_coordinates(self):
+        """Get the hardcoded coordinates for the zip code."""
+        if self.zip_code not in self.coordinates:
+            raise CoordinatesAPIError("Not found")
+        return self.coordinates[self.zip_code]
+
+
+def test_get_coordinates_bulk():
+    api = FakeCoordinatesAPI(api_key="some key")
+
+    coordinates, not_found = api.get_coordinates_bulk(["27601", "00000", "02108", "27601"])
+
+    assert coordinates == {"27601": (35.774451, -78.63274), "02108": (42.357603, -71.068432)}
+    assert not_found == ["00000"]
+    assert api.zip_code is None
@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import io
+import mmap
+from unittest import mock
+
+import pytest
+
+from plant_wn.coordinates.gazetteer import build_gazetteer, Gazetteer, GazetteerAPI
+from plant_wn.exceptions import CoordinatesAPIError, ValidationError
+
+CSV_EXPORT = """\
+Zip;City;State;Latitude;Longitude;Timezone;Daylight savings time flag;geopoint
+27601;Raleigh;NC;35.774451;-78.63274;-5;1;35.774451,-78.63274
+02108;Boston;MA;42.357603;-71.068432;-5;1;42.357603,-71.068432
+99501;Anchorage;AK;61.211571;-149.87667;-9;1;61.211571,-149.87667
+00601;Adjuntas;PR;18.180103;-66.74947;-4;0;18.180103,-66.74947
+ABCDE;Nowhere;NC;1.0;1.0;-5;1;1.0,1.0
+27602;Raleigh;NC;;;-5;1;
+"""
+
+
+@pytest.fixture()
+def gazetteer_path(tmpdir):
+    path = str(tmpdir.join("data", "us_zip_codes.bin"))
+    assert build_gazetteer(io.StringIO(CSV_EXPORT), path) == 4
+    return path
+
+
+@pytest.mark.parametrize(
+    "zip_code, expected",
+    (
+        ("27601", (35.774451, -78.63274)),
+        ("02108", (42.357603, -71.068432)),
+        ("99501", (61.211571, -149.87667)),
+        ("00601", (18.180103, -66.74947)),
+        ("27601-1234", (35.774451, -78.63274)),
+        ("27602", None),
+        ("00000", None),
+        ("99999", None),
+        ("2760", None),
+        ("ABCDE", None),
+    ),
+)
+def test_lookup(zip_code, expected, gazetteer_path):
+    assert Gazetteer(gazetteer_path).lookup(zip_code) == expected
+
+
+def test_open_shared(gazetteer_path):
+    assert Gazetteer.open(gazetteer_path) is Gazetteer.open(gazetteer_path)
+
+
+def test_open_rebuilt(gazetteer_path):
+    gazetteer = Gazetteer.open(gazetteer_path)
+    assert gazetteer.lookup("27602") is None
+
+    build_gazetteer(
+        io.StringIO(CSV_EXPORT.replace("27602;Raleigh;NC;;", "27602;Raleigh;NC;1;2")),
+        gazetteer_path,
+    )
+
+    rebuilt = Gazetteer.open(gazetteer_path)
+    assert rebuilt is not gazetteer
+    assert rebuilt.lookup("27602") == (1.0, 2.0)
+
+
+def test_open_not_configured():
+    with pytest.raises(
+        CoordinatesAPIError, match="The path to the gazetteer table is not configured"
+    ):
+        Gazetteer.open(None)
+
+
+def test_open_missing(tmpdir):
+    with pytest.raises(CoordinatesAPIError, match="The gazetteer table could not be opened"):
+        Gazetteer(str(tmpdir.join("missing.bin")))
+
+
+def test_open_invalid(tmpdir):
+    path = tmpdir.join("invalid.bin")
+    path.write_binary(b"not a gazetteer table")
+    mmaps = []
+    mmap_cls = mmap.mmap
+
+    def get_mmap(*args, **kwargs):
+        mmaps.append(mmap_cls(*args, **kwargs))
+        return mmaps[-1]
+
+    with mock.patch("plant_wn.coordinates.gazetteer.mmap.mmap", side_effect=get_mmap):
+        with pytest.raises(CoordinatesAPIError, match="The gazetteer table is invalid"):
+            Gazetteer(str(path))
+
+    # The mapping of the invalid table isn't leaked
+    assert mmaps[0].closed
+
+
+def test_get_coordinates(gazetteer_path):
+    api = GazetteerAPI("27601", path=gazetteer_path)
+    assert api.get_coordinates() == (35.774451, -78.63274)
+
+
+def test_get_coordinates_not_found(gazetteer_path):
+    api = GazetteerAPI("27602", path=gazetteer_path)
+    expected = "The coordinates for the zip code could not be found in the gazetteer"
+    with pytest.raises(CoordinatesAPIError, match=expected):
+        api.get_coordinates()
+
+
+def test_build_gazetteer_missing_columns(tmpdir):
+    expected = "The CSV export must have the following columns: Zip, Latitude, and Longitude"
+    with pytest.raises(ValidationError, match=expected):
+        build_gazetteer(io.StringIO("Zip;City\n27601;Raleigh\n"), str(tmpdir.join("table.bin")))
+
+
+def test_get_coordinates_bulk(gazetteer_path):
+    api = GazetteerAPI(path=gazetteer_path)
+
+    coordinates, not_found = api.get_coordinates_bulk(["27601", "27602", "02108", "27601"])
+
+    assert coordinates == {"27601": (35.774451, -78.63274), "02108": (42.357603, -71.068432)}
+    assert not_found == ["27602"]
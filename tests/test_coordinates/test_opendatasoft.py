@@ -60,6 +60,7 @@ def test_get_coordinates_bad_status_code():
     api = OpenDataSoftAPI("27601", api_key="some key")
     mock_session = mock.Mock()
     mock_session.get.return_value.ok = False
+    mock_session.get.return_value.status_code = 500
     api.session = mock_session
 
     expected = "Failed to get the coordinates from the OpenDataSoft API"
@@ -87,3 +88,53 @@ def test_get_coordinates_no_records():
     expected = "The coordinates for the zip code could not be found using the OpenDataSoft API"
     with pytest.raises(CoordinatesAPIError, match=expected):
         api.get_coordinates()
+
+
+def _get_record(zip_code, latitude, longitude):
+    return {
+        "datasetid": "us-zip-code-latitude-and-longitude",
+        "fields": {"zip": zip_code, "geopoint": [latitude, longitude]},
+    }
+
+
+def test_get_coordinates_bulk():
+    api = OpenDataSoftAPI()
+    api.bulk_batch_size = 2
+    mock_session = mock.Mock()
+    mock_session.get.return_value.ok = True
+    mock_session.get.return_value.json.side_effect = [
+        {"records": [_get_record("02108", 42.357603, -71.068432)]},
+        {"records": [_get_record("27601", 35.774451, -78.63274)]},
+    ]
+    api.session = mock_session
+
+    coordinates, not_found = api.get_coordinates_bulk(["02108", "00000", "27601", "02108"])
+
+    assert coordinates == {"02108": (42.357603, -71.068432), "27601": (35.774451, -78.63274)}
+    assert not_found == ["00000"]
+    assert mock_session.get.call_count == 2
+    assert mock_session.get.call_args_list[0][1]["params"] == {
+        "dataset": "us-zip-code-latitude-and-longitude",
+        "q": "zip:02108 OR zip:00000",
+        "rows": 2,
+    }
+    assert mock_session.get.call_args_list[1][1]["params"]["q"] == "zip:27601"
+
+
+def test_get_coordinates_bulk_failed_batch():
+    api = OpenDataSoftAPI()
+    api.bulk_batch_size = 1
+    failed = mock.Mock(ok=False, status_code=500)
+    invalid = mock.Mock(ok=True)
+    invalid.json.side_effect = ValueError("Invalid JSON")
+    found = mock.Mock(ok=True)
+    found.json.return_value = {"records": [_get_record("27601", 35.774451, -78.63274)]}
+    mock_session = mock.Mock()
+    mock_session.get.side_effect = [failed, invalid, found]
+    api.session = mock_session
+
+    coordinates, not_found = api.get_coordinates_bulk(["02108", "99501", "27601"])
+
+    # The zip codes of the failed batches are not found instead of failing the others
+    assert coordinates == {"27601": (35.774451, -78.63274)}
+    assert not_found == ["02108", "99501"]
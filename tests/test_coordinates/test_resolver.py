@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import functools
+from unittest import mock
+
+import pytest
+
+from plant_wn.coordinates.resolver import CoordinatesResolver, get_coordinates_resolver
+from plant_wn.exceptions import CoordinatesAPIError
+from plant_wn.web import models
+
+
+def test_resolve_from_api(db):
+    zip_code = models.ZipCode(zip_code="27601")
+    db.session.add(zip_code)
+    db.session.commit()
+    mock_api_cls = mock.Mock()
+    mock_api_cls.return_value.get_coordinates.return_value = (35.774451, -78.63274)
+    resolver = CoordinatesResolver(mock_api_cls, api_key="some key")
+
+    assert resolver.resolve("27601") == (35.774451, -78.63274)
+    mock_api_cls.assert_called_once_with("27601", api_key="some key")
+    db.session.expire_all()
+    assert zip_code.coordinates == "35.774451,-78.63274"
+    # The second lookup is served from the LRU cache
+    assert resolver.resolve("27601") == (35.774451, -78.63274)
+    assert mock_api_cls.call_count == 1
+
+
+def test_resolve_from_database(db):
+    zip_code = models.ZipCode(zip_code="27601", coordinates="35.774451,-78.63274")
+    db.session.add(zip_code)
+    db.session.commit()
+    mock_api_cls = mock.Mock()
+    resolver = CoordinatesResolver(mock_api_cls)
+
+    assert resolver.resolve(zip_code) == (35.774451, -78.63274)
+    assert resolver.resolve("27601") == (35.774451, -78.63274)
+    mock_api_cls.assert_not_called()
+
+
+def test_resolve_unknown_zip_code(db):
+    mock_api_cls = mock.Mock()
+    mock_api_cls.return_value.get_coordinates.return_value = (42.357603, -71.068432)
+    resolver = CoordinatesResolver(mock_api_cls)
+
+    assert resolver.resolve("02108") == (42.357603, -71.068432)
+    assert db.session.query(models.ZipCode).count() == 0
+
+
+def test_resolve_api_error(db):
+    mock_api_cls = mock.Mock()
+    mock_api_cls.return_value.get_coordinates.side_effect = CoordinatesAPIError("oops")
+    resolver = CoordinatesResolver(mock_api_cls)
+
+    with pytest.raises(CoordinatesAPIError, match="oops"):
+        resolver.resolve("02108")
+
+
+def test_resolve_lru_eviction(db):
+    mock_api_cls = mock.Mock()
+    mock_api_cls.return_value.get_coordinates.return_value = (1.0, 2.0)
+    resolver = CoordinatesResolver(mock_api_cls, cache_size=2)
+
+    for zip_code in ("00001", "00002", "00001", "00003", "00001", "00002"):
+        resolver.resolve(zip_code)
+
+    # 00002 is evicted by 00003 since 00001 was used more recently
+    assert [call[0][0] for call in mock_api_cls.call_args_list] == [
+        "00001",
+        "00002",
+        "00003",
+        "00002",
+    ]
+
+
+def test_resolve_many(db):
+    stored = models.ZipCode(zip_code="27601", coordinates="35.774451,-78.63274")
+    unstored = models.ZipCode(zip_code="02108")
+    queried = models.ZipCode(zip_code="99501")
+    db.session.add_all([stored, unstored, queried])
+    db.session.commit()
+    mock_api_cls = mock.Mock()
+    mock_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"02108": (42.357603, -71.068432), "99501": (61.211571, -149.87667)},
+        ["00000"],
+    )
+    resolver = CoordinatesResolver(mock_api_cls, api_key="some key")
+
+    coordinates, not_found = resolver.resolve_many([stored, unstored, "99501", "00000", "27601"])
+
+    assert coordinates == {
+        "27601": (35.774451, -78.63274),
+        "02108": (42.357603, -71.068432),
+        "99501": (61.211571, -149.87667),
+    }
+    assert not_found == ["00000"]
+    mock_api_cls.assert_called_once_with(api_key="some key")
+    mock_api_cls.return_value.get_coordinates_bulk.assert_called_once_with(
+        ["02108", "99501", "00000"]
+    )
+    db.session.expire_all()
+    assert unstored.coordinates == "42.357603,-71.068432"
+    assert queried.coordinates == "61.211571,-149.87667"
+
+    # Everything that was found is now cached
+    mock_api_cls.reset_mock()
+    mock_api_cls.return_value.get_coordinates_bulk.return_value = ({}, ["00000"])
+    coordinates, not_found = resolver.resolve_many(["27601", "02108", "99501", "00000"])
+    assert len(coordinates) == 3
+    mock_api_cls.return_value.get_coordinates_bulk.assert_called_once_with(["00000"])
+
+
+def test_get_coordinates_resolver():
+    mock_api_cls = mock.Mock()
+    resolver = get_coordinates_resolver(mock_api_cls, "some key")
+
+    assert get_coordinates_resolver(mock_api_cls, "some key") is resolver
+    assert get_coordinates_resolver(mock_api_cls, "other key") is not resolver
+    assert resolver.coordinates_api_cls is mock_api_cls
+    assert resolver.api_key == "some key"
+
+
+def test_get_coordinates_resolver_partial():
+    mock_api_cls = mock.Mock()
+    resolver = get_coordinates_resolver(functools.partial(mock_api_cls, path="table.bin"))
+
+    # The partials are created from the config by every notifier run
+    assert get_coordinates_resolver(functools.partial(mock_api_cls, path="table.bin")) is resolver
+    assert (
+        get_coordinates_resolver(functools.partial(mock_api_cls, path="other.bin")) is not resolver
+    )
@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import socketserver
+import threading
+
+import pytest
+
+from plant_wn.web import models
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Speak just enough SMTP to receive the emails of the SMTP transport."""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("utf-8"))
+
+    def handle(self):
+        self.server.connections += 1
+        self._reply("220 stub ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode("utf-8").rstrip("\r\n")
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self._reply("221 Bye")
+                return
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip().strip("<>")
+                if address in self.server.rejected:
+                    self._reply("550 No such user")
+                    continue
+                recipients.append(address)
+                self._reply("250 OK")
+            elif command == "DATA" and self.server.data_replies:
+                recipients = []
+                self._reply(self.server.data_replies.pop(0))
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b".\r\n"):
+                    data.append(data_line.decode("utf-8"))
+                self.server.messages.append((recipients, "".join(data)))
+                recipients = []
+                self._reply("250 Queued")
+            else:
+                self._reply("250 OK")
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Record the requests of the webhook transport and reply with the queued status codes."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.requests.append((dict(self.headers), body))
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture()
+def smtp_server():
+    """Yield a local SMTP server that stores the emails it receives in ``messages``."""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.messages = []
+    server.rejected = set()
+    server.data_replies = []
+    yield from _serve(server)
+
+
+@pytest.fixture()
+def webhook_server():
+    """Yield a local HTTP server that stores the requests it receives in ``requests``."""
+    server = HTTPServer(("127.0.0.1", 0), _WebhookHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.statuses = []
+    server.url = f"http://127.0.0.1:{server.server_port}/hook"
+    yield from _serve(server)
+
+
+@pytest.fixture()
+def plants(db, user):
+    """Create two plants of the user and return them."""
+    user.email = "han@example.com"
+    zip_code = models.ZipCode(zip_code="27601")
+    plants = [
+        models.Plant(name="Fern", user=user, zip_code=zip_code),
+        models.Plant(name="Plumeria", user=user, zip_code=zip_code),
+    ]
+    db.session.add_all(plants)
+    db.session.commit()
+    return plants
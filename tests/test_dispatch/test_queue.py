@@ -0,0 +1,175 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import datetime
+import json
+import time
+
+import pytest
+
+from plant_wn.dispatch import queue
+from plant_wn.exceptions import DispatchError
+from plant_wn.notifier.engine import Alert
+from plant_wn.web import models
+
+TODAY = datetime.date(2020, 7, 1)
+
+
+def _get_alert(plant_id, threshold, day, forecast, value):
+    return Alert(plant_id, threshold, day, TODAY + datetime.timedelta(days=day), forecast, value)
+
+
+def _enqueue(plants):
+    alerts = [
+        _get_alert(plants[0].id, "max_temp", 0, 101.5, 95.0),
+        _get_alert(plants[0].id, "max_temp", 2, 99.0, 95.0),
+        _get_alert(plants[1].id, "min_temp", 1, 28.0, 32.0),
+    ]
+    return queue.enqueue_alerts(alerts)
+
+
+def test_enqueue_alerts(db, plants):
+    assert _enqueue(plants) == 3
+
+    notifications = db.session.query(models.Notification).order_by(models.Notification.id).all()
+    assert [notification.idempotency_key for notification in notifications] == [
+        f"{plants[0].id}:2020-07-01:max_temp",
+        f"{plants[0].id}:2020-07-03:max_temp",
+        f"{plants[1].id}:2020-07-02:min_temp",
+    ]
+    assert {notification.status for notification in notifications} == {"pending"}
+    assert json.loads(notifications[2].payload) == {
+        "date": "2020-07-02",
+        "forecast": 28.0,
+        "plant": {"id": plants[1].id, "name": "Plumeria"},
+        "threshold": "min_temp",
+        "user": {"email": "han@example.com", "id": plants[1].user_id, "username": "han_solo"},
+        "value": 32.0,
+    }
+
+
+def test_enqueue_alerts_idempotent(db, plants):
+    assert _enqueue(plants) == 3
+    # The same alerts from a later run on the same day are not enqueued again
+    assert _enqueue(plants) == 0
+    assert db.session.query(models.Notification).count() == 3
+
+
+def test_enqueue_alerts_forecast_date(db, plants):
+    # The date is the one of the forecast rather than the day counted from when it is enqueued
+    alerts = [Alert(plants[0].id, "max_temp", 1, datetime.date(2020, 6, 30), 101.5, 95.0)]
+
+    assert queue.enqueue_alerts(alerts) == 1
+
+    notification = db.session.query(models.Notification).one()
+    assert notification.idempotency_key == f"{plants[0].id}:2020-06-30:max_temp"
+    assert json.loads(notification.payload)["date"] == "2020-06-30"
+
+
+def test_enqueue_alerts_deleted_plant(db, plants):
+    alerts = [
+        _get_alert(plants[0].id, "max_temp", 0, 101.5, 95.0),
+        _get_alert(1234, "max_temp", 0, 1, 0),
+    ]
+    assert queue.enqueue_alerts(alerts) == 1
+
+
+def test_claim_notifications(db, plants):
+    _enqueue(plants)
+
+    deliveries = queue.claim_notifications(2, lease=300, max_attempts=5)
+
+    assert [delivery.idempotency_key for delivery in deliveries] == [
+        f"{plants[0].id}:2020-07-01:max_temp",
+        f"{plants[0].id}:2020-07-03:max_temp",
+    ]
+    assert {delivery.attempts for delivery in deliveries} == {1}
+    assert deliveries[0].payload["plant"]["name"] == "Fern"
+    # The claimed notifications are not claimed again while the lease is valid
+    remaining = queue.claim_notifications(10, lease=300, max_attempts=5)
+    assert [delivery.id for delivery in remaining] == [3]
+    assert queue.claim_notifications(10, lease=300, max_attempts=5) == []
+
+
+def test_claim_notifications_expired_lease(db, plants):
+    _enqueue(plants)
+    first = queue.claim_notifications(10, lease=0, max_attempts=5)
+    time.sleep(0.01)
+
+    # The notifications of a worker that didn't finish before its lease expired are claimed again
+    second = queue.claim_notifications(10, lease=300, max_attempts=5)
+
+    assert [delivery.id for delivery in second] == [delivery.id for delivery in first]
+    assert {delivery.attempts for delivery in second} == {2}
+    assert first[0].claim_token != second[0].claim_token
+
+
+def test_claim_notifications_max_attempts(db, plants):
+    _enqueue(plants)
+    queue.claim_notifications(1, lease=0, max_attempts=5)
+    time.sleep(0.01)
+
+    # The notification whose lease expired during its last attempt is given up on
+    remaining = queue.claim_notifications(10, lease=300, max_attempts=1)
+
+    assert [delivery.id for delivery in remaining] == [2, 3]
+    notification = db.session.query(models.Notification).get(1)
+    assert notification.status == "failed"
+    assert notification.last_error == "The lease expired during the last attempt"
+    assert notification.claim_token is None
+
+
+def test_record_results(db, plants):
+    _enqueue(plants)
+    sent, retried, given_up = queue.claim_notifications(10, lease=300, max_attempts=5)
+    before = time.time()
+
+    rv = queue.record_results(
+        [sent],
+        [(retried, DispatchError("Try again")), (given_up, DispatchError("No", retryable=False))],
+        max_attempts=5,
+        backoff=30,
+        max_backoff=3600,
+    )
+
+    assert rv == (1, 1)
+    db.session.expire_all()
+    notifications = db.session.query(models.Notification).order_by(models.Notification.id).all()
+    assert [notification.status for notification in notifications] == ["sent", "pending", "failed"]
+    assert [notification.last_error for notification in notifications] == [None, "Try again", "No"]
+    assert {notification.claim_token for notification in notifications} == {None}
+    assert notifications[0].sent_at >= before
+    assert notifications[1].available_at >= before + 30
+    # The retried notification isn't due until the backoff passes
+    assert queue.claim_notifications(10, lease=300, max_attempts=5) == []
+
+
+def test_record_results_max_attempts(db, plants):
+    _enqueue(plants)
+    deliveries = queue.claim_notifications(1, lease=300, max_attempts=5)
+
+    rv = queue.record_results(
+        [], [(deliveries[0], DispatchError("Try again"))], max_attempts=1, backoff=0, max_backoff=0
+    )
+
+    assert rv == (0, 1)
+    assert db.session.query(models.Notification).get(deliveries[0].id).status == "failed"
+
+
+def test_record_results_stale_claim(db, plants):
+    _enqueue(plants)
+    stale = queue.claim_notifications(1, lease=0, max_attempts=5)[0]
+    time.sleep(0.01)
+    current = queue.claim_notifications(1, lease=300, max_attempts=5)[0]
+
+    # The worker whose lease expired doesn't overwrite the claim of the current worker
+    queue.record_results([stale], [], max_attempts=5, backoff=30, max_backoff=3600)
+
+    notification = db.session.query(models.Notification).get(current.id)
+    assert notification.status == "pending"
+    assert notification.claim_token == current.claim_token
+
+
+@pytest.mark.parametrize(
+    "attempts, expected", ((1, 30), (2, 60), (3, 120), (7, 1920), (8, 3600), (20, 3600))
+)
+def test_get_backoff(attempts, expected):
+    assert queue.get_backoff(attempts, backoff=30, max_backoff=3600) == expected
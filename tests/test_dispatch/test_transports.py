@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import email
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from plant_wn.dispatch.queue import Delivery
+from plant_wn.dispatch.transports import get_transport, SMTPTransport, WebhookTransport
+from plant_wn.exceptions import ConfigError, DispatchError
+from plant_wn.web.config import Config
+
+
+def _get_delivery(email_address="han@example.com"):
+    payload = {
+        "date": "2020-07-01",
+        "forecast": 101.5,
+        "plant": {"id": 1, "name": "Fern"},
+        "threshold": "max_temp",
+        "user": {"email": email_address, "id": 1, "username": "han_solo"},
+        "value": 95.0,
+    }
+    return Delivery(1, "1:2020-07-01:max_temp", 1, "token", payload)
+
+
+def test_smtp_transport(smtp_server):
+    transport = SMTPTransport("127.0.0.1", port=smtp_server.server_address[1], sender="a@b.com")
+    transport.send(_get_delivery())
+    transport.send(_get_delivery("leia@example.com"))
+    transport.close()
+
+    # The connection is reused for the second email
+    assert smtp_server.connections == 1
+    assert [recipients for recipients, _ in smtp_server.messages] == [
+        ["han@example.com"],
+        ["leia@example.com"],
+    ]
+    message = email.message_from_string(smtp_server.messages[0][1])
+    assert message["From"] == "a@b.com"
+    assert message["To"] == "han@example.com"
+    assert message["Subject"] == 'Weather alert for your plant "Fern"'
+    assert message["Message-ID"] == "<1.2020-07-01.max_temp@plant-wn>"
+    assert message.get_payload(decode=True).decode("utf-8").strip() == (
+        'The max temp threshold of 95.0 of your plant "Fern" is exceeded on 2020-07-01 with a '
+        "forecast of 101.5."
+    )
+
+
+def test_smtp_transport_no_email():
+    transport = SMTPTransport("127.0.0.1", port=1)
+
+    with pytest.raises(DispatchError, match='The user "han_solo" does not have') as exc_info:
+        transport.send(_get_delivery(None))
+
+    assert exc_info.value.retryable is False
+
+
+def test_smtp_transport_recipient_refused(smtp_server):
+    smtp_server.rejected.add("han@example.com")
+    transport = SMTPTransport("127.0.0.1", port=smtp_server.server_address[1])
+
+    with pytest.raises(DispatchError, match="The recipient was refused") as exc_info:
+        transport.send(_get_delivery())
+
+    assert exc_info.value.retryable is False
+    transport.close()
+
+
+def test_smtp_transport_data_error(smtp_server):
+    smtp_server.data_replies.append("451 Try again later")
+    transport = SMTPTransport("127.0.0.1", port=smtp_server.server_address[1])
+
+    with pytest.raises(DispatchError, match="The SMTP server rejected the email: 451") as exc_info:
+        transport.send(_get_delivery())
+    transport.send(_get_delivery())
+    transport.close()
+
+    assert exc_info.value.retryable is True
+    # The connection is not reused after the error
+    assert smtp_server.connections == 2
+    assert len(smtp_server.messages) == 1
+
+
+def test_smtp_transport_unreachable(smtp_server):
+    port = smtp_server.server_address[1]
+    smtp_server.shutdown()
+    smtp_server.server_close()
+    transport = SMTPTransport("127.0.0.1", port=port, timeout=1)
+
+    with pytest.raises(DispatchError, match="The email could not be sent") as exc_info:
+        transport.send(_get_delivery())
+
+    assert exc_info.value.retryable is True
+
+
+def test_webhook_transport(webhook_server):
+    transport = WebhookTransport(webhook_server.url, secret="s3cr3t")
+    transport.send(_get_delivery())
+    transport.close()
+
+    headers, body = webhook_server.requests[0]
+    assert json.loads(body) == _get_delivery().payload
+    assert headers["Idempotency-Key"] == "1:2020-07-01:max_temp"
+    assert headers["Content-Type"] == "application/json"
+    digest = hmac.new(b"s3cr3t", body, hashlib.sha256).hexdigest()
+    assert headers["X-Plant-WN-Signature"] == f"sha256={digest}"
+
+
+def test_webhook_transport_no_secret(webhook_server):
+    WebhookTransport(webhook_server.url).send(_get_delivery())
+
+    assert "X-Plant-WN-Signature" not in webhook_server.requests[0][0]
+
+
+@pytest.mark.parametrize(
+    "status_code, retryable", ((400, False), (404, False), (429, True), (500, True), (503, True))
+)
+def test_webhook_transport_error(webhook_server, status_code, retryable):
+    webhook_server.statuses.append(status_code)
+    transport = WebhookTransport(webhook_server.url)
+
+    with pytest.raises(DispatchError, match=f"status code {status_code}") as exc_info:
+        transport.send(_get_delivery())
+
+    assert exc_info.value.retryable is retryable
+
+
+def test_webhook_transport_unreachable():
+    transport = WebhookTransport("http://127.0.0.1:1/hook", timeout=1)
+
+    with pytest.raises(DispatchError, match="The webhook could not be reached") as exc_info:
+        transport.send(_get_delivery())
+
+    assert exc_info.value.retryable is True
+
+
+def _get_config(**kwargs):
+    config = {key: getattr(Config, key) for key in dir(Config) if key.startswith("PLANT_WN_")}
+    config.update(kwargs)
+    return config
+
+
+def test_get_transport():
+    transport = get_transport(_get_config(PLANT_WN_SMTP_HOST="mail.example.com"))
+    assert isinstance(transport, SMTPTransport)
+    assert transport.sender == "plant-wn@mail.example.com"
+
+    transport = get_transport(
+        _get_config(PLANT_WN_DISPATCH_TRANSPORT="webhook", PLANT_WN_WEBHOOK_URL="http://hook")
+    )
+    assert isinstance(transport, WebhookTransport)
+    assert transport.url == "http://hook"
+
+
+@pytest.mark.parametrize(
+    "config, error",
+    (
+        ({"PLANT_WN_DISPATCH_TRANSPORT": "webhook"}, "PLANT_WN_WEBHOOK_URL must be set"),
+        ({"PLANT_WN_DISPATCH_TRANSPORT": "pigeon"}, 'The notification transport "pigeon" is not'),
+    ),
+)
+def test_get_transport_invalid(config, error):
+    with pytest.raises(ConfigError, match=error):
+        get_transport(_get_config(**config))
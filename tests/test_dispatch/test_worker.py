@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import datetime
+import json
+
+from plant_wn.dispatch import queue
+from plant_wn.dispatch.transports import WebhookTransport
+from plant_wn.dispatch.worker import Dispatcher
+from plant_wn.notifier.engine import Alert
+from plant_wn.web import models
+from plant_wn.web.manage import dispatch
+
+
+def _enqueue(plants, days=5):
+    alerts = [
+        Alert(plant.id, threshold, day, datetime.date(2020, 7, 1 + day), 100.0, 90.0)
+        for plant in plants
+        for threshold in ("max_temp", "max_wind")
+        for day in range(days)
+    ]
+    return queue.enqueue_alerts(alerts)
+
+
+def _get_statuses(db):
+    rows = db.session.query(models.Notification.status).order_by(models.Notification.id)
+    return [row[0] for row in rows]
+
+
+def test_dispatcher_run(db, plants, webhook_server):
+    count = _enqueue(plants)
+    dispatcher = Dispatcher(WebhookTransport(webhook_server.url), batch_size=3)
+
+    totals = dispatcher.run(workers=3, drain=True)
+
+    assert totals == {"sent": count, "retried": 0, "failed": 0}
+    assert _get_statuses(db) == ["sent"] * count
+    # Every notification is delivered exactly once when no worker dies
+    keys = [headers["Idempotency-Key"] for headers, _ in webhook_server.requests]
+    assert sorted(keys) == sorted(set(keys))
+    assert len(keys) == count
+
+
+def test_dispatcher_retries(db, plants, webhook_server):
+    _enqueue(plants[:1], days=1)
+    webhook_server.statuses.extend([503, 500])
+    dispatcher = Dispatcher(WebhookTransport(webhook_server.url), backoff=0, max_backoff=0)
+
+    totals = dispatcher.run(workers=1, drain=True)
+
+    assert totals == {"sent": 2, "retried": 2, "failed": 0}
+    assert _get_statuses(db) == ["sent", "sent"]
+    notifications = db.session.query(models.Notification).order_by(models.Notification.id).all()
+    assert [notification.attempts for notification in notifications] == [2, 2]
+
+
+def test_dispatcher_gives_up(db, plants, webhook_server):
+    _enqueue(plants[:1], days=1)
+    webhook_server.statuses.extend([500, 400, 500])
+    dispatcher = Dispatcher(
+        WebhookTransport(webhook_server.url), max_attempts=2, backoff=0, max_backoff=0
+    )
+
+    totals = dispatcher.run(workers=1, drain=True)
+
+    assert totals == {"sent": 0, "retried": 1, "failed": 2}
+    assert _get_statuses(db) == ["failed", "failed"]
+
+
+def test_dispatch_command(app, db, plants, webhook_server):
+    app.config["PLANT_WN_DISPATCH_TRANSPORT"] = "webhook"
+    app.config["PLANT_WN_WEBHOOK_URL"] = webhook_server.url
+    count = _enqueue(plants, days=1)
+
+    result = app.test_cli_runner().invoke(dispatch, ["--drain", "--workers", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert result.output == f"{count} notification(s) were sent, 0 will be retried and 0 failed\n"
+    payloads = [json.loads(body) for _, body in webhook_server.requests]
+    assert {payload["plant"]["name"] for payload in payloads} == {"Fern", "Plumeria"}
+
+
+def test_dispatch_command_invalid_transport(app, db):
+    app.config["PLANT_WN_DISPATCH_TRANSPORT"] = "webhook"
+
+    result = app.test_cli_runner().invoke(dispatch, ["--drain"])
+
+    assert result.exit_code == 1
+    assert "PLANT_WN_WEBHOOK_URL must be set" in result.output
+
+
+def test_dispatch_command_short_lease(app, db):
+    app.config["PLANT_WN_DISPATCH_TRANSPORT"] = "webhook"
+    app.config["PLANT_WN_WEBHOOK_URL"] = "http://127.0.0.1:1/hook"
+    app.config["PLANT_WN_DISPATCH_BATCH_SIZE"] = 10
+    app.config["PLANT_WN_DISPATCH_LEASE"] = 300
+    app.config["PLANT_WN_DISPATCH_TIMEOUT"] = 30
+
+    result = app.test_cli_runner().invoke(dispatch, ["--drain"])
+
+    assert result.exit_code == 1
+    assert "PLANT_WN_DISPATCH_LEASE must be greater than" in result.output
@@ -0,0 +1,349 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import datetime
+import time
+from unittest import mock
+
+from plant_wn.exceptions import CoordinatesAPIError
+from plant_wn.notifier import evaluation
+from plant_wn.notifier.engine import Alert, get_forecast_digest, run_notifier
+from plant_wn.weather.buckets import get_cell_center
+from plant_wn.weather.forecast import Forecast
+from plant_wn.weather.history import ForecastHistory
+from plant_wn.web import models
+from tests.test_weather.test_buckets import _get_distance
+
+DATES = [datetime.date(2020, 7, 4), datetime.date(2020, 7, 5), datetime.date(2020, 7, 6)]
+
+
+def _get_mock_weather_api_cls():
+    mock_weather_api_cls = mock.Mock()
+    weather_api = mock_weather_api_cls.return_value
+    weather_api.get_forecast_dates.return_value = DATES
+    weather_api.get_precipitation_forecast.return_value = [0.1, 2.5, 0.0]
+    weather_api.get_temperature_forecast.return_value = [(60.0, 85.0), (50.0, 99.0), (30.0, 70.0)]
+    weather_api.get_wind_forecast.return_value = [5.0, 10.0, 20.0]
+    return mock_weather_api_cls
+
+
+def test_run_notifier(db, user):
+    raleigh = models.ZipCode(zip_code="27601")
+    boston = models.ZipCode(zip_code="02108")
+    db.session.add_all(
+        [
+            models.Plant(
+                max_wind=models.MaxWind(value=15.0), name="Plumeria", user=user, zip_code=raleigh
+            ),
+            models.Plant(
+                max_temp=models.MaxTemp(value=95.0), name="Fern", user=user, zip_code=raleigh
+            ),
+            models.Plant(name="Cactus", user=user, zip_code=boston),
+        ]
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"27601": (35.77, -78.63), "02108": (42.36, -71.07)},
+        [],
+    )
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+
+    mock_cache = mock.Mock()
+    alerts = run_notifier(
+        mock_weather_api_cls, mock_coordinates_api_cls, "weather", "coords", mock_cache
+    )
+
+    assert alerts == [
+        Alert(1, "max_wind", 2, DATES[2], 20.0, 15.0),
+        Alert(2, "max_temp", 1, DATES[1], 99.0, 95.0),
+    ]
+    # The coordinates are retrieved in bulk and the forecast only once per zip code
+    mock_coordinates_api_cls.assert_called_once_with(api_key="coords")
+    assert sorted(mock_coordinates_api_cls.return_value.get_coordinates_bulk.call_args[0][0]) == [
+        "02108",
+        "27601",
+    ]
+    assert mock_weather_api_cls.call_count == 2
+    mock_weather_api_cls.assert_any_call((35.77, -78.63), api_key="weather", cache=mock_cache)
+    mock_weather_api_cls.assert_any_call((42.36, -71.07), api_key="weather", cache=mock_cache)
+    # The coordinates are stored so that the next run doesn't use the coordinates API
+    assert raleigh.get_coordinates() == (35.77, -78.63)
+    mock_coordinates_api_cls.reset_mock()
+    run_notifier(mock_weather_api_cls, mock_coordinates_api_cls)
+    mock_coordinates_api_cls.assert_not_called()
+
+
+def test_run_notifier_skips_failed_zip_code(db, user):
+    db.session.add(
+        models.Plant(
+            max_wind=models.MaxWind(value=15.0),
+            name="Plumeria",
+            user=user,
+            zip_code=models.ZipCode(zip_code="27601"),
+        )
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.side_effect = CoordinatesAPIError()
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+
+    assert run_notifier(mock_weather_api_cls, mock_coordinates_api_cls) == []
+    mock_weather_api_cls.assert_not_called()
+
+
+def test_run_notifier_skips_zip_code_not_found(db, user):
+    db.session.add(
+        models.Plant(
+            max_wind=models.MaxWind(value=15.0),
+            name="Plumeria",
+            user=user,
+            zip_code=models.ZipCode(zip_code="00000"),
+        )
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = ({}, ["00000"])
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+
+    assert run_notifier(mock_weather_api_cls, mock_coordinates_api_cls) == []
+    mock_weather_api_cls.assert_not_called()
+
+
+def test_get_forecast_digest():
+    forecast = {
+        "max_precipitation": [0.1, 2.5],
+        "max_temp": [85.0, 99.0],
+        "min_temp": [60.0, 50.0],
+        "max_wind": [5.0, 10.0],
+    }
+    today = datetime.date(2020, 7, 1)
+    digest = get_forecast_digest(forecast, today)
+
+    assert digest == get_forecast_digest(dict(forecast), today)
+    # The days of the alerts are relative to today, so the same forecast on another day differs
+    assert digest != get_forecast_digest(forecast, datetime.date(2020, 7, 2))
+    assert digest != get_forecast_digest(dict(forecast, max_wind=[5.0, 10.5]), today)
+
+
+def test_run_notifier_incremental(db, user):
+    raleigh = models.ZipCode(zip_code="27601")
+    boston = models.ZipCode(zip_code="02108")
+    fern = models.Plant(
+        max_temp=models.MaxTemp(value=95.0), name="Fern", user=user, zip_code=raleigh
+    )
+    db.session.add_all(
+        [
+            fern,
+            models.Plant(
+                max_temp=models.MaxTemp(value=95.0), name="Aloe", user=user, zip_code=boston
+            ),
+        ]
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"27601": (35.77, -78.63), "02108": (42.36, -71.07)},
+        [],
+    )
+    max_temps = {(35.77, -78.63): 99.0, (42.36, -71.07): 99.0}
+
+    def run():
+        def get_weather_api(coordinates, **kwargs):
+            weather_api = mock.Mock()
+            weather_api.get_forecast_dates.return_value = DATES[:1]
+            weather_api.get_temperature_forecast.return_value = [(60.0, max_temps[coordinates])]
+            weather_api.get_precipitation_forecast.return_value = [0.0]
+            weather_api.get_wind_forecast.return_value = [0.0]
+            return weather_api
+
+        return run_notifier(
+            mock.Mock(side_effect=get_weather_api), mock_coordinates_api_cls, incremental=True
+        )
+
+    # The first run evaluates every plant
+    assert run() == [
+        Alert(1, "max_temp", 0, DATES[0], 99.0, 95.0),
+        Alert(2, "max_temp", 0, DATES[0], 99.0, 95.0),
+    ]
+    assert raleigh.forecast_digest is not None
+    assert raleigh.evaluated_at is not None
+    # Nothing changed, so nothing is evaluated
+    with mock.patch.object(
+        evaluation, "evaluate", side_effect=evaluation.evaluate
+    ) as mock_evaluate:
+        assert run() == []
+    assert len(mock_evaluate.call_args[0][0].plant_ids) == 0
+
+    # Only the plant whose threshold changed is evaluated
+    fern.max_temp = models.MaxTemp(value=90.0)
+    db.session.commit()
+    assert run() == [Alert(1, "max_temp", 0, DATES[0], 99.0, 90.0)]
+
+    # Only the plants in the zip code whose forecast changed are evaluated
+    max_temps[(42.36, -71.07)] = 101.0
+    assert run() == [Alert(2, "max_temp", 0, DATES[0], 101.0, 95.0)]
+    assert run() == []
+
+
+def test_run_notifier_incremental_no_thresholds_stamp(db, user):
+    db.session.add(
+        models.Plant(
+            max_temp=models.MaxTemp(value=95.0),
+            name="Fern",
+            user=user,
+            zip_code=models.ZipCode(zip_code="27601"),
+        )
+    )
+    db.session.commit()
+    # The plants created before the stamps were added don't have one
+    db.session.query(models.Plant).update({"thresholds_modified_at": None})
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"27601": (35.77, -78.63)},
+        [],
+    )
+
+    def run():
+        return run_notifier(_get_mock_weather_api_cls(), mock_coordinates_api_cls, incremental=True)
+
+    assert run() == [Alert(1, "max_temp", 1, DATES[1], 99.0, 95.0)]
+    # The plant isn't evaluated again until its forecast changes
+    assert run() == []
+
+
+def test_run_notifier_history(db, user, tmpdir):
+    db.session.add(models.Plant(name="Fern", user=user, zip_code=models.ZipCode(zip_code="27601")))
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"27601": (35.77, -78.63)},
+        [],
+    )
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+    today = datetime.date.today()
+    mock_weather_api_cls.return_value.forecast = Forecast(
+        dates=[today], precipitation=[0.1], min_temp=[60.0], max_temp=[85.0], max_wind=[5.0]
+    )
+    mock_weather_api_cls.return_value.fetched_at = time.time()
+    history = ForecastHistory(str(tmpdir.join("history")))
+
+    run_notifier(mock_weather_api_cls, mock_coordinates_api_cls, history=history)
+    # The forecast is taken from the cache by the next run, so it isn't appended again
+    mock_weather_api_cls.return_value.fetched_at = None
+    run_notifier(mock_weather_api_cls, mock_coordinates_api_cls, history=history)
+
+    rows = history.query(coordinates=(35.77, -78.63))
+    assert rows.date.tolist() == [today.toordinal()]
+    assert rows.max_temp.tolist() == [85.0]
+
+
+def test_run_notifier_bucket_radius(db, user):
+    north_end = models.ZipCode(zip_code="02109")
+    downtown = models.ZipCode(zip_code="02108")
+    db.session.add_all(
+        [
+            models.Plant(
+                max_wind=models.MaxWind(value=15.0), name="Plumeria", user=user, zip_code=north_end
+            ),
+            models.Plant(
+                max_temp=models.MaxTemp(value=95.0), name="Fern", user=user, zip_code=downtown
+            ),
+            models.Plant(name="Cactus", user=user, zip_code=models.ZipCode(zip_code="27601")),
+        ]
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"02109": (42.364, -71.0542), "02108": (42.3577, -71.0636), "27601": (35.77, -78.63)},
+        [],
+    )
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+
+    alerts = run_notifier(mock_weather_api_cls, mock_coordinates_api_cls, bucket_radius=5)
+
+    assert alerts == [
+        Alert(1, "max_wind", 2, DATES[2], 20.0, 15.0),
+        Alert(2, "max_temp", 1, DATES[1], 99.0, 95.0),
+    ]
+    # The Boston zip codes are about a kilometer apart, so they share the forecast of their cell
+    assert mock_weather_api_cls.call_count == 2
+    fetched = {call[0][0] for call in mock_weather_api_cls.call_args_list}
+    assert get_cell_center((42.364, -71.0542), 5) in fetched
+    assert get_cell_center((35.77, -78.63), 5) in fetched
+
+
+def test_run_notifier_bucket_radius_history(db, user, tmpdir):
+    db.session.add_all(
+        models.Plant(name=f"Fern {zip_code}", user=user, zip_code=models.ZipCode(zip_code=zip_code))
+        for zip_code in ("02108", "02109")
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (
+        {"02109": (42.364, -71.0542), "02108": (42.3577, -71.0636)},
+        [],
+    )
+    mock_weather_api_cls = _get_mock_weather_api_cls()
+    today = datetime.date.today()
+    mock_weather_api_cls.return_value.forecast = Forecast(
+        dates=[today], precipitation=[0.1], min_temp=[60.0], max_temp=[85.0], max_wind=[5.0]
+    )
+    mock_weather_api_cls.return_value.fetched_at = time.time()
+    history = ForecastHistory(str(tmpdir.join("history")))
+
+    run_notifier(mock_weather_api_cls, mock_coordinates_api_cls, history=history, bucket_radius=5)
+
+    # The shared forecast is recorded at the coordinates of each zip code
+    assert mock_weather_api_cls.call_count == 1
+    for coordinates in ((42.364, -71.0542), (42.3577, -71.0636)):
+        assert history.query(coordinates=coordinates).max_temp.tolist() == [85.0]
+    assert len(history.query(coordinates=get_cell_center((42.364, -71.0542), 5)).date) == 0
+
+
+def test_run_notifier_bucket_radius_tolerance(db, user):
+    # Zip codes spread over about 30 km with a forecast that rises by 0.1°F per kilometer
+    origin = (42.2, -71.2)
+    locations = {
+        f"021{i:02d}": (origin[0] + 0.03 * (i % 10), origin[1] + 0.04 * (i // 10))
+        for i in range(100)
+    }
+    radius = 5
+    tolerance = 0.1 * radius * 1.1
+
+    def get_max_temp(coordinates):
+        return 90.0 + 0.1 * _get_distance(origin, coordinates)
+
+    # Thresholds further than the tolerance from the forecast at the zip code's own coordinates
+    # are exceeded or not regardless of the bucketing
+    db.session.add_all(
+        models.Plant(
+            max_temp=models.MaxTemp(value=get_max_temp(location) + (-1 if i % 2 else 1)),
+            name=f"Fern {zip_code}",
+            user=user,
+            zip_code=models.ZipCode(zip_code=zip_code),
+        )
+        for i, (zip_code, location) in enumerate(locations.items())
+    )
+    db.session.commit()
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.return_value = (locations, [])
+
+    def get_weather_api(coordinates, **kwargs):
+        weather_api = mock.Mock()
+        weather_api.get_forecast_dates.return_value = DATES[:1]
+        weather_api.get_temperature_forecast.return_value = [(60.0, get_max_temp(coordinates))]
+        weather_api.get_precipitation_forecast.return_value = [0.0]
+        weather_api.get_wind_forecast.return_value = [0.0]
+        return weather_api
+
+    mock_weather_api_cls = mock.Mock(side_effect=get_weather_api)
+    expected = run_notifier(mock_weather_api_cls, mock_coordinates_api_cls)
+    mock_weather_api_cls.reset_mock()
+
+    alerts = run_notifier(mock_weather_api_cls, mock_coordinates_api_cls, bucket_radius=radius)
+
+    assert mock_weather_api_cls.call_count < len(locations)
+    assert len(expected) == len(locations) // 2
+    assert [alert[:4] for alert in alerts] == [alert[:4] for alert in expected]
+    for alert, expected_alert in zip(alerts, expected):
+        assert abs(alert.forecast - expected_alert.forecast) <= tolerance
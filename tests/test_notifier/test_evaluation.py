@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from unittest import mock
+
+import numpy as np
+
+from plant_wn.notifier import evaluation
+from plant_wn.web import models
+
+
+def test_load_thresholds(db, user):
+    raleigh = models.ZipCode(zip_code="27601")
+    boston = models.ZipCode(zip_code="02108")
+    db.session.add_all(
+        [
+            models.Plant(
+                max_precipitation=models.MaxPrecipitation(value=2.3),
+                max_temp=models.MaxTemp(value=97.5, enabled=False),
+                min_temp=models.MinTemp(value=55.0),
+                name="Plumeria",
+                user=user,
+                zip_code=raleigh,
+            ),
+            models.Plant(
+                max_wind=models.MaxWind(value=17.8), name="Cactus", user=user, zip_code=boston
+            ),
+        ]
+    )
+    db.session.commit()
+
+    thresholds = evaluation.load_thresholds()
+
+    order = np.argsort(thresholds.plant_ids)
+    assert thresholds.plant_ids[order].tolist() == [1, 2]
+    assert thresholds.zip_code_ids[order].tolist() == [1, 2]
+    assert thresholds.plant_ids.dtype == np.int64
+    assert thresholds.zip_code_ids.dtype == np.int64
+    np.testing.assert_array_equal(
+        thresholds.values[order], [[2.3, np.nan, 55.0, np.nan], [np.nan, np.nan, np.nan, 17.8]],
+    )
+
+
+def test_load_thresholds_no_plants(db):
+    thresholds = evaluation.load_thresholds()
+
+    assert thresholds.plant_ids.shape == (0,)
+    assert thresholds.values.shape == (0, 4)
+
+
+def test_build_forecast_matrix():
+    forecasts = {
+        7: {"max_precipitation": [0.1], "max_temp": [85.0], "min_temp": [60.0], "max_wind": [5.0]},
+        3: {
+            "max_precipitation": [0.2, 0.3],
+            "max_temp": [80.0, 81.0],
+            "min_temp": [50.0, 51.0],
+            "max_wind": [1.0, 2.0],
+        },
+    }
+
+    matrix = evaluation.build_forecast_matrix(forecasts)
+
+    assert matrix.zip_code_ids.tolist() == [3, 7]
+    np.testing.assert_array_equal(
+        matrix.values,
+        [
+            [[0.2, 0.3], [80.0, 81.0], [50.0, 51.0], [1.0, 2.0]],
+            [[0.1, np.nan], [85.0, np.nan], [60.0, np.nan], [5.0, np.nan]],
+        ],
+    )
+
+
+def test_evaluate():
+    thresholds = evaluation.ThresholdMatrix(
+        np.array([10, 11, 12, 13]),
+        np.array([3, 7, 3, 99]),
+        np.array(
+            [
+                [0.25, np.nan, 51.0, np.nan],
+                [np.nan, 84.0, np.nan, np.nan],
+                [np.nan, np.nan, np.nan, 10.0],
+                [0.0, 0.0, 100.0, 0.0],
+            ]
+        ),
+    )
+    forecasts = evaluation.ForecastMatrix(
+        np.array([3, 7]),
+        np.array(
+            [
+                [[0.2, 0.3], [80.0, 81.0], [50.0, 51.0], [1.0, 2.0]],
+                [[0.1, np.nan], [85.0, np.nan], [60.0, np.nan], [5.0, np.nan]],
+            ]
+        ),
+    )
+
+    result = evaluation.evaluate(thresholds, forecasts)
+
+    # The plant in zip code 99 has no forecast so it never alerts
+    assert result.mask.tolist() == [
+        [True, False, True, False],
+        [False, True, False, False],
+        [False, False, False, False],
+        [False, False, False, False],
+    ]
+    alerts = sorted(zip(result.plant_index, result.metric_index, result.day_index))
+    assert alerts == [(0, 0, 1), (0, 2, 0), (1, 1, 0)]
+
+
+@mock.patch("plant_wn.notifier.evaluation.CHUNK_SIZE", 2)
+def test_evaluate_chunked():
+    num_plants = 5
+    thresholds = evaluation.ThresholdMatrix(
+        np.arange(num_plants),
+        np.zeros(num_plants, dtype=np.int64),
+        np.tile([np.nan, 90.0, np.nan, np.nan], (num_plants, 1)),
+    )
+    forecasts = evaluation.ForecastMatrix(
+        np.array([0]), np.array([[[0.0, 0.0], [95.0, 85.0], [50.0, 50.0], [1.0, 1.0]]])
+    )
+
+    result = evaluation.evaluate(thresholds, forecasts)
+
+    assert result.mask[:, 1].all()
+    assert sorted(result.plant_index.tolist()) == list(range(num_plants))
+    assert set(result.day_index.tolist()) == {0}
+
+
+def test_evaluate_no_forecasts():
+    thresholds = evaluation.ThresholdMatrix(
+        np.array([1]), np.array([1]), np.array([[1.0, 1.0, 1.0, 1.0]])
+    )
+    forecasts = evaluation.build_forecast_matrix({})
+
+    result = evaluation.evaluate(thresholds, forecasts)
+
+    assert not result.mask.any()
+    assert len(result.plant_index) == 0
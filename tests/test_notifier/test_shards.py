@@ -0,0 +1,241 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import time
+from unittest import mock
+
+import pytest
+
+from plant_wn.exceptions import ValidationError
+from plant_wn.notifier import evaluation, shards
+from plant_wn.notifier.engine import run_notifier
+from plant_wn.web import models
+from plant_wn.web.manage import notify
+from tests.test_notifier.test_engine import _get_mock_weather_api_cls
+
+
+@pytest.fixture()
+def plants(db, user):
+    """Create a plant with a max_temp threshold in each of six zip codes."""
+    zip_codes = [models.ZipCode(zip_code=f"2760{i}") for i in range(6)]
+    db.session.add_all(
+        models.Plant(
+            max_temp=models.MaxTemp(value=95.0), name=f"Fern {i}", user=user, zip_code=zip_code
+        )
+        for i, zip_code in enumerate(zip_codes)
+    )
+    db.session.commit()
+    return zip_codes
+
+
+def _get_mock_coordinates_api_cls():
+    mock_coordinates_api_cls = mock.Mock()
+    mock_coordinates_api_cls.return_value.get_coordinates_bulk.side_effect = lambda zip_codes: (
+        {zip_code: (35.0 + int(zip_code[-1]), -78.0) for zip_code in zip_codes},
+        [],
+    )
+    return mock_coordinates_api_cls
+
+
+def _get_shards(db):
+    db.session.expire_all()
+    return db.session.query(models.NotifierShard).order_by(models.NotifierShard.shard).all()
+
+
+def test_get_shard_ranges(plants):
+    ranges = shards.get_shard_ranges(4)
+
+    assert ranges == [(None, 2), (2, 4), (4, 5), (5, None)]
+    assert shards.get_shard_ranges(1) == [(None, None)]
+    # There can be more shards than zip codes
+    assert len(shards.get_shard_ranges(8)) == 8
+
+
+def test_get_shard_ranges_no_plants(db):
+    assert shards.get_shard_ranges(3) == [(None, 0), (0, 0), (0, None)]
+
+
+def test_create_run(plants, db):
+    shards.create_run("2020-07-01", 3)
+    # Creating the run again, such as from another worker, keeps the existing shards
+    shards.create_run("2020-07-01", 3)
+
+    rows = _get_shards(db)
+    assert [(row.shard, row.min_zip_code_id, row.max_zip_code_id) for row in rows] == [
+        (0, None, 3),
+        (1, 3, 5),
+        (2, 5, None),
+    ]
+    assert {row.status for row in rows} == {"pending"}
+
+    with pytest.raises(ValidationError, match='"2020-07-01" already exists with 3 shard'):
+        shards.create_run("2020-07-01", 2)
+    with pytest.raises(ValidationError, match="must be at least 1"):
+        shards.create_run("2020-07-02", 0)
+
+
+def test_claim_shard(plants, db):
+    shards.create_run("run", 2)
+
+    first = shards.claim_shard("run", "worker-a", lease=300)
+    second = shards.claim_shard("run", "worker-b", lease=300)
+
+    assert (first.shard, first.owner, first.attempts) == (0, "worker-a", 1)
+    assert (second.shard, second.owner, second.attempts) == (1, "worker-b", 1)
+    assert shards.claim_shard("run", "worker-c", lease=300) is None
+
+    assert shards.complete_shard("run", 0, "worker-a", alert_count=4) is True
+    rows = _get_shards(db)
+    assert (rows[0].status, rows[0].alert_count, rows[0].lease_expires_at) == ("done", 4, None)
+    # A shard that is done is never claimed again
+    assert shards.claim_shard("run", "worker-c", lease=300) is None
+
+
+def test_claim_shard_expired_lease(plants, db):
+    shards.create_run("run", 1)
+    shards.claim_shard("run", "crashed", lease=0)
+    time.sleep(0.01)
+
+    shard = shards.claim_shard("run", "worker-b", lease=300)
+
+    assert (shard.shard, shard.owner, shard.attempts) == (0, "worker-b", 2)
+    # The worker whose lease expired can't renew it or mark the shard as done
+    assert shards.renew_lease("run", 0, "crashed", lease=300) is False
+    assert shards.complete_shard("run", 0, "crashed", alert_count=0) is False
+    assert shards.renew_lease("run", 0, "worker-b", lease=300) is True
+    assert _get_shards(db)[0].status == "pending"
+
+
+def test_lease_heartbeat(plants, db):
+    shards.create_run("run", 1)
+    claimed_at = shards.claim_shard("run", "worker-a", lease=0.06).heartbeat_at
+
+    with shards.LeaseHeartbeat("run", 0, "worker-a", 0.06) as heartbeat:
+        time.sleep(0.1)
+        # The lease is renewed before it expires so that no other worker can claim the shard
+        assert shards.claim_shard("run", "worker-b", lease=300) is None
+        assert _get_shards(db)[0].heartbeat_at > claimed_at
+        assert not heartbeat.lost.is_set()
+
+
+def test_lease_heartbeat_lost(plants, db):
+    shards.create_run("run", 1)
+    shards.claim_shard("run", "worker-a", lease=0)
+    time.sleep(0.01)
+    shards.claim_shard("run", "worker-b", lease=300)
+
+    with shards.LeaseHeartbeat("run", 0, "worker-a", 0.03) as heartbeat:
+        assert heartbeat.lost.wait(1)
+
+
+def test_run_shards(plants, db):
+    expected = run_notifier(_get_mock_weather_api_cls(), _get_mock_coordinates_api_cls())
+    on_alerts = mock.Mock()
+
+    alerts = shards.run_shards(
+        "run",
+        3,
+        owner="worker-a",
+        on_alerts=on_alerts,
+        weather_api_cls=_get_mock_weather_api_cls(),
+        coordinates_api_cls=_get_mock_coordinates_api_cls(),
+    )
+
+    assert sorted(alerts) == expected
+    assert len(expected) == 6
+    # The alerts of each shard are handled before the shard is marked as done
+    assert on_alerts.call_count == 3
+    assert [len(call[0][0]) for call in on_alerts.call_args_list] == [2, 2, 2]
+    rows = _get_shards(db)
+    assert [(row.status, row.owner, row.alert_count) for row in rows] == [
+        ("done", "worker-a", 2)
+    ] * 3
+
+
+def test_run_shards_takes_over_crashed_worker(plants, db):
+    shards.create_run("run", 2)
+    shards.claim_shard("run", "crashed", lease=0)
+    time.sleep(0.01)
+
+    alerts = shards.run_shards(
+        "run",
+        2,
+        owner="worker-b",
+        weather_api_cls=_get_mock_weather_api_cls(),
+        coordinates_api_cls=_get_mock_coordinates_api_cls(),
+    )
+
+    assert len(alerts) == 6
+    assert [(row.owner, row.attempts) for row in _get_shards(db)] == [
+        ("worker-b", 2),
+        ("worker-b", 1),
+    ]
+    # Running another worker after the run is done doesn't evaluate anything again
+    assert shards.run_shards("run", 2, owner="worker-c") == []
+
+
+@mock.patch("plant_wn.notifier.shards.run_notifier")
+def test_run_shards_lost_lease(mock_run_notifier, plants, db):
+    def take_over(**kwargs):
+        # Another worker takes over the shard while it is evaluated, such as after a long pause
+        db.session.query(models.NotifierShard).update(
+            {"owner": "worker-b", "lease_expires_at": time.time() + 300}
+        )
+        db.session.commit()
+        time.sleep(0.2)
+        return ["alert"]
+
+    mock_run_notifier.side_effect = take_over
+    on_alerts = mock.Mock()
+
+    alerts = shards.run_shards("run", 1, lease=0.03, owner="worker-a", on_alerts=on_alerts)
+
+    # The alerts are left to the worker that took over the shard
+    assert alerts == []
+    on_alerts.assert_not_called()
+    assert [(row.status, row.owner) for row in _get_shards(db)] == [("pending", "worker-b")]
+
+
+def test_run_shards_lost_lease_incremental(plants, db):
+    load_thresholds = evaluation.load_thresholds
+
+    def take_over(*args, **kwargs):
+        # Another worker takes over the shard while it is evaluated
+        db.session.query(models.NotifierShard).update(
+            {"owner": "worker-b", "lease_expires_at": time.time() + 300}
+        )
+        db.session.commit()
+        return load_thresholds(*args, **kwargs)
+
+    kwargs = {
+        "incremental": True,
+        "weather_api_cls": _get_mock_weather_api_cls(),
+        "coordinates_api_cls": _get_mock_coordinates_api_cls(),
+    }
+    with mock.patch.object(evaluation, "load_thresholds", side_effect=take_over):
+        alerts = shards.run_shards("run", 1, owner="worker-a", **kwargs)
+
+    assert alerts == []
+    # The zip codes weren't marked as evaluated, so the worker that took over the shard still
+    # finds the alerts once the lease of the other worker expires
+    assert {zip_code.evaluated_at for zip_code in db.session.query(models.ZipCode)} == {None}
+    db.session.query(models.NotifierShard).update({"lease_expires_at": time.time()})
+    db.session.commit()
+    assert len(shards.run_shards("run", 1, owner="worker-c", **kwargs)) == 6
+
+
+@mock.patch("plant_wn.notifier.shards.run_notifier")
+def test_notify_command_shards(mock_run_notifier, app, plants):
+    mock_run_notifier.return_value = []
+
+    result = app.test_cli_runner().invoke(notify, ["--shards", "2", "--run-id", "nightly"])
+
+    assert result.exit_code == 0, result.output
+    assert result.output == "0 alert(s) were found\n"
+    assert [call[1]["zip_code_id_range"] for call in mock_run_notifier.call_args_list] == [
+        (None, 4),
+        (4, None),
+    ]
+
+    result = app.test_cli_runner().invoke(notify, ["--shards", "3", "--run-id", "nightly"])
+
+    assert result.exit_code == 1
+    assert 'The notifier run "nightly" already exists with 2 shard(s)' in result.output
@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Verify that the database queries of the API and the notifier use indexes."""
+import contextlib
+import datetime
+from unittest import mock
+
+import pytest
+import sqlalchemy
+
+from plant_wn.notifier import engine, evaluation
+from plant_wn.web import models
+
+
+@contextlib.contextmanager
+def capture_queries(db):
+    """
+    Capture the SELECT statements executed on the database.
+
+    :param flask_sqlalchemy.SQLAlchemy db: the database to capture the statements of
+    :return: a context manager that yields a list of tuples of the statements and their parameters
+    """
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            queries.append((statement, parameters))
+
+    sqlalchemy.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        sqlalchemy.event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def get_plan(db, statement, parameters):
+    """
+    Get the query plan of the statement.
+
+    :param flask_sqlalchemy.SQLAlchemy db: the database to explain the statement with
+    :param str statement: the SQL statement
+    :param tuple parameters: the parameters of the statement
+    :return: the details of each step of the query plan
+    :rtype: list(str)
+    """
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def assert_no_table_scans(db, queries):
+    """
+    Assert that none of the queries scan a table or sort their rows without an index.
+
+    :param flask_sqlalchemy.SQLAlchemy db: the database the queries were executed on
+    :param list queries: the captured statements and their parameters
+    :raises AssertionError: if a query scans a table or sorts its rows without an index
+    """
+    assert queries
+    for statement, parameters in queries:
+        for detail in get_plan(db, statement, parameters):
+            is_scan = detail.startswith("SCAN") and " USING " not in detail
+            is_sort = detail.startswith("USE TEMP B-TREE FOR") and "ORDER BY" in detail
+            assert not (is_scan or is_sort), f"{detail} in the query plan of: {statement}"
+
+
+@pytest.fixture()
+def plants(db, user):
+    zip_code = models.ZipCode(coordinates="35.77,-78.63", zip_code="27601")
+    db.session.add_all(
+        [
+            models.Plant(
+                max_temp=models.MaxTemp(value=95.0), name=name, user=user, zip_code=zip_code
+            )
+            for name in ("Fern", "Aloe", "Basil")
+        ]
+    )
+    db.session.commit()
+
+
+@pytest.mark.parametrize(
+    "query_string, accept",
+    (
+        ("", "application/json"),
+        ("?limit=2", "application/json"),
+        ("?limit=2&cursor=WyJBbG9lIiwyXQ", "application/json"),
+        ("", "application/x-ndjson"),
+    ),
+)
+def test_get_plants(query_string, accept, client, db, plants, user_token):
+    headers = {"Accept": accept, "Authorization": f"Bearer {user_token}"}
+    with capture_queries(db) as queries:
+        rv = client.get(f"/api/v1/plants{query_string}", headers=headers)
+        assert rv.status_code == 200
+        # Revalidating the response only queries the user's plants version
+        headers["If-None-Match"] = rv.headers["ETag"]
+        rv = client.get(f"/api/v1/plants{query_string}", headers=headers)
+        assert rv.status_code == 304
+
+    # Each request takes a single round trip to the database since the uid claim of the token
+    # avoids the user lookup and the listing reads the plants version with the plants
+    assert len(queries) == 2
+    assert_no_table_scans(db, queries)
+
+
+def test_import_and_export_plants(client, db, user, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    with capture_queries(db) as queries:
+        body = '{"name": "Fern", "zip_code": "27601"}\n{"name": "Aloe", "zip_code": "02108"}\n'
+        assert client.post("/api/v1/plants/import", data=body, headers=headers).status_code == 201
+        rv = client.get("/api/v1/plants/export", headers=headers)
+        assert len(rv.get_data(as_text=True).splitlines()) == 2
+
+    assert_no_table_scans(db, queries)
+
+
+def test_login(client, db, user):
+    with capture_queries(db) as queries:
+        input_json = {"password": "Who's scruffy looking?", "username": "han_solo"}
+        assert client.post("/api/v1/login", json=input_json).status_code == 200
+
+    assert_no_table_scans(db, queries)
+
+
+def test_run_notifier(db, plants):
+    mock_weather_api_cls = mock.Mock()
+    weather_api = mock_weather_api_cls.return_value
+    weather_api.get_forecast_dates.return_value = [datetime.date(2020, 7, 4)]
+    weather_api.get_precipitation_forecast.return_value = [0.1]
+    weather_api.get_temperature_forecast.return_value = [(60.0, 99.0)]
+    weather_api.get_wind_forecast.return_value = [5.0]
+    thresholds = evaluation.load_thresholds()
+
+    # Loading the thresholds intentionally reads every plant, so it is verified separately below
+    with mock.patch.object(evaluation, "load_thresholds", return_value=thresholds):
+        with capture_queries(db) as queries:
+            alerts = engine.run_notifier(mock_weather_api_cls, mock.Mock())
+
+    assert len(alerts) == 3
+    assert_no_table_scans(db, queries)
+
+
+def test_load_thresholds(db, plants):
+    with capture_queries(db) as queries:
+        evaluation.load_thresholds()
+
+    # A single pass over the plants table without joins or sorting
+    assert len(queries) == 1
+    plan = get_plan(db, *queries[0])
+    assert len(plan) == 1
+    assert plan[0] in ("SCAN plants", "SCAN TABLE plants")
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from unittest import mock
+
+import pytest
+
+from plant_wn import requests_utils
+
+
+@pytest.fixture(autouse=True)
+def reset_sessions():
+    requests_utils.configure_sessions()
+    yield
+    requests_utils.configure_sessions()
+
+
+def test_get_requests_session():
+    session = requests_utils.get_requests_session(pool_size=4, pool_block=True, keep_alive=False)
+
+    adapter = session.get_adapter("https://api.climacell.co")
+    assert adapter._pool_maxsize == 4
+    assert adapter._pool_block is True
+    assert adapter.max_retries.total == 3
+    assert session.headers["Connection"] == "close"
+
+
+def test_get_shared_session():
+    session = requests_utils.get_shared_session("api.climacell.co")
+
+    assert requests_utils.get_shared_session("api.climacell.co") is session
+    assert requests_utils.get_shared_session("public.opendatasoft.com") is not session
+    assert session.headers.get("Connection") != "close"
+
+
+def test_get_shared_session_retries():
+    session = requests_utils.get_shared_session("api.climacell.co", retries=0)
+
+    assert requests_utils.get_shared_session("api.climacell.co", retries=0) is session
+    assert requests_utils.get_shared_session("api.climacell.co") is not session
+    assert session.get_adapter("https://api.climacell.co").max_retries.total == 0
+
+
+def test_configure_sessions():
+    session = requests_utils.get_shared_session("api.climacell.co")
+
+    requests_utils.configure_sessions(pool_size=32, keep_alive=False, timeout=5, retries=0)
+
+    new_session = requests_utils.get_shared_session("api.climacell.co")
+    assert new_session is not session
+    assert new_session.get_adapter("https://api.climacell.co")._pool_maxsize == 32
+    assert new_session.get_adapter("https://api.climacell.co").max_retries.total == 0
+    assert new_session.headers["Connection"] == "close"
+    assert requests_utils.get_timeout() == 5
+
+
+def test_get_shared_session_after_fork():
+    session = requests_utils.get_shared_session("api.climacell.co")
+
+    with mock.patch("plant_wn.requests_utils.os.getpid", return_value=-1):
+        assert requests_utils.get_shared_session("api.climacell.co") is not session
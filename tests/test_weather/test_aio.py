@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+import datetime
+import threading
+import time
+from unittest import mock
+
+from plant_wn.exceptions import WeatherAPIError
+from plant_wn.weather.aio import AsyncWeatherAPI, fetch_forecasts, iter_forecasts
+from plant_wn.weather.base import BaseWeatherAPI
+from plant_wn.weather.forecast import Forecast
+
+
+class FakeWeatherAPI(BaseWeatherAPI):
+    """A weather API that tracks how many forecasts are fetched at once."""
+
+    name = "fake"
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def fetch_forecast(self):
+        """Fetch a fake forecast after a short delay."""
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.02)
+            if self.coordinates[0] < 0:
+                raise WeatherAPIError("No forecast")
+            value = self.coordinates[0]
+            return Forecast([datetime.date(2020, 7, 4)], [value], [value], [value], [value])
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_weather_api():
+    async_api = AsyncWeatherAPI(FakeWeatherAPI((1.0, 2.0)))
+
+    async def get_all():
+        return (
+            await async_api.get_forecast(),
+            await async_api.get_forecast_dates(),
+            await async_api.get_precipitation_forecast(),
+            await async_api.get_temperature_forecast(),
+            await async_api.get_wind_forecast(),
+        )
+
+    forecast, dates, precipitation, temperature, wind = _run(get_all())
+    assert forecast.precipitation.tolist() == [1.0]
+    assert dates == forecast.get_dates()
+    assert (precipitation, temperature, wind) == ([1.0], [(1.0, 1.0)], [1.0])
+
+
+@mock.patch.object(FakeWeatherAPI, "max_in_flight", 0)
+def test_fetch_forecasts_bounded_concurrency():
+    coordinates = [(float(i), 0.0) for i in range(20)]
+
+    results = fetch_forecasts(FakeWeatherAPI, coordinates, concurrency=4, api_key="some key")
+
+    assert sorted(result.coordinates for result in results) == coordinates
+    assert all(result.error is None for result in results)
+    assert all(result.weather_api.api_key == "some key" for result in results)
+    assert all(
+        result.weather_api.get_wind_forecast() == [result.coordinates[0]] for result in results
+    )
+    assert 1 < FakeWeatherAPI.max_in_flight <= 4
+
+
+def test_fetch_forecasts_error():
+    results = fetch_forecasts(FakeWeatherAPI, [(1.0, 0.0), (-1.0, 0.0)])
+
+    results = {result.coordinates: result for result in results}
+    assert results[(1.0, 0.0)].error is None
+    assert results[(-1.0, 0.0)].weather_api is None
+    assert isinstance(results[(-1.0, 0.0)].error, WeatherAPIError)
+
+
+def test_fetch_forecasts_unexpected_error():
+    def fetch_forecast(self):
+        if self.coordinates[0] == 2.0:
+            raise ValueError("Invalid JSON")
+        return Forecast([datetime.date(2020, 7, 4)], [1.0], [1.0], [1.0], [1.0])
+
+    with mock.patch.object(FakeWeatherAPI, "fetch_forecast", fetch_forecast):
+        results = fetch_forecasts(FakeWeatherAPI, [(1.0, 0.0), (2.0, 0.0)])
+
+    results = {result.coordinates: result for result in results}
+    assert results[(1.0, 0.0)].error is None
+    assert results[(2.0, 0.0)].weather_api is None
+    assert isinstance(results[(2.0, 0.0)].error, WeatherAPIError)
+    assert str(results[(2.0, 0.0)].error) == "Unexpected error: Invalid JSON"
+
+
+def test_iter_forecasts_lazy():
+    consumed = []
+
+    def locations():
+        for i in range(10):
+            consumed.append(i)
+            yield (float(i), 0.0)
+
+    async def first():
+        generator = iter_forecasts(FakeWeatherAPI, locations(), concurrency=2)
+        result = await generator.__anext__()
+        await generator.aclose()
+        return result
+
+    assert _run(first()).error is None
+    # Only the first window of locations is consumed before the first result is yielded
+    assert consumed == [0, 1]
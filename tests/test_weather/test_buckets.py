@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import math
+import random
+
+import pytest
+
+from plant_wn.weather.buckets import EARTH_RADIUS, get_cell_center
+
+
+def _get_distance(coordinates, other_coordinates):
+    # The great-circle distance in kilometers
+    latitude, longitude = (math.radians(value) for value in coordinates)
+    other_latitude, other_longitude = (math.radians(value) for value in other_coordinates)
+    haversine = (
+        math.sin((other_latitude - latitude) / 2) ** 2
+        + math.cos(latitude)
+        * math.cos(other_latitude)
+        * math.sin((other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+def test_get_distance():
+    # A degree of latitude anywhere and a degree of longitude at the equator
+    assert _get_distance((42.0, -71.0), (43.0, -71.0)) == pytest.approx(111.195, abs=0.001)
+    assert _get_distance((0.0, 10.0), (0.0, 11.0)) == pytest.approx(111.195, abs=0.001)
+    # A degree of longitude is shorter away from the equator
+    assert _get_distance((60.0, 10.0), (60.0, 11.0)) == pytest.approx(55.6, abs=0.1)
+    assert _get_distance((35.77, -78.63), (35.77, -78.63)) == 0
+
+
+@pytest.mark.parametrize("radius", (1, 5, 25))
+@pytest.mark.parametrize("latitude", (-60, -33.9, 0, 35.77, 64.8))
+def test_get_cell_center_within_radius(radius, latitude):
+    rng = random.Random(0)
+    for _ in range(500):
+        location = (latitude + rng.uniform(-1, 1), rng.uniform(-180, 180))
+        # The grid is flat within a cell, so allow for a small error of the approximation
+        assert _get_distance(location, get_cell_center(location, radius)) <= radius * 1.01
+
+
+def test_get_cell_center_shared():
+    # Two locations in downtown Boston about 300 meters apart
+    center = get_cell_center((42.3601, -71.0589), 5)
+
+    assert get_cell_center((42.3588, -71.0555), 5) == center
+    assert get_cell_center((42.3601, -71.0589), 5) == center
+    assert get_cell_center((35.77, -78.63), 5) != center
+    # A smaller radius is a finer grid
+    assert get_cell_center((42.3601, -71.0589), 1) != center
+
+
+def test_get_cell_center_antimeridian():
+    latitude, longitude = get_cell_center((-16.5, 179.999), 5)
+
+    assert -180 <= longitude <= 180
+    assert _get_distance((-16.5, 179.999), (latitude, longitude)) <= 5.05
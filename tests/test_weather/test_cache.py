@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import multiprocessing
+from unittest import mock
+
+import pytest
+
+from plant_wn.weather.cache import get_forecast_cache, SQLiteForecastCache
+
+
+@pytest.fixture()
+def cache(tmpdir):
+    return SQLiteForecastCache(str(tmpdir.join("forecasts.db")), ttl=60, max_entries=3)
+
+
+@pytest.mark.parametrize(
+    "coordinates, expected",
+    (
+        ((35.7757, -78.6363), "climacell:v2:35.78:-78.64"),
+        ((35.7749, -78.6351), "climacell:v2:35.77:-78.64"),
+        ((-0.001, 0.001), "climacell:v2:0.00:0.00"),
+    ),
+)
+def test_get_key(coordinates, expected, cache):
+    assert cache.get_key("climacell", coordinates) == expected
+
+
+def test_get_and_set(cache):
+    assert cache.get("climacell:35.78:-78.64") is None
+    cache.set("climacell:35.78:-78.64", [{"temp": 70.1}])
+    assert cache.get("climacell:35.78:-78.64") == [{"temp": 70.1}]
+
+
+def test_get_undecodable(cache):
+    cache.set("climacell:35.78:-78.64", [{"temp": 70.1}])
+    # A truncated write
+    cache.connection.execute("UPDATE forecasts SET forecast = '[{\"temp\": 7'")
+
+    assert cache.get("climacell:35.78:-78.64") is None
+    # The entry is removed so that it is fetched and cached again
+    assert cache.connection.execute("SELECT COUNT(*) FROM forecasts").fetchone() == (0,)
+
+
+@mock.patch("plant_wn.weather.cache.time.time")
+def test_get_expired(mock_time, cache):
+    mock_time.return_value = 1000
+    cache.set("climacell:35.78:-78.64", [{"temp": 70.1}])
+    mock_time.return_value = 1059
+    assert cache.get("climacell:35.78:-78.64") == [{"temp": 70.1}]
+    mock_time.return_value = 1060
+    assert cache.get("climacell:35.78:-78.64") is None
+
+
+@mock.patch("plant_wn.weather.cache.time.time")
+def test_evict(mock_time, cache):
+    for i in range(5):
+        mock_time.return_value = 1000 + i
+        cache.set(f"key{i}", i)
+
+    cache.evict()
+
+    assert [cache.get(f"key{i}") for i in range(5)] == [None, None, 2, 3, 4]
+
+
+def _set_forecast(path):
+    SQLiteForecastCache(path).set("climacell:35.78:-78.64", [1, 2, 3])
+
+
+def test_shared_between_processes(tmpdir):
+    path = str(tmpdir.join("forecasts.db"))
+    process = multiprocessing.Process(target=_set_forecast, args=(path,))
+    process.start()
+    process.join()
+
+    assert SQLiteForecastCache(path).get("climacell:35.78:-78.64") == [1, 2, 3]
+
+
+def test_unwritable_cache(tmpdir):
+    cache = SQLiteForecastCache(str(tmpdir.join("missing", "forecasts.db")))
+    cache.set("climacell:35.78:-78.64", [1, 2, 3])
+    assert cache.get("climacell:35.78:-78.64") is None
+
+
+def test_get_forecast_cache(tmpdir):
+    config = {
+        "PLANT_WN_FORECAST_CACHE_MAX_ENTRIES": 10,
+        "PLANT_WN_FORECAST_CACHE_PATH": str(tmpdir.join("forecasts.db")),
+        "PLANT_WN_FORECAST_CACHE_PRECISION": 3,
+        "PLANT_WN_FORECAST_CACHE_TTL": 20,
+    }
+
+    cache = get_forecast_cache(config)
+
+    assert isinstance(cache, SQLiteForecastCache)
+    assert cache.path == config["PLANT_WN_FORECAST_CACHE_PATH"]
+    assert (cache.max_entries, cache.precision, cache.ttl) == (10, 3, 20)
+    assert get_forecast_cache({"PLANT_WN_FORECAST_CACHE_PATH": None}) is None
@@ -1,4 +1,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import threading
+import time
 from unittest import mock
 
 import pytest
@@ -6,6 +10,7 @@ from requests import RequestException
 
 from plant_wn.exceptions import WeatherAPIError
 from plant_wn.weather.climacell import ClimaCellAPI
+from plant_wn.weather.forecast import Forecast
 
 
 @pytest.fixture()
@@ -319,7 +324,11 @@ def test_forecast(climacell_forecast):
     api.session = mock_session
 
     assert not hasattr(api, "_forecast")
-    assert api.forecast == climacell_forecast
+    forecast = api.forecast
+    assert isinstance(forecast, Forecast)
+    assert len(forecast) == 15
+    assert forecast.get_dates()[0] == datetime.date(2020, 7, 4)
+    assert forecast.get_dates()[-1] == datetime.date(2020, 7, 18)
     mock_session.get.assert_called_once_with(
         "https://api.climacell.co/v3/weather/forecast/daily",
         headers={"Content-Type": "application/json", "apikey": "some_key"},
@@ -333,6 +342,77 @@ def test_forecast(climacell_forecast):
     )
 
 
+def test_shared_session():
+    api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
+    api_two = ClimaCellAPI((42.3576, -71.0684), api_key="some_key")
+
+    assert api.session is api_two.session
+    assert api.timeout == 30
+
+
+def test_forecast_cached(climacell_forecast):
+    mock_cache = mock.Mock()
+    mock_cache.get_key.return_value = "climacell:35.78:-78.64"
+    forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
+    mock_cache.get.return_value = forecast.to_json()
+    api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key", cache=mock_cache)
+    mock_session = mock.Mock()
+    api.session = mock_session
+
+    assert api.forecast == forecast
+    mock_cache.get_key.assert_called_once_with("climacell", (35.7757, -78.6363))
+    mock_cache.get.assert_called_once_with("climacell:35.78:-78.64")
+    mock_cache.set.assert_not_called()
+    mock_session.get.assert_not_called()
+    assert api.fetched_at is None
+
+
+def test_forecast_not_cached(climacell_forecast):
+    mock_cache = mock.Mock()
+    mock_cache.get_key.return_value = "climacell:35.78:-78.64"
+    mock_cache.get.return_value = None
+    api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key", cache=mock_cache)
+    mock_session = mock.Mock()
+    mock_session.get.return_value.ok = True
+    mock_session.get.return_value.json.return_value = climacell_forecast
+    api.session = mock_session
+
+    forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
+    before = time.time()
+    assert api.forecast == forecast
+    mock_cache.set.assert_called_once_with("climacell:35.78:-78.64", forecast.to_json())
+    mock_session.get.assert_called_once()
+    assert api.fetched_at >= before
+
+
+def test_forecast_coalesced(climacell_forecast):
+    release = threading.Event()
+    mock_session = mock.Mock()
+
+    def get(*args, **kwargs):
+        release.wait(5)
+        return mock.Mock(ok=True, json=mock.Mock(return_value=climacell_forecast))
+
+    mock_session.get.side_effect = get
+    apis = [ClimaCellAPI((35.7757, -78.6363), api_key="some_key") for _ in range(5)]
+    for api in apis:
+        api.session = mock_session
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(getattr, api, "forecast") for api in apis]
+        while not mock_session.get.called:
+            time.sleep(0.001)
+        # Give the other threads time to join the in-flight fetch
+        time.sleep(0.05)
+        release.set()
+        forecasts = [future.result() for future in futures]
+
+    assert all(forecast is forecasts[0] for forecast in forecasts)
+    mock_session.get.assert_called_once()
+    # Only the object whose fetch was shared is marked as having fetched the forecast
+    assert sum(api.fetched_at is not None for api in apis) == 1
+
+
 def test_forecast_connection_error():
     api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
     mock_session = mock.Mock()
@@ -348,6 +428,7 @@ def test_forecast_bad_status_code():
     api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
     mock_session = mock.Mock()
     mock_session.get.return_value.ok = False
+    mock_session.get.return_value.status_code = 500
     api.session = mock_session
 
     expected = "Failed to get the daily forecast from the ClimaCell API"
@@ -355,9 +436,27 @@ def test_forecast_bad_status_code():
         api.forecast
 
 
+def test_parse_forecast_invalid(climacell_forecast):
+    del climacell_forecast[3]["temp"][1]
+
+    expected = "The daily forecast from the ClimaCell API was invalid"
+    with pytest.raises(WeatherAPIError, match=expected):
+        ClimaCellAPI.parse_forecast(climacell_forecast)
+
+
+def test_get_forecast_dates(climacell_forecast):
+    api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
+    api._forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
+
+    dates = api.get_forecast_dates()
+
+    assert len(dates) == 15
+    assert dates[:2] == [datetime.date(2020, 7, 4), datetime.date(2020, 7, 5)]
+
+
 def test_get_precipitation_forecast(climacell_forecast):
     api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
-    api._forecast = climacell_forecast
+    api._forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
 
     assert api.get_precipitation_forecast() == [
         0.0295,
@@ -380,7 +479,7 @@ def test_get_precipitation_forecast(climacell_forecast):
 
 def test_get_temperature_forecast(climacell_forecast):
     api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
-    api._forecast = climacell_forecast
+    api._forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
 
     assert api.get_temperature_forecast() == [
         (70.43, 94.02),
@@ -403,7 +502,7 @@ def test_get_temperature_forecast(climacell_forecast):
 
 def test_get_wind_forecast(climacell_forecast):
     api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key")
-    api._forecast = climacell_forecast
+    api._forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
 
     assert api.get_wind_forecast() == [
         6.18,
@@ -422,3 +521,19 @@ def test_get_wind_forecast(climacell_forecast):
         9.04,
         12.17,
     ]
+
+
+def test_forecast_cached_invalid(climacell_forecast):
+    mock_cache = mock.Mock()
+    mock_cache.get_key.return_value = "climacell:v2:35.78:-78.64"
+    # An entry in the format of an older version is treated as a cache miss
+    mock_cache.get.return_value = climacell_forecast
+    api = ClimaCellAPI((35.7757, -78.6363), api_key="some_key", cache=mock_cache)
+    mock_session = mock.Mock()
+    mock_session.get.return_value.ok = True
+    mock_session.get.return_value.json.return_value = climacell_forecast
+    api.session = mock_session
+
+    forecast = ClimaCellAPI.parse_forecast(climacell_forecast)
+    assert api.forecast == forecast
+    mock_cache.set.assert_called_once_with("climacell:v2:35.78:-78.64", forecast.to_json())
@@ -0,0 +1,284 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import functools
+import time
+from unittest import mock
+
+import pytest
+
+from plant_wn.exceptions import ConfigError, WeatherAPIError
+from plant_wn.weather import composite
+from plant_wn.weather.base import BaseWeatherAPI
+from plant_wn.weather.composite import CompositeWeatherAPI, get_provider_health, ProviderHealth
+from plant_wn.weather.forecast import Forecast
+from plant_wn.web import manage
+from plant_wn.web.manage import get_weather_api_cls
+
+
+def _get_forecast(value):
+    return Forecast([datetime.date(2020, 7, 4)], [value], [value], [value], [value])
+
+
+class FakeProvider(BaseWeatherAPI):
+    """A weather API that answers after a configurable delay."""
+
+    delay = 0
+    fails = False
+    value = 0
+    calls = 0
+
+    def fetch_forecast(self):
+        """Fetch a fake forecast after the delay."""
+        type(self).calls += 1
+        time.sleep(self.delay)
+        if self.fails:
+            raise WeatherAPIError(f"{self.name} is down")
+        return _get_forecast(self.value)
+
+
+class FastProvider(FakeProvider):
+    """A provider that answers quickly."""
+
+    name = "fast"
+    delay = 0.01
+    value = 1
+
+
+class SlowProvider(FakeProvider):
+    """A provider that answers slowly."""
+
+    name = "slow"
+    delay = 0.5
+    value = 2
+
+
+class FailingProvider(FakeProvider):
+    """A provider that always fails."""
+
+    name = "failing"
+    fails = True
+    value = 3
+
+
+class EmptyProvider(FakeProvider):
+    """A provider that answers with an empty forecast."""
+
+    name = "empty"
+
+    def fetch_forecast(self):
+        """Fetch an empty forecast."""
+        type(self).calls += 1
+        return Forecast()
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    composite._reset_state()
+    for provider_cls in (FastProvider, SlowProvider, FailingProvider, EmptyProvider):
+        provider_cls.calls = 0
+    yield
+    composite._reset_state()
+
+
+def test_provider_health():
+    health = ProviderHealth()
+    assert health.get_latency(95) is None
+
+    for latency in range(1, 101):
+        health.record_success(latency / 100)
+
+    assert health.get_latency(50) == pytest.approx(0.505)
+    assert health.get_latency(95) == pytest.approx(0.9505)
+    assert health.get_expected_latency() == pytest.approx(0.505)
+
+    health.record_failure()
+    assert health.error_rate == pytest.approx(0.1)
+    assert health.get_expected_latency() == pytest.approx(0.505 / 0.9)
+    health.record_success(0.5)
+    assert health.error_rate == pytest.approx(0.09)
+
+
+def test_get_provider_health():
+    assert get_provider_health("fast") is get_provider_health("fast")
+    assert get_provider_health("fast") is not get_provider_health("slow")
+
+
+def test_fetch_forecast_primary():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06), providers=[(FastProvider, "key"), (SlowProvider, None)], hedge_delay=1
+    )
+
+    assert api.fetch_forecast().precipitation.tolist() == [1]
+    assert FastProvider.calls == 1
+    assert SlowProvider.calls == 0
+    assert api.providers[0].api_key == "key"
+
+
+def test_fetch_forecast_hedged():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06), providers=[(SlowProvider, None), (FastProvider, None)], hedge_delay=0.05
+    )
+
+    start = time.monotonic()
+    assert api.fetch_forecast().precipitation.tolist() == [1]
+    # The slow provider's answer isn't waited on
+    assert time.monotonic() - start < 0.4
+    assert SlowProvider.calls == 1
+    assert FastProvider.calls == 1
+
+
+def test_fetch_forecast_hedged_not_queued():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06), providers=[(SlowProvider, None), (FastProvider, None)], hedge_delay=0.05
+    )
+
+    # The hedged requests don't wait behind the slow requests that are still running
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        forecasts = list(executor.map(lambda _: api.fetch_forecast(), range(50)))
+    assert time.monotonic() - start < 0.4
+    assert {forecast.precipitation.tolist()[0] for forecast in forecasts} == {1}
+    # The slow requests that were still queued when the hedged requests won were cancelled
+    assert SlowProvider.calls == composite._MAX_WORKERS_PER_PROVIDER
+
+
+def test_fetch_forecast_hedge_delay_from_latencies():
+    health = get_provider_health("slow")
+    for _ in range(composite._MIN_LATENCY_SAMPLES):
+        health.record_success(0.02)
+    # The slow provider is ordered first since its recorded latencies are lower
+    for _ in range(composite._MIN_LATENCY_SAMPLES):
+        get_provider_health("fast").record_success(1)
+    api = CompositeWeatherAPI(
+        (42.36, -71.06), providers=[(FastProvider, None), (SlowProvider, None)], hedge_delay=10
+    )
+
+    assert api.get_hedge_delay(api.providers[1]) == pytest.approx(0.02)
+    start = time.monotonic()
+    assert api.fetch_forecast().precipitation.tolist() == [1]
+    assert time.monotonic() - start < 0.4
+    assert SlowProvider.calls == 1
+
+
+def test_fetch_forecast_failover():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06),
+        providers=[(FailingProvider, None), (EmptyProvider, None), (FastProvider, None)],
+        hedge_delay=10,
+    )
+
+    start = time.monotonic()
+    assert api.fetch_forecast().precipitation.tolist() == [1]
+    # The failures are failed over to without waiting for the hedge delay
+    assert time.monotonic() - start < 1
+    assert get_provider_health("failing").error_rate > 0
+    assert get_provider_health("empty").error_rate > 0
+    assert get_provider_health("fast").error_rate == 0
+
+
+def test_fetch_forecast_all_fail():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06), providers=[(FailingProvider, None), (EmptyProvider, None)]
+    )
+
+    with pytest.raises(WeatherAPIError) as exc_info:
+        api.fetch_forecast()
+
+    assert "failing: failing is down" in str(exc_info.value)
+    assert "empty: The forecast from empty was empty" in str(exc_info.value)
+
+
+def test_get_ordered_providers():
+    api = CompositeWeatherAPI(
+        (42.36, -71.06),
+        providers=[(SlowProvider, None), (FailingProvider, None), (FastProvider, None)],
+    )
+    # Without enough latencies, the configured order is kept
+    assert [provider.name for provider in api.get_ordered_providers()] == [
+        "slow",
+        "failing",
+        "fast",
+    ]
+
+    for _ in range(composite._MIN_LATENCY_SAMPLES):
+        get_provider_health("slow").record_success(0.5)
+        get_provider_health("fast").record_success(0.1)
+    assert [provider.name for provider in api.get_ordered_providers()] == [
+        "fast",
+        "slow",
+        "failing",
+    ]
+
+    # Errors make the fast provider's expected latency worse than the slow provider's
+    for _ in range(20):
+        get_provider_health("fast").record_failure()
+    assert [provider.name for provider in api.get_ordered_providers()] == [
+        "slow",
+        "fast",
+        "failing",
+    ]
+
+
+def test_forecast():
+    api = CompositeWeatherAPI((42.36, -71.06), providers=[(FastProvider, None)])
+
+    assert api.get_precipitation_forecast() == [1]
+    assert api.get_precipitation_forecast() == [1]
+    assert FastProvider.calls == 1
+
+
+def test_providers_not_retried():
+    api = CompositeWeatherAPI((42.36, -71.06), providers=[(FastProvider, None)])
+
+    # The failures are failed over instead of retried
+    assert api.providers[0].session.get_adapter("https://example.com").max_retries.total == 0
+
+
+def test_no_providers():
+    with pytest.raises(ValueError):
+        CompositeWeatherAPI((42.36, -71.06))
+
+
+def test_duplicate_providers():
+    with pytest.raises(ValueError, match="The weather providers must have different names"):
+        CompositeWeatherAPI((42.36, -71.06), providers=[(FastProvider, "a"), (FastProvider, "b")])
+
+
+def _get_config(providers):
+    return {
+        "PLANT_WN_WEATHER_API_KEY": "key",
+        "PLANT_WN_WEATHER_API_KEYS": {"slow": "slow key"},
+        "PLANT_WN_WEATHER_HEDGE_DELAY": 1,
+        "PLANT_WN_WEATHER_HEDGE_PERCENTILE": 90,
+        "PLANT_WN_WEATHER_PROVIDERS": providers,
+    }
+
+
+@mock.patch.dict(manage.WEATHER_APIS, {"fast": FastProvider, "slow": SlowProvider})
+def test_get_weather_api_cls():
+    assert get_weather_api_cls(_get_config(["fast"])) is FastProvider
+
+    weather_api_cls = get_weather_api_cls(_get_config(["slow", "fast"]))
+
+    assert isinstance(weather_api_cls, functools.partial)
+    api = weather_api_cls((42.36, -71.06))
+    assert [(type(provider), provider.api_key) for provider in api.providers] == [
+        (SlowProvider, "slow key"),
+        (FastProvider, "key"),
+    ]
+    assert (api.hedge_delay, api.hedge_percentile) == (1, 90)
+
+
+@pytest.mark.parametrize(
+    "providers, expected",
+    (
+        ([], "PLANT_WN_WEATHER_PROVIDERS must have at least one weather provider"),
+        (["climacell", "darksky"], 'The weather provider "darksky" is not supported'),
+        (["fast", "slow", "fast"], 'The weather provider "fast" is configured more than once',),
+    ),
+)
+@mock.patch.dict(manage.WEATHER_APIS, {"fast": FastProvider, "slow": SlowProvider})
+def test_get_weather_api_cls_invalid(providers, expected):
+    with pytest.raises(ConfigError, match=expected):
+        get_weather_api_cls(_get_config(providers))
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from array import array
+import datetime
+import json
+
+import pytest
+
+from plant_wn.weather.forecast import Forecast
+
+
+def test_forecast():
+    forecast = Forecast(
+        dates=[datetime.date(2020, 7, 4), datetime.date(2020, 7, 5)],
+        precipitation=[0.1, 0],
+        min_temp=[60.5, 58],
+        max_temp=[85.2, 90],
+        max_wind=[5.5, 7],
+    )
+
+    assert len(forecast) == 2
+    assert forecast.get_dates() == [datetime.date(2020, 7, 4), datetime.date(2020, 7, 5)]
+    assert forecast.precipitation == array("d", [0.1, 0.0])
+    assert forecast.max_wind == array("d", [5.5, 7.0])
+    assert not hasattr(forecast, "__dict__")
+
+
+def test_forecast_json_round_trip():
+    forecast = Forecast(
+        dates=[datetime.date(2020, 7, 4)],
+        precipitation=[0.1],
+        min_temp=[60.5],
+        max_temp=[85.2],
+        max_wind=[5.5],
+    )
+
+    serialized = json.loads(json.dumps(forecast.to_json()))
+
+    assert Forecast.from_json(serialized) == forecast
+
+
+def test_forecast_mismatched_columns():
+    with pytest.raises(ValueError, match="must have the same length"):
+        Forecast(dates=[datetime.date(2020, 7, 4)], precipitation=[0.1, 0.2])
+
+
+@pytest.mark.parametrize(
+    "json_input",
+    (
+        # The format of the cache before the forecasts were stored as columns
+        [{"observation_time": {"value": "2020-07-04"}}],
+        {"dates": [737610], "precipitation": [0.1]},
+        {
+            "dates": [737610],
+            "precipitation": [0.1, 0.2],
+            "min_temp": [60.5],
+            "max_temp": [85.2],
+            "max_wind": [5.5],
+        },
+        {
+            "dates": ["2020-07-04"],
+            "precipitation": [0.1],
+            "min_temp": [60.5],
+            "max_temp": [85.2],
+            "max_wind": [5.5],
+        },
+    ),
+)
+def test_forecast_from_json_invalid(json_input):
+    with pytest.raises(ValueError):
+        Forecast.from_json(json_input)
@@ -0,0 +1,139 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from plant_wn.weather.forecast import Forecast
+from plant_wn.weather.history import ForecastHistory
+from plant_wn.web.manage import compact_history
+
+RALEIGH = (35.77, -78.63)
+BOSTON = (42.36, -71.07)
+DAY = datetime.date(2020, 7, 1)
+
+
+def _get_forecast(max_temp, days=2, start=DAY):
+    return Forecast(
+        dates=[start + datetime.timedelta(days=day) for day in range(days)],
+        precipitation=[0.25] * days,
+        min_temp=[60.0] * days,
+        max_temp=[max_temp + day for day in range(days)],
+        max_wind=[10.5] * days,
+    )
+
+
+def _get_timestamp(date, hour=12):
+    return datetime.datetime(date.year, date.month, date.day, hour).timestamp()
+
+
+@pytest.fixture()
+def history(tmpdir):
+    return ForecastHistory(str(tmpdir.join("history")))
+
+
+def test_append_and_query(history):
+    rows = history.append(
+        [(RALEIGH, _get_forecast(90.0)), (BOSTON, _get_forecast(80.0, days=3))],
+        fetched_at=_get_timestamp(DAY),
+    )
+    history.append([(RALEIGH, _get_forecast(91.0))], fetched_at=_get_timestamp(DAY, hour=13))
+
+    assert rows == 5
+    assert history.get_partitions() == [DAY]
+    raleigh = history.query(coordinates=RALEIGH)
+    assert raleigh.max_temp.tolist() == [90.0, 91.0, 91.0, 92.0]
+    assert raleigh.date.tolist() == [DAY.toordinal(), DAY.toordinal() + 1] * 2
+    assert raleigh.precipitation.dtype == np.float32
+    assert set(raleigh.latitude.tolist()) == {35.77}
+    assert history.query(coordinates=BOSTON).max_temp.tolist() == [80.0, 81.0, 82.0]
+    assert len(history.query().date) == 7
+
+
+def test_query_region_and_dates(history):
+    for day in range(3):
+        date = DAY + datetime.timedelta(days=day)
+        history.append(
+            [(RALEIGH, _get_forecast(90.0 + day, days=1)), (BOSTON, _get_forecast(80.0, days=1))],
+            fetched_at=_get_timestamp(date),
+        )
+
+    southeast = history.query(bounds=(30.0, -85.0, 40.0, -75.0))
+    assert southeast.max_temp.tolist() == [90.0, 91.0, 92.0]
+    recent = history.query(start=DAY + datetime.timedelta(days=1))
+    assert recent.max_temp.tolist() == [91.0, 80.0, 92.0, 80.0]
+    first = history.query(end=DAY, coordinates=BOSTON)
+    assert first.max_temp.tolist() == [80.0]
+    assert len(history.query(coordinates=(0.0, 0.0)).date) == 0
+
+
+def test_query_empty(history):
+    result = history.query()
+
+    assert len(result.date) == 0
+    assert result.date.dtype == np.int32
+
+
+def test_append_recovers_from_interrupted_append(history):
+    history.append([(RALEIGH, _get_forecast(90.0))], fetched_at=_get_timestamp(DAY))
+    # Simulate an append that was interrupted after writing only some of the columns
+    with open(os.path.join(history.path, DAY.isoformat(), "latitude"), "ab") as f:
+        f.write(np.zeros(5, dtype="<f8").tobytes())
+
+    assert len(history.query().date) == 2
+    history.append([(BOSTON, _get_forecast(80.0))], fetched_at=_get_timestamp(DAY))
+
+    result = history.query()
+    assert result.latitude.tolist() == [35.77, 35.77, 42.36, 42.36]
+
+
+def test_apply_retention(history):
+    for day in range(5):
+        date = DAY + datetime.timedelta(days=day)
+        history.append([(RALEIGH, _get_forecast(90.0))], fetched_at=_get_timestamp(date))
+
+    deleted = history.apply_retention(2, today=DAY + datetime.timedelta(days=4))
+
+    assert deleted == [DAY, DAY + datetime.timedelta(days=1)]
+    assert history.get_partitions() == [DAY + datetime.timedelta(days=day) for day in (2, 3, 4)]
+
+
+def test_compact(history):
+    for hour in (9, 12, 10):
+        history.append(
+            [(BOSTON, _get_forecast(80.0 + hour)), (RALEIGH, _get_forecast(90.0 + hour))],
+            fetched_at=_get_timestamp(DAY, hour),
+        )
+
+    assert history.compact(DAY) == 8
+
+    result = history.query()
+    # Only the latest fetch of each location and day is kept, and the locations are contiguous
+    assert result.latitude.tolist() == [35.77, 35.77, 42.36, 42.36]
+    assert result.max_temp.tolist() == [102.0, 103.0, 92.0, 93.0]
+    assert history.get_partitions() == [DAY]
+    assert history.compact(DAY) == 0
+    assert history.compact(DAY - datetime.timedelta(days=1)) == 0
+
+
+def test_compact_history_command(app, tmpdir):
+    history = ForecastHistory(str(tmpdir.join("history")))
+    app.config["PLANT_WN_HISTORY_PATH"] = history.path
+    old = datetime.date.today() - datetime.timedelta(days=10)
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    for date in (old, yesterday, yesterday):
+        history.append([(RALEIGH, _get_forecast(90.0))], fetched_at=_get_timestamp(date))
+
+    rv = app.test_cli_runner().invoke(compact_history, ["--retention-days", "5"])
+
+    assert rv.exit_code == 0, rv.output
+    assert rv.output == "1 day(s) of history were deleted and 2 duplicate row(s) were removed\n"
+    assert history.get_partitions() == [yesterday]
+
+
+def test_compact_history_command_not_configured(app):
+    rv = app.test_cli_runner().invoke(compact_history)
+
+    assert rv.exit_code == 1
+    assert "PLANT_WN_HISTORY_PATH must be set" in rv.output
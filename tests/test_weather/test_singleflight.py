@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from plant_wn.exceptions import WeatherAPIError
+from plant_wn.weather.singleflight import SingleFlight
+
+
+def test_do_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["forecast"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(flight.do, "climacell:35.78:-78.64", fetch) for _ in range(8)]
+        # Give the other callers time to join the in-flight call before releasing it
+        started.wait(5)
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_do_shares_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise WeatherAPIError("Failed to get the daily forecast")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flight.do, "key", fetch) for _ in range(4)]
+        started.wait(5)
+        time.sleep(0.05)
+        release.set()
+        for future in futures:
+            with pytest.raises(WeatherAPIError, match="Failed to get the daily forecast"):
+                future.result()
+
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_do_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("key", fetch) == 1
+    assert flight.do("key", fetch) == 2
+    assert flight.do("other key", fetch) == 3
@@ -1,4 +1,5 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import json
 from unittest import mock
 
 import bcrypt
@@ -52,6 +53,143 @@ def test_get_plants(client, db, user, user_token):
     assert rv.json == expected
 
 
+def _add_plants(db, user, names):
+    zip_code = db.session.query(models.ZipCode).filter_by(zip_code="27601").first()
+    if not zip_code:
+        zip_code = models.ZipCode(zip_code="27601")
+    for name in names:
+        db.session.add(models.Plant(name=name, user=user, zip_code=zip_code))
+    db.session.commit()
+
+
+def test_get_plants_paginated(client, db, user, user_token):
+    # Plants with the same name must not be skipped or repeated across pages
+    _add_plants(db, user, ["Fern", "Aloe", "Fern", "Basil", "Fern"])
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    rv = client.get("/api/v1/plants?limit=2", headers=headers)
+    assert rv.status_code == 200
+    pages = [rv.json]
+    while pages[-1]["next"]:
+        rv = client.get(f"/api/v1/plants?limit=2&cursor={pages[-1]['next']}", headers=headers)
+        assert rv.status_code == 200
+        pages.append(rv.json)
+
+    assert [len(page["items"]) for page in pages] == [2, 2, 1]
+    assert [(item["name"], item["id"]) for page in pages for item in page["items"]] == [
+        ("Aloe", 2),
+        ("Basil", 4),
+        ("Fern", 1),
+        ("Fern", 3),
+        ("Fern", 5),
+    ]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    (
+        ("limit=0", "The limit must be an integer between 1 and 1000"),
+        ("limit=1001", "The limit must be an integer between 1 and 1000"),
+        ("limit=ten", "The limit must be an integer between 1 and 1000"),
+        ("limit=10&cursor=not-a-cursor", "The cursor is invalid"),
+        ("limit=10&cursor=WyJGZXJuIiwgIjEiXQ", "The cursor is invalid"),
+    ),
+)
+def test_get_plants_invalid_query(query, expected, client, user, user_token):
+    rv = client.get(f"/api/v1/plants?{query}", headers={"Authorization": f"Bearer {user_token}"})
+    assert rv.status_code == 400
+    assert rv.json == {"error": expected}
+
+
+def test_get_plants_ndjson(client, db, user, user_token):
+    _add_plants(db, user, ["Fern", "Aloe", "Basil"])
+    headers = {"Accept": "application/x-ndjson", "Authorization": f"Bearer {user_token}"}
+
+    rv = client.get("/api/v1/plants", headers=headers)
+
+    assert rv.status_code == 200
+    assert rv.mimetype == "application/x-ndjson"
+    lines = rv.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Aloe", "Basil", "Fern"]
+
+
+def test_get_plants_ndjson_pages(client, db, user, user_token):
+    _add_plants(db, user, ["Fern", "Aloe", "Basil"])
+    headers = {"Accept": "application/x-ndjson", "Authorization": f"Bearer {user_token}"}
+
+    names = []
+    query_string = {"limit": 2}
+    for _ in range(2):
+        rv = client.get("/api/v1/plants", headers=headers, query_string=query_string)
+        assert rv.status_code == 200
+        names.append([json.loads(line)["name"] for line in rv.get_data(as_text=True).splitlines()])
+        query_string["cursor"] = rv.headers.get("X-Next-Cursor")
+
+    assert names == [["Aloe", "Basil"], ["Fern"]]
+    # The last page has no cursor
+    assert query_string["cursor"] is None
+
+
+def test_get_plants_etag(client, db, user, user_token):
+    _add_plants(db, user, ["Fern"])
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    rv = client.get("/api/v1/plants", headers=headers)
+    assert rv.status_code == 200
+    etag = rv.headers["ETag"]
+
+    rv = client.get("/api/v1/plants", headers={"If-None-Match": etag, **headers})
+    assert rv.status_code == 304
+    assert rv.headers["ETag"] == etag
+    assert rv.data == b""
+
+    # Invalid query parameters are rejected even when the ETag matches
+    for query in ("limit=0", "cursor=invalid"):
+        rv = client.get(f"/api/v1/plants?{query}", headers={"If-None-Match": etag, **headers})
+        assert rv.status_code == 400
+
+    # The streamed representation has a different ETag
+    ndjson_headers = {"Accept": "application/x-ndjson", "If-None-Match": etag, **headers}
+    rv = client.get("/api/v1/plants", headers=ndjson_headers)
+    assert rv.status_code == 200
+    assert rv.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("change", ("add", "rename", "threshold", "delete"))
+def test_get_plants_etag_changes(change, client, db, user, user_token):
+    _add_plants(db, user, ["Fern"])
+    plant = db.session.query(models.Plant).one()
+    plant.max_temp = models.MaxTemp(value=95.0)
+    db.session.commit()
+    headers = {"Authorization": f"Bearer {user_token}"}
+    etag = client.get("/api/v1/plants", headers=headers).headers["ETag"]
+
+    if change == "add":
+        _add_plants(db, user, ["Aloe"])
+    elif change == "rename":
+        plant.name = "Boston Fern"
+    elif change == "threshold":
+        plant.max_temp.value = 97.0
+    else:
+        db.session.delete(plant)
+    db.session.commit()
+
+    rv = client.get("/api/v1/plants", headers={"If-None-Match": etag, **headers})
+    assert rv.status_code == 200
+    assert rv.headers["ETag"] != etag
+
+
+def test_plants_version_unchanged_by_other_users(client, db, user):
+    other_user = models.User(password=b"not-used", username="yoda")
+    _add_plants(db, other_user, ["Fern"])
+    plant = db.session.query(models.Plant).one()
+    plant.name = "Boston Fern"
+    db.session.commit()
+
+    assert user.plants_version == 0
+    assert other_user.plants_version == 2
+
+
 def test_get_plants_unauthorized(client, user_token):
     rv = client.get("/api/v1/plants", headers={"Authorization": "Bearer ursine"})
     assert rv.status_code != 200
@@ -63,6 +201,21 @@ def test_get_plants_user_not_found(client, db):
     assert rv.status_code == 404
     assert rv.json == {"error": "The requested resource was not found"}
 
+    # The uid claim of a deleted user
+    user_token = create_access_token(identity="yoda", user_claims={"uid": 42})
+    rv = client.get("/api/v1/plants", headers={"Authorization": f"Bearer {user_token}"})
+    assert rv.status_code == 404
+
+
+@pytest.mark.parametrize("accept", ("application/json", "application/x-ndjson"))
+def test_get_plants_empty(accept, client, db, user, user_token):
+    headers = {"Accept": accept, "Authorization": f"Bearer {user_token}"}
+
+    rv = client.get("/api/v1/plants", headers=headers)
+
+    assert rv.status_code == 200
+    assert rv.headers["ETag"].startswith(f'"{user.id}.0.')
+
 
 def test_healthcheck(client):
     rv = client.get("/api/v1/healthcheck")
@@ -115,18 +268,34 @@ def test_new_user(client, db):
         {"password": "Who's scruffy looking?"},
         "han_solo",
         {"password": 123, "username": "han_solo"},
+        {"email": None, "password": "Who's scruffy looking?", "username": "han_solo"},
+        {"phone": "555-0100", "password": "Who's scruffy looking?", "username": "han_solo"},
     ),
 )
 def test_new_user_invalid(json_input, client):
     rv = client.post("/api/v1/users", json=json_input)
     assert rv.status_code == 400
     expected = (
-        "The input JSON must only contain the following keys with string values: password and "
-        "username"
+        "The input JSON must only contain the following keys with string values: password, "
+        "username and the optional email"
     )
     assert rv.json == {"error": expected}
 
 
+def test_new_user_with_email(client, db):
+    input_json = {
+        "email": "han@example.com",
+        "password": "Who's scruffy looking?",
+        "username": "han_solo",
+    }
+    rv = client.post("/api/v1/users", json=input_json)
+
+    assert rv.status_code == 201
+    assert rv.json == {"email": "han@example.com", "username": "han_solo"}
+    user = db.session.query(models.User).filter_by(username="han_solo").one()
+    assert user.email == "han@example.com"
+
+
 def test_new_user_already_exists(client):
     json_input = {"password": "Who's scruffy looking?", "username": "han_solo"}
     rv = client.post("/api/v1/users", json=json_input)
@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import contextlib
+
+from flask_jwt_extended import create_access_token, decode_token
+import pytest
+import sqlalchemy
+
+from plant_wn.web import auth
+
+
+@contextlib.contextmanager
+def capture_username_lookups(db):
+    """
+    Capture the statements that look up a user by the username.
+
+    :param flask_sqlalchemy.SQLAlchemy db: the database to capture the statements of
+    :return: a context manager that yields the list of captured statements
+    """
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "users.username = " in statement:
+            queries.append(statement)
+
+    sqlalchemy.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        sqlalchemy.event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture()
+def user_id_cache():
+    auth._user_id_cache.clear()
+    yield auth._user_id_cache
+    auth._user_id_cache.clear()
+
+
+def test_login_token_has_uid_claim(client, user):
+    input_json = {"password": "Who's scruffy looking?", "username": "han_solo"}
+    rv = client.post("/api/v1/login", json=input_json)
+
+    claims = decode_token(rv.json["token"])
+    assert claims["sub"] == "han_solo"
+    assert claims["user_claims"] == {"uid": user.id}
+
+
+def test_get_plants_uid_claim(client, db, user, user_token):
+    with capture_username_lookups(db) as queries:
+        rv = client.get("/api/v1/plants", headers={"Authorization": f"Bearer {user_token}"})
+
+    assert rv.status_code == 200
+    assert queries == []
+
+
+def test_get_plants_legacy_token(client, db, user, user_id_cache):
+    headers = {"Authorization": f"Bearer {create_access_token(identity='han_solo')}"}
+
+    with capture_username_lookups(db) as queries:
+        assert client.get("/api/v1/plants", headers=headers).status_code == 200
+        assert client.get("/api/v1/plants", headers=headers).status_code == 200
+
+    # The user ID of the second request is from the cache
+    assert len(queries) == 1
+    assert user_id_cache["han_solo"][0] == user.id
+
+
+def test_get_plants_legacy_token_expired_cache(client, db, user, user_id_cache):
+    headers = {"Authorization": f"Bearer {create_access_token(identity='han_solo')}"}
+    user_id_cache["han_solo"] = (user.id + 1, 0)
+
+    with capture_username_lookups(db) as queries:
+        assert client.get("/api/v1/plants", headers=headers).status_code == 200
+
+    assert len(queries) == 1
+    assert user_id_cache["han_solo"][0] == user.id
@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import json
+
+import pytest
+
+from plant_wn.exceptions import ValidationError
+from plant_wn.web import bulk, models
+from plant_wn.web.manage import export_plants_command, import_plants_command
+
+
+def _get_lines(*plants_json):
+    return [json.dumps(plant_json) + "\n" for plant_json in plants_json]
+
+
+def test_import_plants(db, user):
+    db.session.add(models.ZipCode(zip_code="27601"))
+    db.session.commit()
+    lines = _get_lines(
+        {"name": "Fern", "zip_code": "27601", "max_temp": {"value": 95, "enabled": False}},
+        {"name": "Aloe", "zip_code": "02108", "min_temp": {"id": 7, "value": 40.5}},
+        {"name": "Basil", "zip_code": "02108", "max_wind": None},
+    )
+    lines.insert(1, "\n")
+
+    assert bulk.import_plants(user.id, lines, batch_size=2) == 3
+
+    plants = db.session.query(models.Plant).order_by(models.Plant.name).all()
+    assert [(plant.name, plant.zip_code.zip_code) for plant in plants] == [
+        ("Aloe", "02108"),
+        ("Basil", "02108"),
+        ("Fern", "27601"),
+    ]
+    assert plants[0].min_temp == models.MinTemp(value=40.5)
+    assert plants[2].max_temp == models.MaxTemp(value=95.0, enabled=False)
+    assert not plants[1].max_wind
+    assert db.session.query(models.ZipCode).count() == 2
+    # Each batch increments the version
+    db.session.refresh(user)
+    assert user.plants_version == 2
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    (
+        ("{", "The line is not valid JSON"),
+        (b"\xff\n", "The line is not valid UTF-8"),
+        ('{"name": "Fern"}', "The zip_code key must be a non-empty string"),
+        (
+            '{"name": "Fern", "zip_code": "27601", "color": "green"}',
+            "The following keys are invalid: color",
+        ),
+        (
+            '{"name": "Fern", "zip_code": "27601", "max_temp": {"value": "hot"}}',
+            "The max_temp key is invalid",
+        ),
+        (
+            '{"name": "Fern", "zip_code": "27601", "min_temp": {"value": NaN}}',
+            "The min_temp key is invalid",
+        ),
+        (
+            '{"name": "Fern", "zip_code": "27601", "max_temp": {"value": Infinity}}',
+            "The max_temp key is invalid",
+        ),
+    ),
+)
+def test_import_plants_invalid(line, expected, db, user):
+    lines = _get_lines(*({"name": f"Plant {i}", "zip_code": "27601"} for i in range(3)))
+    lines.append(line)
+
+    with pytest.raises(ValidationError, match=expected) as exc_info:
+        bulk.import_plants(user.id, lines, batch_size=2)
+
+    assert str(exc_info.value).startswith("Line 4 is invalid. ")
+    assert str(exc_info.value).endswith(" 2 plant(s) from the lines before it were imported.")
+    # The first batch was committed before the invalid line was read
+    assert db.session.query(models.Plant).count() == 2
+
+
+def test_import_and_export_plants_api(client, db, user, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    body = "".join(
+        _get_lines(
+            {"name": "Fern", "zip_code": "27601", "max_temp": {"value": 95.0}},
+            {"name": "Aloe", "zip_code": "27601"},
+        )
+    )
+
+    rv = client.post(
+        "/api/v1/plants/import",
+        data=body,
+        headers={"Content-Type": "application/x-ndjson", **headers},
+    )
+    assert rv.status_code == 201
+    assert rv.json == {"imported": 2}
+
+    rv = client.get("/api/v1/plants/export", headers=headers)
+    assert rv.status_code == 200
+    assert rv.mimetype == "application/x-ndjson"
+    exported = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    # The export has the same format as the plants listing
+    listing = client.get("/api/v1/plants", headers=headers).json["items"]
+    assert exported == listing
+
+
+def test_import_plants_api_invalid(client, db, user, user_token):
+    rv = client.post(
+        "/api/v1/plants/import", data="[]\n", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert rv.status_code == 400
+    assert rv.json == {
+        "error": (
+            "Line 1 is invalid. The plant must be an object. 0 plant(s) from the lines before it "
+            "were imported."
+        )
+    }
+
+
+def test_import_and_export_plants_commands(app, db, user, tmpdir):
+    input_file = tmpdir.join("plants.ndjson")
+    input_file.write("".join(_get_lines({"name": "Fern", "zip_code": "27601"})))
+    runner = app.test_cli_runner()
+
+    rv = runner.invoke(import_plants_command, ["han_solo", str(input_file)])
+    assert rv.exit_code == 0, rv.output
+    assert rv.output == "1 plant(s) were imported\n"
+
+    rv = runner.invoke(export_plants_command, ["han_solo"])
+    assert rv.exit_code == 0, rv.output
+    assert json.loads(rv.output)["name"] == "Fern"
+
+    rv = runner.invoke(export_plants_command, ["yoda"])
+    assert rv.exit_code == 1
+    assert 'The user "yoda" does not exist' in rv.output
+
+
+@pytest.fixture()
+def plants(db, user):
+    zip_code = models.ZipCode(zip_code="27601")
+    plants = [
+        models.Plant(max_temp=models.MaxTemp(value=95.0), name=name, user=user, zip_code=zip_code)
+        for name in ("Fern", "Aloe", "Basil")
+    ]
+    db.session.add_all(plants)
+    db.session.commit()
+    return plants
+
+
+def test_batch_plants(client, db, user, user_token, plants):
+    operations = [
+        {"op": "create", "plant": {"name": "Cactus", "zip_code": "85001"}},
+        {"op": "update_thresholds", "id": 1, "thresholds": {"max_temp": None}},
+        {"op": "delete", "id": 2},
+        {
+            "op": "update_thresholds",
+            "id": 3,
+            "thresholds": {
+                "max_temp": {"value": 99.5, "enabled": False},
+                "min_temp": {"value": 40},
+            },
+        },
+        {"op": "create", "plant": {"name": "Orchid", "zip_code": "27601"}},
+    ]
+    version = user.plants_version
+    modified_at = plants[0].thresholds_modified_at
+
+    rv = client.post(
+        "/api/v1/plants/batch",
+        json={"operations": operations},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert rv.status_code == 200, rv.json
+    assert rv.json == {
+        "results": [
+            {"id": 4, "op": "create", "status": 201},
+            {"id": 1, "op": "update_thresholds", "status": 200},
+            {"id": 2, "op": "delete", "status": 204},
+            {"id": 3, "op": "update_thresholds", "status": 200},
+            {"id": 5, "op": "create", "status": 201},
+        ]
+    }
+    db.session.expire_all()
+    plants = {plant.id: plant for plant in db.session.query(models.Plant)}
+    assert sorted(plants) == [1, 3, 4, 5]
+    assert not plants[1].max_temp
+    assert plants[3].max_temp == models.MaxTemp(value=99.5, enabled=False)
+    assert plants[3].min_temp == models.MinTemp(value=40.0)
+    assert plants[4].zip_code.zip_code == "85001"
+    assert plants[5].name == "Orchid"
+    # The incremental notifier runs evaluate the updated and created plants again
+    assert plants[1].thresholds_modified_at > modified_at
+    assert plants[4].thresholds_modified_at > modified_at
+    # The batch is a single transaction that increments the version once
+    assert user.plants_version == version + 1
+
+
+@pytest.mark.parametrize(
+    "json_input, expected",
+    (
+        ([], "The input JSON must be an object with only the operations key"),
+        ({"operations": []}, "The operations key must be a non-empty array"),
+        ({"operations": [{"op": "rename", "id": 1}]}, "Operation 0 is invalid. The op key must be"),
+        (
+            {"operations": [{"op": "delete", "id": 1, "name": "Fern"}]},
+            "Operation 0 is invalid. The delete operation must only have the following keys: id",
+        ),
+        (
+            {"operations": [{"op": "create", "plant": {"name": "Fern"}}]},
+            "Operation 0 is invalid. The zip_code key must be a non-empty string",
+        ),
+        (
+            {"operations": [{"op": "update_thresholds", "id": 1, "thresholds": {"color": None}}]},
+            "Operation 0 is invalid. The following thresholds are invalid: color",
+        ),
+        (
+            {"operations": [{"op": "delete", "id": 1}, {"op": "delete", "id": 1}]},
+            "Operation 1 is invalid. The plant 1 is already changed by operation 0",
+        ),
+        (
+            {"operations": [{"op": "delete", "id": 1}, {"op": "delete", "id": 42}]},
+            "Operation 1 is invalid. The plant 42 does not exist",
+        ),
+    ),
+)
+def test_batch_plants_invalid(json_input, expected, client, db, user_token, plants):
+    rv = client.post(
+        "/api/v1/plants/batch", json=json_input, headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert rv.status_code == 400
+    assert rv.json["error"].startswith(expected)
+    # Nothing is applied when any operation is invalid
+    assert db.session.query(models.Plant).count() == 3
+
+
+def test_batch_plants_other_users_plant(client, db, user_token, plants):
+    other_user = models.User(password=b"not-used", username="yoda")
+    other_plant = models.Plant(name="Fern", user=other_user, zip_code=plants[0].zip_code)
+    db.session.add(other_plant)
+    db.session.commit()
+
+    rv = client.post(
+        "/api/v1/plants/batch",
+        json={"operations": [{"op": "delete", "id": other_plant.id}]},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert rv.status_code == 400
+    assert rv.json == {"error": "Operation 0 is invalid. The plant 4 does not exist"}
@@ -0,0 +1,56 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import os
+
+import flask_migrate
+import pytest
+
+from plant_wn.web import db
+from plant_wn.web.config import TEST_DB_FILE
+
+
+@pytest.fixture()
+def empty_db(app):
+    try:
+        os.remove(TEST_DB_FILE)
+    except FileNotFoundError:
+        pass
+
+    return db
+
+
+def test_inline_plant_thresholds(empty_db):
+    flask_migrate.upgrade(revision="5b2e8a41d7c3")
+    statements = (
+        "INSERT INTO users (id, username, password) VALUES (1, 'han_solo', 'not-used')",
+        "INSERT INTO zip_codes (id, zip_code) VALUES (1, '27601')",
+        "INSERT INTO max_temps (id, enabled, value) VALUES (7, 0, 97.5)",
+        "INSERT INTO min_temps (id, enabled, value) VALUES (3, 1, 55.0)",
+        "INSERT INTO plants (id, name, user_id, zip_code_id, max_temp_id, min_temp_id) "
+        "VALUES (1, 'Plumeria', 1, 1, 7, 3)",
+        "INSERT INTO plants (id, name, user_id, zip_code_id) VALUES (2, 'Fern', 1, 1)",
+    )
+    for statement in statements:
+        empty_db.engine.execute(statement)
+
+    flask_migrate.upgrade(revision="9d4f1c6e2a87")
+
+    rows = empty_db.engine.execute(
+        "SELECT id, max_temp_enabled, max_temp_value, min_temp_enabled, min_temp_value, "
+        "max_wind_value FROM plants ORDER BY id"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [
+        (1, False, 97.5, True, 55.0, None),
+        (2, None, None, None, None, None),
+    ]
+
+    flask_migrate.downgrade(revision="5b2e8a41d7c3")
+
+    rows = empty_db.engine.execute(
+        "SELECT plants.id, max_temps.enabled, max_temps.value, min_temps.value, max_wind_id "
+        "FROM plants LEFT JOIN max_temps ON max_temps.id = plants.max_temp_id "
+        "LEFT JOIN min_temps ON min_temps.id = plants.min_temp_id ORDER BY plants.id"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [
+        (1, False, 97.5, 55.0, None),
+        (2, None, None, None, None),
+    ]
@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from plant_wn.web import models
+
+
+def test_plant_threshold_names():
+    assert models.Plant.threshold_names == ("max_precipitation", "max_temp", "max_wind", "min_temp")
+
+
+def test_plant_to_json(db, user):
+    plant = models.Plant(
+        max_temp=models.MaxTemp(value=97.5),
+        name="First Plumeria",
+        user=user,
+        zip_code=models.ZipCode(zip_code="27601"),
+    )
+    db.session.add(plant)
+    db.session.commit()
+
+    assert plant.to_json() == {
+        "id": 1,
+        "max_precipitation": None,
+        "max_temp": {"enabled": True, "id": 1, "value": 97.5},
+        "max_wind": None,
+        "min_temp": None,
+        "name": "First Plumeria",
+        "zip_code": "27601",
+    }
+
+
+def test_plant_thresholds_stored_on_plant(db, user):
+    plant = models.Plant(
+        max_temp=models.MaxTemp(value=97.5),
+        name="First Plumeria",
+        user=user,
+        zip_code=models.ZipCode(zip_code="27601"),
+    )
+    db.session.add(plant)
+    db.session.commit()
+    assert not plant.min_temp
+    assert plant.max_temp_value == 97.5
+
+    plant.max_temp.enabled = False
+    plant.min_temp = models.MinTemp(value=40.0)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert plant.max_temp == models.MaxTemp(value=97.5, enabled=False)
+    assert plant.min_temp == models.MinTemp(value=40.0)
+
+    plant.max_temp = None
+    db.session.commit()
+    db.session.expire_all()
+
+    assert not plant.max_temp
+    assert plant.max_temp_enabled is None
+
+
+def test_plant_thresholds_modified_at(db, user):
+    plant = models.Plant(
+        max_temp=models.MaxTemp(value=97.5),
+        name="First Plumeria",
+        user=user,
+        zip_code=models.ZipCode(zip_code="27601"),
+    )
+    db.session.add(plant)
+    db.session.commit()
+    created_at = plant.thresholds_modified_at
+    assert created_at is not None
+
+    # Changes that don't affect the evaluation of the plant keep the stamp
+    plant.name = "Plumeria"
+    db.session.commit()
+    assert plant.thresholds_modified_at == created_at
+
+    plant.max_temp.enabled = False
+    db.session.commit()
+    modified_at = plant.thresholds_modified_at
+    assert modified_at > created_at
+
+    plant.zip_code = models.ZipCode(zip_code="02108")
+    db.session.commit()
+    assert plant.thresholds_modified_at > modified_at
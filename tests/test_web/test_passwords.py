@@ -0,0 +1,67 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import pytest
+from werkzeug.exceptions import ServiceUnavailable
+
+from plant_wn.web import models, passwords
+
+
+@pytest.fixture()
+def password_pool(app):
+    passwords.configure_password_hashing(workers=1, queue_size=1, rounds=4, retry_after=7)
+    yield
+    passwords.configure_password_hashing(workers=0, rounds=4)
+
+
+def test_hash_password_in_process_pool(password_pool):
+    hashed_password = passwords.hash_password("Who's scruffy looking?")
+
+    assert hashed_password.startswith(b"$2b$04$")
+    assert passwords.check_password("Who's scruffy looking?", hashed_password)
+    assert not passwords.check_password("Don't everybody thank me at once", hashed_password)
+
+
+def test_hash_password_saturated(password_pool):
+    # Occupy the worker and the queue slot
+    assert passwords._slots.acquire(blocking=False)
+    assert passwords._slots.acquire(blocking=False)
+
+    with pytest.raises(ServiceUnavailable) as exc_info:
+        passwords.hash_password("Who's scruffy looking?")
+
+    assert ("Retry-After", "7") in exc_info.value.get_headers()
+
+
+def test_login_saturated(password_pool, client, user):
+    passwords._slots.acquire(blocking=False)
+    passwords._slots.acquire(blocking=False)
+
+    input_json = {"password": "Who's scruffy looking?", "username": "han_solo"}
+    rv = client.post("/api/v1/login", json=input_json)
+
+    assert rv.status_code == 503
+    assert rv.headers["Retry-After"] == "7"
+    assert rv.json["error"].startswith("Too many login and sign up requests")
+
+
+@pytest.mark.parametrize(
+    "hashed_password, expected",
+    ((b"$2b$04$" + b"a" * 53, False), (b"$2b$12$" + b"a" * 53, True), (b"invalid", True)),
+)
+def test_needs_rehash(hashed_password, expected):
+    assert passwords.needs_rehash(hashed_password) is expected
+
+
+def test_login_rehashes_password(client, db, user):
+    assert user.password.startswith(b"$2b$04$")
+    passwords.configure_password_hashing(workers=0, rounds=5)
+    try:
+        input_json = {"password": "Who's scruffy looking?", "username": "han_solo"}
+        rv = client.post("/api/v1/login", json=input_json)
+    finally:
+        passwords.configure_password_hashing(workers=0, rounds=4)
+
+    assert rv.status_code == 200
+    db.session.expire_all()
+    user = db.session.query(models.User).filter_by(username="han_solo").one()
+    assert user.password.startswith(b"$2b$05$")
+    assert passwords.check_password("Who's scruffy looking?", user.password)